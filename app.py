@@ -1,7 +1,8 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import threading
+import time
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response
 from werkzeug.utils import secure_filename
-from datetime import datetime
 from dotenv import load_dotenv
 
 # StudyBuddy package imports
@@ -10,8 +11,19 @@ from studybuddy.skill_extractor import (
     extract_skills_from_text,
     extract_email_from_text
 )
-from studybuddy.quiz_generator import generate_quiz_questions, evaluate_quiz_answers
-from studybuddy.matching import match_partner_smart
+from studybuddy.quiz_generator import (
+    generate_quiz_questions, evaluate_quiz_answers, collect_late_explanations,
+    get_question_bank, start_bank_refiller
+)
+from studybuddy.matching import match_partner_smart, PartnerIndex, SAMPLE_PARTNERS
+from studybuddy.partner_store import PartnerStore
+from studybuddy.leaderboard import Leaderboard, LeaderboardStore, GLOBAL
+from studybuddy.jobs import get_job_queue, publish_partial, PENDING, RUNNING, DONE, FAILED
+from studybuddy.state_store import ServerSideSessionInterface
+from studybuddy.resume_store import ResumeStore, resume_digest
+from studybuddy.mistral_api import single_flight, get_rate_limiter
+from resume_skill_quiz.sandbox import get_sandbox
+from studybuddy import telemetry
 # ❌ Removed invalid import: call_mistral_for_skill
 # If you need direct Mistral helpers, use:
 # from studybuddy.mistral_api import generate_quiz, get_explanation
@@ -20,11 +32,87 @@ load_dotenv()  # Load environment variables from .env if present
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "your_secret_key")
+# Quiz questions and results stay server-side; the cookie only holds a session id.
+# The store (SESSION_BACKEND, sqlite by default) is opened on the first request.
+app.session_interface = ServerSideSessionInterface()
 
 UPLOAD_FOLDER = "uploads"
+ARCHIVE_UPLOADS = os.getenv("UPLOAD_ARCHIVE", "1").lower() not in ("0", "false", "no")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
+def _lazy(factory):
+    """Accessor that builds `factory()` on first call, so importing app opens no database."""
+    box = []
+    lock = threading.Lock()
+
+    def get():
+        if not box:
+            with lock:
+                if not box:
+                    box.append(factory())
+        return box[0]
+    return get
+
+
+def _open_partner_store():
+    store = PartnerStore()
+    store.seed(SAMPLE_PARTNERS)
+    return store
+
+
+get_resume_store = _lazy(lambda: ResumeStore(UPLOAD_FOLDER))
+# Registered students (plus the sample pool) and this worker's in-memory index of them
+get_partner_store = _lazy(_open_partner_store)
+partner_index = PartnerIndex()
+# Every graded attempt, and this worker's in-memory rankings of the best ones
+get_leaderboard_store = _lazy(LeaderboardStore)
+rankings = Leaderboard()
+
+HTTP_SECONDS = telemetry.histogram(
+    "studybuddy_http_request_seconds", "Flask request latency.", labels=("endpoint", "method", "status")
+)
+
+
+# -----------------------------------------------------
+# Request tracing: one trace per request, spans from every layer join it
+# -----------------------------------------------------
+@app.before_request
+def _start_trace():
+    g.trace_cm = telemetry.trace(request.headers.get("X-Trace-Id"), endpoint=request.endpoint,
+                                 method=request.method)
+    g.trace = g.trace_cm.__enter__()
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def _finish_trace(response):
+    t = g.get("trace")
+    if t is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - g.started, endpoint=request.endpoint or "unknown",
+                             method=request.method, status=response.status_code)
+        response.headers["X-Trace-Id"] = t.id
+        if t.spans:
+            telemetry.log_event("request", status=response.status_code, **t.summary())
+    return response
+
+
+@app.teardown_request
+def _close_trace(exc):
+    cm = g.pop("trace_cm", None)
+    if cm is not None:
+        cm.__exit__(None, None, None)
+
+# Keep the per-skill question bank topped up so quizzes rarely wait on the LLM.
+# Started with the first request rather than at import (it opens the bank).
+_bank_refiller = _lazy(start_bank_refiller)
+
+
+@app.before_request
+def _start_bank_refiller():
+    if os.getenv("QUESTION_BANK_REFILL", "1").lower() not in ("0", "false", "no"):
+        _bank_refiller()
+
 
 # -----------------------------------------------------
 # 1️⃣ LANDING PAGE — RESUME UPLOAD
@@ -46,22 +134,35 @@ def index():
         flash("⚠ Please upload a PDF or DOCX resume.", "warning")
         return redirect(url_for("index"))
 
-    # Secure filename with timestamp
     filename = secure_filename(uploaded_file.filename)
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{filename}"
-
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    uploaded_file.save(save_path)
+    data = uploaded_file.read()
+    digest = resume_digest(data)
+
+    # Repeat uploads of the same file reuse the earlier extraction
+    resume_store = get_resume_store()
+    extracted = resume_store.lookup(digest)
+    cache_hit = extracted is not None
+    if extracted is None:
+        # Parse straight from the request bytes; archiving happens off-request
+        text = extract_text_from_resume(data, filename=filename)
+        if ARCHIVE_UPLOADS:
+            get_job_queue().submit(resume_store.archive, data, filename, digest, name="archive")
+        extracted = {
+            "text": text,
+            "skills": extract_skills_from_text(text) if text.strip() else [],
+            "email": extract_email_from_text(text),
+        }
+        if text.strip():
+            resume_store.remember(digest, **extracted)
 
     # Extract text from resume
-    text = extract_text_from_resume(save_path)
+    text = extracted["text"]
     if not text.strip():
         flash("⚠ Could not extract text from resume.", "danger")
         return redirect(url_for("index"))
 
     # Extract email
-    email = extract_email_from_text(text)
+    email = extracted["email"]
     if not email:
         flash("⚠ No email found in resume.", "danger")
         return redirect(url_for("index"))
@@ -74,24 +175,100 @@ def index():
     session["user_email"] = email
 
     # Extract skills
-    skills = extract_skills_from_text(text)[:3]
+    skills = extracted["skills"][:3]
     if not skills:
         flash("⚠ No skills detected in resume.", "danger")
         return redirect(url_for("index"))
 
     session["extracted_skills"] = skills
-    print("DEBUG extracted skills:", skills)
+    telemetry.log_event("upload.skills", skills=skills, resume_cache_hit=cache_hit)
+
+    # Generate quiz in the background; /quiz shows each question as soon as the job publishes it.
+    # shared=True: the job's progress is in the state store, so any worker can answer the polls.
+    session.pop("quiz_questions", None)
+    session["quiz_job"] = get_job_queue().submit(
+        generate_quiz_questions, skills, num_questions=5, student=email,
+        on_question=publish_partial, name="quiz", shared=True
+    )
 
-    # Generate quiz
-    questions = generate_quiz_questions(skills, num_questions=5)
-    if not questions:
-        flash("⚠ Could not generate quiz questions.", "danger")
-        return redirect(url_for("index"))
+    return redirect(url_for("quiz"))
 
-    session["quiz_questions"] = questions
-    print("DEBUG quiz questions:", questions)
 
-    return redirect(url_for("quiz"))
+MISSING = "missing"
+
+
+def _collect_quiz_job():
+    """
+    Move finished quiz job output into the session.
+    Returns the job status string, MISSING when the session's job is unknown
+    (expired, or lost with a restarted worker), or None when there is no job.
+    """
+    job_id = session.get("quiz_job")
+    if not job_id:
+        return None
+    job = get_job_queue().get(job_id)
+    if job is None:
+        session.pop("quiz_job", None)
+        telemetry.log_event("quiz.job_missing", job_id=job_id)
+        return MISSING
+
+    if job.status == DONE:
+        session.pop("quiz_job", None)
+        get_job_queue().forget(job_id)
+        if job.result:
+            session["quiz_questions"] = job.result
+            telemetry.log_event("quiz.ready", questions=len(job.result), job_time_ms=round(job.run_time * 1000, 2))
+    elif job.status == FAILED:
+        session.pop("quiz_job", None)
+        get_job_queue().forget(job_id)
+
+    return job.status
+
+
+@app.route("/quiz/status")
+def quiz_status():
+    job_id = session.get("quiz_job")
+    status = get_job_queue().status(job_id)
+    if status is None:
+        ready = bool(session.get("quiz_questions"))
+        return jsonify({"status": DONE if ready else MISSING})
+    return jsonify(status)
+
+
+@app.route("/quiz/partial")
+def quiz_partial():
+    """Questions published so far by the quiz job, from index `since` (answers stripped)."""
+    since = request.args.get("since", 0, type=int)
+    job = get_job_queue().get(session.get("quiz_job"))
+    if job is not None and job.status in (PENDING, RUNNING):
+        status, questions = job.status, list(job.partial)
+    else:
+        _collect_quiz_job()
+        questions = session.get("quiz_questions") or []
+        status = DONE if questions else FAILED
+    return jsonify({
+        "status": status,
+        "questions": [
+            {"index": i, "question": q.get("question"), "options": q.get("options", [])}
+            for i, q in enumerate(questions[since:], start=since)
+        ],
+    })
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text format: span, HTTP, LLM retry/token and parse metrics."""
+    return Response(telemetry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/jobs/stats")
+def job_stats():
+    data = get_job_queue().stats()
+    data["question_bank"] = get_question_bank().stats()
+    data["llm_coalescing"] = single_flight.stats()
+    data["llm_rate_limit"] = get_rate_limiter().stats()
+    data["resume_sandbox"] = get_sandbox().stats()
+    return jsonify(data)
 
 
 # -----------------------------------------------------
@@ -101,8 +278,25 @@ def index():
 def quiz():
     questions = session.get("quiz_questions")
 
+    if not questions and session.get("quiz_job"):
+        status = _collect_quiz_job()
+        questions = session.get("quiz_questions")
+        if status not in (DONE, FAILED, MISSING, None):
+            return render_template("quiz_wait.html")
+        if not questions and status == MISSING:
+            flash("⚠ Your quiz could not be found (it expired or its server restarted). "
+                  "Please upload your resume again.", "danger")
+            return redirect(url_for("index"))
+        if not questions and status is not None:
+            flash("⚠ Could not generate quiz questions.", "danger")
+            return redirect(url_for("index"))
+
     if not questions:
-        flash("⚠ Upload your resume first.", "warning")
+        if request.method == "POST" and session.get("last_results"):
+            # resubmitting (or refreshing) a graded quiz: its answers are already on the result page
+            flash("⚠ This quiz has already been graded. Upload your resume for a new one.", "warning")
+        else:
+            flash("⚠ Upload your resume first.", "warning")
         return redirect(url_for("index"))
 
     if request.method == "POST":
@@ -110,11 +304,16 @@ def quiz():
             request.form.get(f"q{i}") for i in range(len(questions))
         ]
 
+        # each quiz is graded (and recorded on the leaderboard) exactly once
+        session.pop("quiz_questions", None)
         score, total, results = evaluate_quiz_answers(questions, user_answers)
 
         session["user_score"] = score
         session["last_results"] = results
 
+        if session.get("user_email") and total:
+            get_leaderboard_store().record(session["user_email"], score, total, results)
+
         return render_template("result.html",
                                score=score,
                                total=total,
@@ -123,6 +322,32 @@ def quiz():
     return render_template("quiz.html", questions=questions)
 
 
+@app.route("/quiz/explanations")
+def quiz_explanations():
+    """Explanations that were still being generated when result.html rendered."""
+    results = session.get("last_results") or []
+    tokens = {r.get("explanation_token") for r in results if r.get("explanation_pending")}
+
+    explanations = {}
+    pending = []
+    for token in tokens:
+        late = collect_late_explanations(token)
+        explanations.update(late["explanations"])
+        pending.extend(late["pending"])
+
+    if explanations:
+        for idx, text in explanations.items():
+            results[idx]["explanation"] = text
+            results[idx].pop("explanation_pending", None)
+            results[idx].pop("explanation_token", None)
+        session["last_results"] = results
+
+    return jsonify({
+        "explanations": {str(idx): text for idx, text in explanations.items()},
+        "pending": sorted(pending),
+    })
+
+
 # -----------------------------------------------------
 # 3️⃣ STUDY BUDDY MATCH PAGE
 # -----------------------------------------------------
@@ -132,15 +357,40 @@ def studybuddy_result():
     skills = session.get("extracted_skills")
     email = session.get("user_email")
 
+    # Add this student to the pool so later students can be matched with them
+    if email and skills and score is not None:
+        get_partner_store().register({"email": email, "skills": skills, "score": score})
+
+    get_partner_store().sync(partner_index)
     partner = match_partner_smart(
         score=score,
         user_skills=skills,
-        user_email=email
+        user_email=email,
+        index=partner_index
     )
 
     return render_template("partner_match.html", partner=partner)
 
 
+# -----------------------------------------------------
+# 4️⃣ LEADERBOARD
+# -----------------------------------------------------
+@app.route("/leaderboard")
+def leaderboard():
+    skill = request.args.get("skill", GLOBAL)
+    try:
+        size = min(100, max(1, int(request.args.get("n", 20))))
+    except ValueError:
+        size = 20
+
+    get_leaderboard_store().sync(rankings)
+    return render_template("leaderboard.html",
+                           skill=skill,
+                           skills=rankings.skills(),
+                           rows=rankings.top(skill, size),
+                           me=rankings.rank(session.get("user_email"), skill))
+
+
 # -----------------------------------------------------
 if __name__ == "__main__":
     print("[INFO] IntelliResume Flask App Running...")
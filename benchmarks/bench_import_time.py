@@ -0,0 +1,148 @@
+# benchmarks/bench_import_time.py
+"""
+Cold import time of the StudyBuddy modules, checked against a budget.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 9 --json imports.json
+    python benchmarks/bench_import_time.py --modules studybuddy.cohort --budget-ms 40
+
+Every sample is a fresh `python -X importtime -c "import <module>"`; the
+module's cumulative time is taken from that report (the interpreter's own
+startup is not included). The median over --repeat runs is compared with the
+budget, and the heaviest imports it pulled in are listed so a regression is
+easy to trace.
+
+Importing a module must also not load the heavy dependencies listed in
+HEAVY_DEPENDENCIES (they are imported on first use), nor create files such as
+the SQLite stores (each sample runs in an empty working directory); these
+checks do not depend on machine speed. The exit status is 1 if any module is
+over budget, loads one of them or writes files, so the script can run as a
+CI gate.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> budget in milliseconds (median cumulative import time)
+BUDGETS_MS = {
+    "studybuddy": 10,
+    "resume_skill_quiz": 10,
+    "studybuddy.skill_extractor": 50,
+    "studybuddy.matching": 50,
+    "studybuddy.mistral_api": 50,
+    "studybuddy.quiz_generator": 100,
+    "studybuddy.cohort": 50,
+    "studybuddy.leaderboard": 50,
+    "resume_skill_quiz.batch_ingest": 80,
+}
+
+HEAVY_DEPENDENCIES = ("requests", "PyPDF2", "mistralai", "sklearn", "numpy", "docx2txt", "docx")
+
+
+def _parse_importtime(stderr):
+    """[(name, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def sample(module):
+    """One cold import of `module` in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+        created = sorted(os.path.relpath(os.path.join(d, f), cwd)
+                         for d, _, files in os.walk(cwd) for f in files)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = _parse_importtime(proc.stderr)
+    own = [r for r in rows if r[0] == module]
+    if not own:
+        raise RuntimeError(f"no importtime entry for {module}")
+    start = rows.index(own[-1])
+    # the module's own subtree: the rows printed before it at a deeper level
+    first = start
+    while first > 0 and rows[first - 1][3] > own[-1][3]:
+        first -= 1
+    subtree = rows[first:start]
+    return {
+        "cumulative_ms": own[-1][2] / 1000,
+        "created_files": created,
+        "loaded": sorted({r[0] for r in rows}),
+        "children": [(name, cum / 1000) for name, _, cum, depth in subtree if depth == own[-1][3] + 1],
+    }
+
+
+def measure(module, repeat):
+    sample(module)  # first run writes the bytecode caches
+    runs = [sample(module) for _ in range(repeat)]
+    loaded = set(runs[-1]["loaded"])
+    heavy = sorted(dep for dep in HEAVY_DEPENDENCIES if dep in loaded)
+    children = sorted(runs[-1]["children"], key=lambda c: -c[1])[:5]
+    return {
+        "median_ms": round(statistics.median(r["cumulative_ms"] for r in runs), 2),
+        "min_ms": round(min(r["cumulative_ms"] for r in runs), 2),
+        "max_ms": round(max(r["cumulative_ms"] for r in runs), 2),
+        "modules_loaded": len(loaded),
+        "heavy_dependencies": heavy,
+        "created_files": runs[-1]["created_files"],
+        "heaviest_imports": [{"module": name, "ms": round(ms, 2)} for name, ms in children],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check StudyBuddy import time against a budget.")
+    parser.add_argument("--modules", nargs="+", help="modules to measure (default: all with a budget)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="one budget for every measured module")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or list(BUDGETS_MS)
+    results = {}
+    failed = False
+    print(f"{'module':<34} {'median_ms':>10} {'budget_ms':>10}  status")
+    for module in modules:
+        r = measure(module, args.repeat)
+        budget = args.budget_ms if args.budget_ms is not None else BUDGETS_MS.get(module)
+        r["budget_ms"] = budget
+        problems = []
+        if budget is not None and r["median_ms"] > budget:
+            problems.append("over budget")
+        if r["heavy_dependencies"]:
+            problems.append("loads " + ", ".join(r["heavy_dependencies"]))
+        if r["created_files"]:
+            problems.append("creates " + ", ".join(r["created_files"]))
+        r["ok"] = not problems
+        failed = failed or bool(problems)
+        results[module] = r
+        status = "ok" if r["ok"] else "FAIL: " + "; ".join(problems)
+        print(f"{module:<34} {r['median_ms']:>10.2f} {budget if budget is not None else '-':>10}  {status}")
+        if not r["ok"]:
+            for child in r["heaviest_imports"]:
+                print(f"    {child['module']:<30} {child['ms']:>8.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# benchmarks/bench_parse_json.py
+"""
+Quiz JSON extraction: the old bracket-stack _try_parse_json vs the current one.
+
+    python benchmarks/bench_parse_json.py
+    python benchmarks/bench_parse_json.py --fuzz 500 --json parse.json
+
+Three parts:
+  - corpus: captured LLM replies in benchmarks/llm_outputs.jsonl (code fences,
+    prose around the JSON, brackets inside strings, trailing commas,
+    truncated replies, ...). Each line records how many valid questions a
+    correct parser should recover, and optionally the answer key ("answers")
+    that normalization must produce; a wrong key fails the run.
+  - fuzz: clean replies from the corpus with random glitches applied
+    (fences, prose with stray brackets and quotes, trailing commas, an example
+    block first, truncation).
+  - speed: parse time for replies from 5 to 500 questions.
+
+A reply that yields no valid question means generate_quiz() returns [] and the
+quiz has to be generated again, so failures are reported as extra LLM calls.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEMETRY_LOG_SPANS", "0")  # one log line per span would drown the results
+
+from studybuddy.mistral_api import _try_parse_json  # noqa: E402
+from studybuddy.quiz_generator import _normalize_questions  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_outputs.jsonl")
+
+
+def legacy_try_parse_json(text):
+    """The previous implementation, kept verbatim for comparison."""
+    if not text:
+        return None
+
+    try:
+        return json.loads(text)
+    except:  # noqa: E722
+        pass
+
+    start = None
+    for i, c in enumerate(text):
+        if c in ["{", "["]:
+            start = i
+            break
+
+    if start is None:
+        return None
+
+    stack = []
+    for j in range(start, len(text)):
+        if text[j] in ["{", "["]:
+            stack.append(text[j])
+        elif text[j] in ["}", "]"]:
+            stack.pop()
+            if not stack:
+                try:
+                    return json.loads(text[start:j+1])
+                except:  # noqa: E722
+                    return None
+    return None
+
+
+def current_try_parse_json(text):
+    return _try_parse_json(text, want="quiz")
+
+
+PARSERS = {"legacy": legacy_try_parse_json, "current": current_try_parse_json}
+
+
+def valid_questions(parsed):
+    """Number of usable MCQs, using the same shape checks as generate_quiz()."""
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("quiz"), list):
+        return 0
+    count = 0
+    for q in parsed["quiz"]:
+        if (isinstance(q, dict) and isinstance(q.get("question"), str)
+                and isinstance(q.get("options"), list) and len(q["options"]) == 4
+                and str(q.get("answer", "")).strip()[:1].upper() in ("A", "B", "C", "D")):
+            count += 1
+    return count
+
+
+def safe_parse(parser, text):
+    try:
+        return parser(text)
+    except Exception:
+        # the old parser raises IndexError on an unmatched closer
+        return None
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def run_corpus(samples):
+    report = {}
+    for name, parser in PARSERS.items():
+        rows = []
+        for s in samples:
+            got = valid_questions(safe_parse(parser, s["text"]))
+            rows.append({"id": s["id"], "expected": s["expect"], "got": got})
+        answerable = [r for r in rows if r["expected"]]
+        report[name] = {
+            "samples": len(rows),
+            "exact": sum(1 for r in rows if r["got"] == r["expected"]),
+            "failed": sum(1 for r in answerable if r["got"] == 0),
+            "questions": sum(r["got"] for r in rows),
+            "expected_questions": sum(r["expected"] for r in rows),
+            "misses": [r for r in rows if r["got"] != r["expected"]],
+        }
+    return report
+
+
+def run_answer_keys(samples):
+    """Samples whose normalized answer letters differ from their recorded "answers"."""
+    wrong = []
+    for s in samples:
+        if "answers" not in s:
+            continue
+        got = [q["answer"] for q in _normalize_questions(current_try_parse_json(s["text"]))]
+        if got != s["answers"]:
+            wrong.append({"id": s["id"], "expected": s["answers"], "got": got})
+    return wrong
+
+
+def _glitch(text, rng):
+    """Apply 1-3 random LLM-style glitches to a clean JSON reply."""
+    kinds = rng.sample(["fence", "prose", "stray", "commas", "example", "truncate"], rng.randint(1, 3))
+    if "commas" in kinds:
+        text = text.replace("\n    }", ",\n    }").replace("\n  ]", ",\n  ]")
+    if "truncate" in kinds:
+        text = text[:rng.randint(len(text) // 2, len(text) - 1)]
+    if "example" in kinds:
+        text = 'Format: {"quiz": [{"question": "...", "options": ["A", "B", "C", "D"]}]}\n' + text
+    if "fence" in kinds:
+        text = "```json\n" + text + "\n```"
+    if "prose" in kinds:
+        text = rng.choice(["Sure! Here's your quiz:\n", "Here is the \"quiz\" JSON:\n\n"]) + text
+    if "stray" in kinds:
+        text = rng.choice(["Options use A-D] labels.\n", "(see notes {below)\n", "Answer key: [A, B}\n"]) + text
+    return text, kinds
+
+
+def run_fuzz(samples, n, seed=11):
+    rng = random.Random(seed)
+    clean = [s["text"] for s in samples if s["kind"] in ("clean", "brackets-in-strings", "escaped-quotes")]
+    stats = {name: {"failed": 0, "questions": 0} for name in PARSERS}
+    by_glitch = {}
+    for _ in range(n):
+        text, kinds = _glitch(rng.choice(clean), rng)
+        for name, parser in PARSERS.items():
+            got = valid_questions(safe_parse(parser, text))
+            stats[name]["questions"] += got
+            if not got:
+                stats[name]["failed"] += 1
+                for k in kinds:
+                    by_glitch.setdefault(k, {p: 0 for p in PARSERS})[name] += 1
+    for name in PARSERS:
+        stats[name]["failure_rate"] = round(stats[name]["failed"] / n, 4) if n else 0.0
+    return {"replies": n, "parsers": stats, "failures_by_glitch": by_glitch,
+            "regenerations_avoided": stats["legacy"]["failed"] - stats["current"]["failed"]}
+
+
+def run_speed(samples, sizes=(5, 50, 500), repeat=20):
+    base = json.loads(samples[0]["text"])["quiz"]
+    results = []
+    for size in sizes:
+        quiz = {"quiz": [base[i % len(base)] for i in range(size)]}
+        # prose and a fence force both parsers past the whole-text json.loads
+        text = "Here you go:\n```json\n" + json.dumps(quiz, indent=2) + "\n```"
+        row = {"questions": size, "chars": len(text)}
+        for name, parser in PARSERS.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                safe_parse(parser, text)
+            row[f"{name}_ms"] = round((time.perf_counter() - started) / repeat * 1000, 3)
+        results.append(row)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LLM quiz JSON extraction.")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--fuzz", type=int, default=300, help="number of fuzzed replies")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    samples = load_corpus(args.corpus)
+    results = {
+        "corpus": run_corpus(samples),
+        "answer_keys": run_answer_keys(samples),
+        "fuzz": run_fuzz(samples, args.fuzz, seed=args.seed),
+        "speed": run_speed(samples),
+    }
+
+    print(f"{'corpus':<10} {'exact':>7} {'failed':>7} {'questions':>10}")
+    for name, r in results["corpus"].items():
+        print(f"{name:<10} {r['exact']:>3}/{r['samples']:<3} {r['failed']:>7} "
+              f"{r['questions']:>4}/{r['expected_questions']:<5}")
+    for r in results["answer_keys"]:
+        print(f"WRONG ANSWER KEY {r['id']}: expected {r['expected']}, got {r['got']}")
+    fuzz = results["fuzz"]
+    print(f"\nfuzz ({fuzz['replies']} replies)")
+    for name, r in fuzz["parsers"].items():
+        print(f"{name:<10} failed {r['failed']:>4} ({r['failure_rate']:.1%})  questions {r['questions']}")
+    print(f"regeneration calls avoided: {fuzz['regenerations_avoided']}")
+    print(f"\n{'questions':>9} {'chars':>8} {'legacy_ms':>10} {'current_ms':>11}")
+    for row in results["speed"]:
+        print(f"{row['questions']:>9} {row['chars']:>8} {row['legacy_ms']:>10} {row['current_ms']:>11}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if results["answer_keys"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# benchmarks/bench_partner_topk.py
+"""
+Top-k partner search: brute force vs the exact index.
+
+    python benchmarks/bench_partner_topk.py
+    python benchmarks/bench_partner_topk.py --sizes 1000 10000 100000 --k 10 --json topk.json
+
+Brute force scores every partner with the same TF-IDF cosine and fully
+sorts; "exact" is top_partners() over the sparse index with heap selection.
+Recall@k is measured against brute force on the same queries and is
+tie-aware: a returned partner counts as a hit when its score reaches the k-th
+best score (many students share identical skill sets, so which of the tied
+ones is returned is arbitrary).
+
+An approximate (SimHash LSH) search was tried and removed: at 100k partners
+and k=10 it reached a recall@10 of about 0.5 and was slower than the exact
+index, which needs no candidate generation because a query only touches
+partners that share a skill.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEMETRY_LOG_SPANS", "0")  # one log line per span would drown the results
+
+from studybuddy.matching import PartnerIndex, top_partners, _score_bonus, _skill_terms  # noqa: E402
+
+
+def synthetic_pool(n, vocab_size=400, skills_per_partner=3, seed=7):
+    """Partners with Zipf-distributed skill popularity (a few very common skills)."""
+    rng = random.Random(seed)
+    vocab = [f"skill-{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(vocab_size)]
+    partners = []
+    for i in range(n):
+        skills = set()
+        while len(skills) < skills_per_partner:
+            skills.add(rng.choices(vocab, weights)[0])
+        partners.append({"name": f"Student {i}", "email": f"s{i}@cmrit.ac.in",
+                         "skills": sorted(skills), "score": rng.randint(1, 5), "bio": ""})
+    return partners, vocab, weights
+
+
+def brute_force(index, partners, score, user_skills, k):
+    query = {}
+    for s in user_skills:
+        for t in _skill_terms(s):
+            query[t] = query.get(t, 0) + 1
+    weights = {t: tf * index.idf(t) for t, tf in query.items()}
+    qnorm = math.sqrt(sum(w * w for w in weights.values()))
+    scored = []
+    for order, cand in enumerate(partners):
+        terms = {}
+        for s in cand["skills"]:
+            for t in _skill_terms(s):
+                terms[t] = terms.get(t, 0) + 1
+        rnorm = math.sqrt(sum((tf * index.idf(t)) ** 2 for t, tf in terms.items()))
+        dot = sum(w * terms.get(t, 0) * index.idf(t) for t, w in weights.items())
+        sim = dot / (qnorm * rnorm) if qnorm and rnorm else 0.0
+        scored.append((sim + _score_bonus(score, cand), -order, cand["email"]))
+    scored.sort(reverse=True)
+    return [(round(final, 4), email) for final, _, email in scored[:k]]
+
+
+def _recall(found, reference, k):
+    """Tie-aware recall@k of `found` [(score, email)] against `reference`."""
+    if not reference:
+        return 1.0
+    kth = reference[-1][0]
+    return min(k, sum(1 for score, _ in found if score >= kth - 1e-4)) / min(k, len(reference))
+
+
+def _timed(fn, queries):
+    out = []
+    started = time.perf_counter()
+    for q in queries:
+        out.append(fn(q))
+    elapsed = time.perf_counter() - started
+    return out, elapsed / max(1, len(queries)) * 1000.0
+
+
+def run(sizes, k=10, queries=100, brute_limit=100000, seed=11):
+    rows_out = []
+    for n in sizes:
+        partners, vocab, weights = synthetic_pool(n)
+        rng = random.Random(seed)
+        qs = [(rng.randint(1, 5), sorted({rng.choices(vocab, weights)[0] for _ in range(3)}))
+              for _ in range(queries)]
+
+        build_start = time.perf_counter()
+        index = PartnerIndex(partners)
+        build_ms = (time.perf_counter() - build_start) * 1000.0
+
+        exact, exact_ms = _timed(
+            lambda q: [(r["similarity"], r["email"])
+                       for r in top_partners(q[0], q[1], k=k, index=index)], qs)
+
+        row = {"partners": n, "k": k, "queries": queries, "index_build_ms": round(build_ms, 2),
+               "exact_ms": round(exact_ms, 4)}
+
+        if n <= brute_limit:
+            brute, brute_ms = _timed(lambda q: brute_force(index, partners, q[0], q[1], k), qs)
+            row["brute_ms"] = round(brute_ms, 4)
+            row["exact_recall"] = round(sum(_recall(a, b, k) for a, b in zip(exact, brute)) / len(qs), 4)
+        rows_out.append(row)
+        print(json.dumps(row))
+    return rows_out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--brute-limit", type=int, default=100000,
+                        help="skip brute force above this pool size")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, k=args.k, queries=args.queries, brute_limit=args.brute_limit)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/mock_mistral.py
+"""
+Deterministic stand-in for the Mistral chat-completions API.
+
+    python benchmarks/mock_mistral.py --port 8765 --latency 0.2
+    MISTRAL_URL=http://127.0.0.1:8765/v1/chat/completions MISTRAL_API_KEY=dummy python app.py
+
+Replies are derived from the prompt only, so repeated runs see identical
+output:
+  - quiz prompts ("Generate N multiple-choice questions for these skills: ...")
+    get N well-formed MCQs spread over the listed skills
+  - batch explanation prompts get one explanation per numbered item
+  - anything else gets a short explanation
+"stream": true is answered with SSE chunks (usage in the last one).
+`latency` delays every reply, `chunk_delay` every SSE chunk, and
+`fail_every` answers every n-th request with 503 to exercise retries.
+Exposes:
+ - start_mock_server(port=0, latency=0.0, chunk_delay=0.0, fail_every=0) -> (server, url)
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_QUIZ_PROMPT = re.compile(r"Generate (\d+) multiple-choice questions for these skills: (.+?)\.\n")
+_NUMBERED = re.compile(r"^(\d+)\. Question:", re.MULTILINE)
+
+
+def quiz_reply(num_questions, skills):
+    skills = [s.strip() for s in skills.split(",") if s.strip()] or ["General"]
+    quiz = []
+    for i in range(num_questions):
+        skill = skills[i % len(skills)]
+        quiz.append({
+            "question": f"Which statement about {skill} is correct? (#{i + 1})",
+            "options": [f"{skill} fact {i + 1}", "An unrelated claim", "A common misconception", "None of these"],
+            "answer": "A",
+            "explanation": f"Option A states fact {i + 1} about {skill}; the others do not apply.",
+            "skill": skill,
+        })
+    return json.dumps({"quiz": quiz}, indent=2)
+
+
+def reply_for(prompt):
+    m = _QUIZ_PROMPT.search(prompt)
+    if m:
+        return quiz_reply(int(m.group(1)), m.group(2))
+    numbered = _NUMBERED.findall(prompt)
+    if numbered and '"explanations"' in prompt:
+        return json.dumps({"explanations": [
+            {"index": int(n), "explanation": f"Item {n}: the chosen option contradicts the definition."}
+            for n in numbered
+        ]})
+    return "The selected option contradicts the definition; the correct option matches it."
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        self._json(200, self.server.stats())
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        n = server.count_request()
+        if server.fail_every and n % server.fail_every == 0:
+            server.count("failed")
+            self._json(503, {"message": "mock overload"})
+            return
+
+        prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+        content = reply_for(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if server.latency:
+            time.sleep(server.latency)
+
+        if not payload.get("stream"):
+            server.count("chat")
+            self._json(200, {"id": f"mock-{n}", "model": payload.get("model"),
+                             "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                          "finish_reason": "stop"}],
+                             "usage": usage})
+            return
+
+        server.count("stream")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        size = server.chunk_chars
+        for i in range(0, len(content), size):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + size]}}]}
+            if i + size >= len(content):
+                chunk["usage"] = usage
+            self.wfile.write(("data: " + json.dumps(chunk) + "\n\n").encode("utf-8"))
+            self.wfile.flush()
+            if server.chunk_delay:
+                time.sleep(server.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class MockMistralServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, chunk_delay=0.0, fail_every=0, chunk_chars=24):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.fail_every = fail_every
+        self.chunk_chars = chunk_chars
+        self._counts = {"requests": 0, "chat": 0, "stream": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self._counts["requests"] += 1
+            return self._counts["requests"]
+
+    def count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+
+def start_mock_server(port=0, latency=0.0, chunk_delay=0.0, fail_every=0):
+    """Serve on 127.0.0.1:`port` (0 = any free port) in a daemon thread."""
+    server = MockMistralServer(("127.0.0.1", port), latency=latency, chunk_delay=chunk_delay,
+                               fail_every=fail_every)
+    threading.Thread(target=server.serve_forever, name="mock-mistral", daemon=True).start()
+    return server, server.url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic mock Mistral chat-completions server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between SSE chunks")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request with 503")
+    args = parser.parse_args(argv)
+
+    server = MockMistralServer(("127.0.0.1", args.port), latency=args.latency,
+                               chunk_delay=args.chunk_delay, fail_every=args.fail_every)
+    print(f"[mock_mistral] listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
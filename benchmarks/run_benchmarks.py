@@ -0,0 +1,453 @@
+# benchmarks/run_benchmarks.py
+"""
+Reproducible benchmarks for StudyBuddy's hot paths.
+
+    python benchmarks/run_benchmarks.py                       # full run, JSON to benchmarks/results/
+    python benchmarks/run_benchmarks.py --quick               # smaller sizes, for a quick check
+    python benchmarks/run_benchmarks.py --only match parse --compare benchmarks/results/<old>.json
+
+Suites:
+  - extract_text: extract_text_from_resume over synthetic PDF/DOCX resumes
+  - extract_skills: SkillMatcher compile + extraction as SKILLS_DB grows
+  - parse: _try_parse_json on the recorded replies in benchmarks/llm_outputs.jsonl
+  - grade: evaluate_quiz_answers in each explanation mode, explainer = mock Mistral
+  - quiz: LLM quiz generation, one prompt vs per-skill fan-out (time to first / all questions)
+  - match: match_partner_smart against 10^2..10^5 synthetic partners
+  - leaderboard: recording an attempt, top-20 and "my rank" with 10^3..10^5 students ranked
+
+Every LLM call goes to benchmarks/mock_mistral.py on localhost (fixed latency),
+and all inputs come from fixed seeds, so numbers are comparable between
+commits. Results are written as JSON together with the commit they ran on;
+--compare prints the relative change of every timing against an older file.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from mock_mistral import start_mock_server  # noqa: E402
+
+SUITES = ("extract_text", "extract_skills", "parse", "grade", "quiz", "match", "leaderboard")
+EXPLAIN_LATENCY = 0.05  # mock Mistral reply delay for the grading suite
+QUIZ_LATENCY = 0.1  # mock time to first token for the quiz suite
+QUIZ_CHUNK_DELAY = 0.004  # per streamed chunk, so reply time grows with output length
+
+FIRST_NAMES = ["Aarav", "Neha", "Rohit", "Sana", "Kabir", "Isha", "Dev", "Maya", "Anuj", "Rhea"]
+LAST_NAMES = ["Mehta", "Gupta", "Sharma", "Rao", "Singh", "Verma", "Patel", "Nair", "Kulkarni", "Iyer"]
+FILLER = ("Worked with a team of students to design, build and ship a project end to end. "
+          "Responsible for requirements, implementation, code review and deployment. ")
+
+
+def _configure_environment(mock_url):
+    """Point StudyBuddy at the mock server and keep caches in memory, before importing it."""
+    os.environ["MISTRAL_URL"] = mock_url
+    os.environ["MISTRAL_API_KEY"] = "benchmark"
+    os.environ["QUIZ_CACHE_PATH"] = ""
+    os.environ["QUESTION_BANK_PATH"] = ""
+    os.environ["TELEMETRY_LOG_SPANS"] = "0"
+
+
+def _timings(samples):
+    """Summary of a list of durations in seconds, reported in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(p95 * 1000, 4),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+# -------------------------------------------------------------------
+# Synthetic resumes
+# -------------------------------------------------------------------
+def synthetic_resume(rng, skills_db, pages=1):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    email = name.lower().replace(" ", ".") + f"{rng.randint(1, 99)}@cmrit.ac.in"
+    skills = rng.sample(skills_db, min(len(skills_db), rng.randint(6, 14)))
+    lines = [name, email, "", "SKILLS", ", ".join(skills), "", "EXPERIENCE"]
+    for p in range(pages):
+        for j in range(12):
+            lines.append(f"Project {p * 12 + j + 1}: used {rng.choice(skills)} and {rng.choice(skills)}. "
+                         + FILLER[:rng.randint(60, len(FILLER))])
+    return "\n".join(lines), skills
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(text, lines_per_page=40):
+    """Minimal multi-page PDF (Helvetica text) that PyPDF2 can read back."""
+    lines = text.split("\n")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[""]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page_lines in pages:
+        body = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects.append(f"<< /Length {len(body.encode('latin-1', 'replace'))} >>\nstream\n{body}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for off in offsets:
+        out.write(f"{off:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_docx(text):
+    """Minimal .docx (one paragraph per line)."""
+    from xml.sax.saxutils import escape
+    paragraphs = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>"
+                         for line in text.split("\n"))
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f"<w:body>{paragraphs}</w:body></w:document>")
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml",
+                   '<?xml version="1.0" encoding="UTF-8"?>'
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/'
+                   'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        z.writestr("_rels/.rels",
+                   '<?xml version="1.0" encoding="UTF-8"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                   'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        z.writestr("word/document.xml", document)
+    return out.getvalue()
+
+
+# -------------------------------------------------------------------
+# Suites
+# -------------------------------------------------------------------
+def bench_extract_text(quick):
+    from resume_skill_quiz import extractor
+    from studybuddy.skill_extractor import extract_text_from_resume
+
+    rng = random.Random(19)
+    per_size = 5 if quick else 20
+    results = {}
+    # PyPDF2 is imported on the first PDF; keep that out of the timings
+    extract_text_from_resume(make_pdf("warm up"), filename="resume.pdf")
+    for pages in (1, 3, 8):
+        docs = [make_pdf(synthetic_resume(rng, extractor.SKILLS_DB, pages)[0]) for _ in range(per_size)]
+        samples, chars = [], 0
+        for data in docs:
+            elapsed, text = _timed(extract_text_from_resume, data, filename="resume.pdf")
+            samples.append(elapsed)
+            chars += len(text)
+        results[f"pdf_{pages}p"] = dict(_timings(samples), bytes=sum(map(len, docs)) // len(docs),
+                                        chars=chars // len(docs))
+
+    if extractor._load_docx2txt() is None:
+        results["docx"] = {"skipped": "docx2txt not installed"}
+    else:
+        docs = [make_docx(synthetic_resume(rng, extractor.SKILLS_DB, 3)[0]) for _ in range(per_size)]
+        samples = [_timed(extract_text_from_resume, d, filename="resume.docx")[0] for d in docs]
+        results["docx"] = _timings(samples)
+    return results
+
+
+def bench_extract_skills(quick):
+    from resume_skill_quiz.extractor import SKILLS_DB, SKILL_ALIASES, SkillMatcher
+
+    rng = random.Random(23)
+    texts = [synthetic_resume(rng, SKILLS_DB, 2)[0] for _ in range(10 if quick else 40)]
+    sizes = [len(SKILLS_DB), 500, 2000] + ([] if quick else [10000])
+    results = {}
+    for size in sizes:
+        extra = [f"Framework {i} Toolkit" if i % 3 else f"Lang{i}" for i in range(size - len(SKILLS_DB))]
+        compile_time, matcher = _timed(SkillMatcher, list(SKILLS_DB) + extra, SKILL_ALIASES)
+        samples = []
+        found = 0
+        for text in texts:
+            elapsed, skills = _timed(matcher.extract, text)
+            samples.append(elapsed)
+            found += len(skills)
+        results[str(size)] = dict(_timings(samples), compile_ms=round(compile_time * 1000, 3),
+                                  skills_per_resume=round(found / len(texts), 2))
+    return results
+
+
+def bench_parse(quick):
+    from studybuddy.mistral_api import _try_parse_json
+
+    with open(os.path.join(HERE, "llm_outputs.jsonl"), encoding="utf-8") as fh:
+        corpus = [json.loads(line) for line in fh if line.strip()]
+    repeat = 20 if quick else 200
+    samples, parsed = [], 0
+    for item in corpus:
+        result = None
+        for _ in range(repeat):
+            elapsed, result = _timed(_try_parse_json, item["text"], want="quiz")
+            samples.append(elapsed)
+        if isinstance(result, dict) and result.get("quiz"):
+            parsed += 1
+    return {"corpus": dict(_timings(samples), replies=len(corpus), parsed=parsed)}
+
+
+def bench_grade(quick, mock):
+    from studybuddy import quiz_generator
+
+    def quiz(explained):
+        return [{"question": f"Question {i}?", "options": ["a", "b", "c", "d"], "answer": "A",
+                 "explanation": "Because A." if explained else "", "skill": "Python"} for i in range(5)]
+
+    answers = ["B", "C", "A", "D", "B"]  # four wrong
+    rounds = 2 if quick else 5
+    results = {}
+
+    samples = [_timed(quiz_generator.evaluate_quiz_answers, quiz(True), answers)[0] for _ in range(rounds * 20)]
+    results["stored_explanations"] = _timings(samples)
+
+    mock.latency = EXPLAIN_LATENCY
+    try:
+        for mode in ("serial", "concurrent", "batch"):
+            before = mock.stats()["requests"]
+            samples = [
+                _timed(quiz_generator.evaluate_quiz_answers, quiz(False), answers, explain_mode=mode, deadline=30)[0]
+                for _ in range(rounds)
+            ]
+            calls = (mock.stats()["requests"] - before) / rounds
+            results[mode] = dict(_timings(samples), llm_calls=calls, mock_latency_ms=EXPLAIN_LATENCY * 1000)
+    finally:
+        mock.latency = 0.0
+    return results
+
+
+def bench_quiz(quick, mock):
+    from studybuddy import quiz_generator
+
+    rounds = 5 if quick else 20
+    results = {}
+    mock.latency, mock.chunk_delay = QUIZ_LATENCY, QUIZ_CHUNK_DELAY
+    fanout = quiz_generator.QUIZ_FANOUT
+    try:
+        for mode in ("single", "fanout"):
+            quiz_generator.QUIZ_FANOUT = mode == "fanout"
+            before = mock.stats()["requests"]
+            first, full, counts = [], [], []
+            for r in range(rounds):
+                # fresh skill names each round: no coalescing or caching between rounds
+                skills = [f"{mode} topic {r}-{i}" for i in range(3)]
+                started = time.perf_counter()
+                got = 0
+                for _ in quiz_generator._generate_quiz_llm(skills, 5):
+                    if not got:
+                        first.append(time.perf_counter() - started)
+                    got += 1
+                full.append(time.perf_counter() - started)
+                counts.append(got)
+            results[mode] = {
+                "first_question": _timings(first),
+                "full_quiz": _timings(full),
+                "questions": round(statistics.fmean(counts), 2),
+                "llm_calls": (mock.stats()["requests"] - before) / rounds,
+            }
+    finally:
+        quiz_generator.QUIZ_FANOUT = fanout
+        mock.latency = mock.chunk_delay = 0.0
+    return results
+
+
+def bench_match(quick):
+    from bench_partner_topk import synthetic_pool
+    from studybuddy.matching import PartnerIndex, match_partner_smart
+
+    sizes = [100, 1000, 10000] + ([] if quick else [100000])
+    results = {}
+    for n in sizes:
+        pool = synthetic_pool(n)[0]
+        build_time, index = _timed(PartnerIndex, pool)
+        rng = random.Random(29)
+        samples = []
+        for _ in range(50 if quick else 200):
+            user = rng.choice(pool)
+            samples.append(_timed(match_partner_smart, user["score"], user["skills"],
+                                  user_email=user["email"], index=index)[0])
+        results[str(n)] = dict(_timings(samples), build_ms=round(build_time * 1000, 2))
+    return results
+
+
+def bench_leaderboard(quick):
+    from studybuddy.leaderboard import Leaderboard, LeaderboardStore
+
+    sizes = [1000, 10000] + ([] if quick else [100000])
+    skills = ["Python", "SQL", "Flask", "React", "Docker", "AWS"]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            store = LeaderboardStore(os.path.join(tmp, f"leaderboard-{n}.sqlite3"))
+            rng = random.Random(31)
+            # bulk-load n students straight into the best-score table, then time live traffic on top
+            rows = []
+            for i in range(n):
+                email = f"student{i}@cmrit.ac.in"
+                for skill, correct in (("", rng.randint(0, 10)), (rng.choice(skills), rng.randint(0, 10))):
+                    rows.append((skill, email, correct, correct / 10, rng.random(), i + 1))
+            with store.pool.connection() as conn:
+                conn.executemany(
+                    "INSERT INTO leaderboard_best (skill, email, correct, total, pct, attempts, updated, rev)"
+                    " VALUES (?, ?, ?, 10, ?, 1, ?, ?)",
+                    rows,
+                )
+            board = Leaderboard()
+            sync_time, _ = _timed(store.sync, board)
+
+            record, top, rank = [], [], []
+            for _ in range(200 if quick else 1000):
+                email = f"student{rng.randrange(n)}@cmrit.ac.in"
+                graded = [{"skill": rng.choice(skills), "is_correct": rng.random() < 0.6} for _ in range(10)]
+                record.append(_timed(store.record, email, sum(r["is_correct"] for r in graded), 10, graded)[0])
+                store.sync(board)
+                top.append(_timed(board.top, n=20)[0])
+                rank.append(_timed(board.rank, email)[0])
+            results[str(n)] = {
+                "record": _timings(record),
+                "top20": _timings(top),
+                "rank": _timings(rank),
+                "initial_sync_ms": round(sync_time * 1000, 2),
+            }
+            store.pool.close()
+    return results
+
+
+# -------------------------------------------------------------------
+# Reporting
+# -------------------------------------------------------------------
+def _git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, timeout=10).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, timeout=10).stdout.strip())
+        return rev or "unknown", dirty
+    except Exception:
+        return "unknown", False
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, path + ".")
+        elif isinstance(value, (int, float)) and key.endswith("_ms"):
+            yield path, value
+
+
+def compare(current, baseline):
+    """Print every timing that exists in both runs with its relative change."""
+    old = dict(_flatten(baseline.get("results", {})))
+    rows = [(path, old[path], value) for path, value in _flatten(current["results"]) if path in old]
+    print(f"\ncompared with {baseline.get('meta', {}).get('commit', '?')}:")
+    for path, before, after in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        flag = "  <-- slower" if change > 20 else ""
+        print(f"  {path:<48} {before:>10.3f} -> {after:>10.3f} ms  {change:+7.1f}%{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark StudyBuddy hot paths.")
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="run only these suites")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs and fewer repeats")
+    parser.add_argument("-o", "--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    mock, url = start_mock_server()
+    _configure_environment(url)
+    from studybuddy import mistral_api
+    mistral_api._HAS_CLIENT = False  # always go through the pooled HTTP client to the mock
+
+    commit, dirty = _git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "quick": args.quick,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+
+    for suite in args.only or SUITES:
+        print(f"[bench] {suite} ...", file=sys.stderr)
+        started = time.perf_counter()
+        if suite == "extract_text":
+            result = bench_extract_text(args.quick)
+        elif suite == "extract_skills":
+            result = bench_extract_skills(args.quick)
+        elif suite == "parse":
+            result = bench_parse(args.quick)
+        elif suite == "grade":
+            result = bench_grade(args.quick, mock)
+        elif suite == "quiz":
+            result = bench_quiz(args.quick, mock)
+        elif suite == "match":
+            result = bench_match(args.quick)
+        else:
+            result = bench_leaderboard(args.quick)
+        report["results"][suite] = result
+        print(f"[bench] {suite} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    report["meta"]["mock_requests"] = mock.stats()
+    mock.shutdown()
+
+    output = args.output or os.path.join(HERE, "results", f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"\nwrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(report, json.load(fh))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
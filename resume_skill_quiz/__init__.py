@@ -4,29 +4,48 @@ resume_skill_quiz package init
 Exports:
   - extract_text_from_resume
   - extract_skills
+  - find_skills
+  - SkillMatcher
   - extract_name
   - extract_email
   - generate_quiz
   - get_explanation
+
+Names are resolved on first access, so importing the package (e.g. from
+studybuddy.skill_extractor) does not import studybuddy back.
 """
 
-from .extractor import extract_text_from_resume, extract_skills, extract_name, extract_email
-
-# Import Mistral helpers from the `studybuddy` package if available.
-# Use absolute import and guard so package import doesn't fail when running
-# the app as a top-level script or in environments where package layout
-# differs.
-try:
-    from studybuddy.mistral_api import generate_quiz, get_explanation
-except Exception:
-    generate_quiz = None
-    get_explanation = None
-
-__all__ = [
-    "extract_text_from_resume",
-    "extract_skills",
-    "extract_name",
-    "extract_email",
-    "generate_quiz",
-    "get_explanation",
-]
+import importlib
+
+_LAZY = {
+    "extract_text_from_resume": "resume_skill_quiz.extractor",
+    "extract_skills": "resume_skill_quiz.extractor",
+    "find_skills": "resume_skill_quiz.extractor",
+    "SkillMatcher": "resume_skill_quiz.extractor",
+    "extract_name": "resume_skill_quiz.extractor",
+    "extract_email": "resume_skill_quiz.extractor",
+    # Mistral helpers live in the `studybuddy` package; they are None when it
+    # cannot be imported (e.g. the package layout differs).
+    "generate_quiz": "studybuddy.mistral_api",
+    "get_explanation": "studybuddy.mistral_api",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        value = getattr(importlib.import_module(module), name)
+    except Exception:
+        if not module.startswith("studybuddy."):
+            raise
+        value = None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
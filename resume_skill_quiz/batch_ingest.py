@@ -0,0 +1,235 @@
+# resume_skill_quiz/batch_ingest.py
+"""
+Bulk resume ingestion.
+
+    python -m resume_skill_quiz.batch_ingest uploads/ -o ingested.jsonl
+    python -m resume_skill_quiz.batch_ingest uploads/ -o ingested.csv --format csv --workers 8
+    python -m resume_skill_quiz.batch_ingest uploads/ -o ingested.jsonl --max-pages 0
+
+PDF/DOCX parsing is spread over a process pool (PyPDF2 is CPU-bound).
+Each result is streamed to the output file as soon as it is ready and the
+file path is appended to a checkpoint, so a crashed run can simply be
+started again and will skip files that were already ingested.
+Every page within the page budget is read: the records feed cohort matching,
+so the app's early exit (RESUME_ENOUGH_SKILLS) never applies here.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .extractor import extract_resume, extract_skills, extract_email, extract_name, RESUME_MAX_PAGES
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+CSV_FIELDS = ["path", "status", "email", "name", "skills", "skill_count", "chars", "pages", "pages_read",
+              "seconds", "error"]
+
+
+def ingest_file(path: str, max_pages: int = RESUME_MAX_PAGES) -> dict:
+    """
+    Extract text, email, name and the full skill list from one resume (runs in
+    a worker process). PDFs are read up to `max_pages` pages (0 = all).
+    """
+    started = time.perf_counter()
+    record = {"path": path, "status": "ok", "email": None, "name": None,
+              "skills": [], "chars": 0, "pages": 0, "pages_read": 0, "seconds": 0.0, "error": None}
+    try:
+        # already in a worker process: parse in-process, and never stop early on skills
+        report = extract_resume(path, max_pages=max_pages, enough_skills=0, sandbox=False)
+        text = report["text"]
+        record["pages"] = report["pages"]
+        record["pages_read"] = report["pages_read"]
+        if report["error"]:
+            record["status"] = "error"
+            record["error"] = report["error"]
+        elif not text.strip():
+            record["status"] = "empty"
+            record["error"] = "no text extracted"
+        else:
+            record["chars"] = len(text)
+            record["email"] = extract_email(text)
+            record["name"] = extract_name(text)
+            record["skills"] = extract_skills(text)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{e.__class__.__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def find_resumes(paths, recursive=False):
+    """Expand files/directories into a sorted list of supported resume paths."""
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            if recursive:
+                for root, _, files in os.walk(p):
+                    found.extend(os.path.join(root, f) for f in files)
+            else:
+                found.extend(os.path.join(p, f) for f in os.listdir(p))
+        else:
+            found.append(p)
+    return sorted(f for f in set(found) if f.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(f))
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+class _ResultWriter:
+    """Streams records to JSONL or CSV, appending when resuming."""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._fh = open(path, "a", encoding="utf-8", newline="")
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._fh, fieldnames=CSV_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self._csv is not None:
+            row = dict(record)
+            row["skills"] = "; ".join(record["skills"])
+            row["skill_count"] = len(record["skills"])
+            self._csv.writerow(row)
+        else:
+            self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+def _crashed_record(path):
+    return {"path": path, "status": "error", "email": None, "name": None, "skills": [], "chars": 0,
+            "pages": 0, "pages_read": 0, "seconds": 0.0,
+            "error": "BrokenProcessPool: worker process died while parsing this file"}
+
+
+def run_batch(files, output, fmt="jsonl", workers=None, checkpoint=None, progress=True,
+              max_pages=RESUME_MAX_PAGES):
+    """
+    Ingest `files` with a process pool and stream records to `output`.
+    A worker that dies (segfault, OOM kill) breaks the pool: finished results
+    are kept, the files that were in flight are re-run one at a time in a
+    fresh single-worker pool to find the one that kills it (recorded as
+    failed), and the batch continues in a new pool.
+    Returns a summary dict with counts, failures and timing.
+    """
+    workers = workers or os.cpu_count() or 1
+    done = load_checkpoint(checkpoint)
+    todo = [f for f in files if f not in done]
+
+    summary = {"total": len(files), "skipped": len(files) - len(todo), "ok": 0,
+               "failed": 0, "failures": [], "cpu_seconds": 0.0, "wall_seconds": 0.0,
+               "workers": workers, "pool_restarts": 0}
+    if not todo:
+        return summary
+
+    writer = _ResultWriter(output, fmt)
+    ckpt = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    started = time.perf_counter()
+    window = workers * 4
+
+    def emit(record):
+        # checkpoint only once the output line is flushed: a crash in between re-ingests, never skips
+        writer.write(record)
+        if ckpt:
+            ckpt.write(record["path"] + "\n")
+            ckpt.flush()
+        summary["cpu_seconds"] += record["seconds"]
+        if record["status"] == "ok":
+            summary["ok"] += 1
+        else:
+            summary["failed"] += 1
+            summary["failures"].append({"path": record["path"], "error": record["error"]})
+        if progress:
+            print(f"[batch_ingest] {record['status']:5} {record['seconds']:.3f}s {record['path']}",
+                  file=sys.stderr)
+
+    pending = deque(todo)
+    suspects = deque()  # in flight when a worker died
+    try:
+        while pending or suspects:
+            if suspects:
+                path = suspects.popleft()
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    try:
+                        emit(pool.submit(ingest_file, path, max_pages).result())
+                    except BrokenProcessPool:
+                        emit(_crashed_record(path))
+                continue
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = {}
+                try:
+                    while pending or in_flight:
+                        while pending and len(in_flight) < window:
+                            path = pending.popleft()
+                            in_flight[pool.submit(ingest_file, path, max_pages)] = path
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            record = fut.result()
+                            del in_flight[fut]
+                            emit(record)
+                except BrokenProcessPool:
+                    summary["pool_restarts"] += 1
+                    for fut, path in in_flight.items():
+                        if fut.done() and not fut.cancelled() and fut.exception() is None:
+                            emit(fut.result())
+                        else:
+                            suspects.append(path)
+                    if progress:
+                        print(f"[batch_ingest] worker died; re-running {len(suspects)} in-flight file(s)"
+                              " one at a time", file=sys.stderr)
+    finally:
+        writer.close()
+        if ckpt:
+            ckpt.close()
+
+    summary["wall_seconds"] = round(time.perf_counter() - started, 4)
+    summary["cpu_seconds"] = round(summary["cpu_seconds"], 4)
+    processed = summary["ok"] + summary["failed"]
+    summary["avg_seconds_per_file"] = round(summary["cpu_seconds"] / processed, 4) if processed else 0.0
+    summary["files_per_second"] = round(processed / summary["wall_seconds"], 2) if summary["wall_seconds"] else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-extract emails and skills from resumes.")
+    parser.add_argument("paths", nargs="+", help="resume files or directories")
+    parser.add_argument("-o", "--output", required=True, help="output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="output format (default: from extension)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="process every file, even if seen before")
+    parser.add_argument("--max-pages", type=int, default=RESUME_MAX_PAGES,
+                        help=f"PDF pages read per resume, 0 = all (default: {RESUME_MAX_PAGES})")
+    parser.add_argument("-r", "--recursive", action="store_true", help="descend into subdirectories")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-file progress lines")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    checkpoint = None if args.no_checkpoint else (args.checkpoint or args.output + ".checkpoint")
+    files = find_resumes(args.paths, recursive=args.recursive)
+
+    summary = run_batch(files, args.output, fmt=fmt, workers=args.workers,
+                        checkpoint=checkpoint, progress=not args.quiet, max_pages=args.max_pages)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
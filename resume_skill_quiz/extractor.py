@@ -1,12 +1,35 @@
 # resume_skill_quiz/extractor.py
+import io
+import os
 import re
-from PyPDF2 import PdfReader
+import time
 
-# docx2txt is optional; we attempt to import it but don't fail if not present.
-try:
-    import docx2txt
-except Exception:
-    docx2txt = None
+# PyPDF2 and docx2txt are imported on the first resume that needs them, so
+# importing this module (and every batch-ingest worker) stays cheap.
+# docx2txt is optional; _load_docx2txt() returns None if it is not installed.
+docx2txt = None
+_docx2txt_checked = False
+
+
+def _load_docx2txt():
+    global docx2txt, _docx2txt_checked
+    if not _docx2txt_checked:
+        try:
+            import docx2txt as module
+            docx2txt = module
+        except Exception:
+            docx2txt = None
+        _docx2txt_checked = True
+    return docx2txt
+
+
+# Page budget and early exit for PDF parsing (0 disables either). Early exit is
+# off by default: the quiz takes the first skills in SKILLS_DB order, so which
+# pages were read would change which skills a student is quizzed on.
+RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "10"))
+RESUME_ENOUGH_SKILLS = int(os.getenv("RESUME_ENOUGH_SKILLS", "0"))
+# Parse in the sandboxed subprocess pool (resume_skill_quiz/sandbox.py)
+RESUME_SANDBOX = os.getenv("RESUME_SANDBOX", "1").lower() not in ("0", "false", "no")
 
 SKILLS_DB = [
     "Python", "Java", "Machine Learning", "SQL", "C++", "HTML", "CSS", "JavaScript",
@@ -19,54 +42,261 @@ SKILLS_DB = [
     "Teamwork", "Problem Solving", "Time Management", "Creativity", "Critical Thinking"
 ]
 
+# Alternative spellings -> canonical SKILLS_DB entry
+SKILL_ALIASES = {
+    "sklearn": "Scikit-learn",
+    "scikit learn": "Scikit-learn",
+    "JS": "JavaScript",
+    "ReactJS": "React",
+    "React.js": "React",
+    "VueJS": "Vue.js",
+    "NodeJS": "Node.js",
+    "ExpressJS": "Express.js",
+    "Postgres": "PostgreSQL",
+    "Mongo": "MongoDB",
+    "GCP": "Google Cloud",
+    "Google Cloud Platform": "Google Cloud",
+    "Amazon Web Services": "AWS",
+    "Microsoft Azure": "Azure",
+    "VSCode": "VS Code",
+    "Visual Studio Code": "VS Code",
+    "PowerBI": "Power BI",
+    "ML": "Machine Learning",
+    "NLP": "Natural Language Processing",
+    "Object Oriented Programming": "OOP",
+    "Object-Oriented Programming": "OOP",
+    "Data Structures and Algorithms": "DSA",
+    "REST APIs": "REST API",
+    "RESTful API": "REST API",
+    "RESTful APIs": "REST API",
+}
+
+_WS = re.compile(r"\s+")
+
+
+def _normalize_term(term: str) -> str:
+    return _WS.sub(" ", term.strip().lower())
+
+
+def _trie_pattern(node) -> str:
+    """Regex for a character trie; longer continuations are tried first."""
+    branches = []
+    for ch in sorted(k for k in node if k):
+        piece = r"\s+" if ch == " " else re.escape(ch)
+        branches.append(piece + _trie_pattern(node[ch]))
+    if not branches:
+        return ""
+    terminal = "" in node
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    body = "(?:" + "|".join(branches) + ")"
+    return body + "?" if terminal else body
+
+
+class SkillMatcher:
+    """
+    Finds every taxonomy skill (and alias) in one left-to-right regex pass.
+    All terms are compiled into a single trie-shaped pattern, so scanning cost
+    does not grow with one rescan per skill. Matches respect word boundaries:
+    "Java" does not fire inside "JavaScript", nor "C" inside "C++"; a trailing
+    version number is allowed ("HTML5", "Python3").
+    """
+
+    def __init__(self, skills, aliases=None):
+        self.skills = list(dict.fromkeys(skills))
+        self._order = {skill: i for i, skill in enumerate(self.skills)}
+        self._canonical = {}
+        for skill in self.skills:
+            self._canonical[_normalize_term(skill)] = skill
+        for alias, skill in (aliases or {}).items():
+            if skill in self._order:
+                self._canonical.setdefault(_normalize_term(alias), skill)
+
+        trie = {}
+        for term in self._canonical:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        self.pattern = re.compile(
+            r"(?<![\w])(" + _trie_pattern(trie) + r")(?![^\W\d]|[+#])",
+            flags=re.IGNORECASE,
+        ) if trie else None
+
+    def find(self, text: str):
+        """
+        Return {skill: {"count": n, "positions": [(start, end), ...]}}
+        with skills in taxonomy order.
+        """
+        if not text or self.pattern is None:
+            return {}
+        hits = {}
+        for m in self.pattern.finditer(text):
+            skill = self._canonical.get(_normalize_term(m.group(1)))
+            if skill is None:
+                continue
+            entry = hits.get(skill)
+            if entry is None:
+                entry = hits[skill] = {"count": 0, "positions": []}
+            entry["count"] += 1
+            entry["positions"].append((m.start(1), m.end(1)))
+        return {skill: hits[skill] for skill in sorted(hits, key=self._order.__getitem__)}
+
+    def extract(self, text: str):
+        return list(self.find(text))
+
+
+_skill_matcher = None
+_skill_matcher_key = None
+
+
+def get_skill_matcher() -> SkillMatcher:
+    """Matcher for the current SKILLS_DB / SKILL_ALIASES (recompiled only when they change)."""
+    global _skill_matcher, _skill_matcher_key
+    key = (tuple(SKILLS_DB), tuple(sorted(SKILL_ALIASES.items())))
+    if _skill_matcher is None or key != _skill_matcher_key:
+        _skill_matcher = SkillMatcher(SKILLS_DB, SKILL_ALIASES)
+        _skill_matcher_key = key
+    return _skill_matcher
+
 
-def extract_text_from_resume(file_path: str) -> str:
+def _open_source(source, filename=None):
+    """
+    Resolve a resume source to (kind, readable) where kind is "pdf", "docx" or None.
+    `source` may be a path, bytes/bytearray/memoryview, or a binary file-like
+    object; the type comes from the path/filename extension, else from the
+    file signature.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        name = os.fspath(source).lower()
+        kind = "pdf" if name.endswith(".pdf") else "docx" if name.endswith(".docx") else None
+        return kind, os.fspath(source)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        stream = io.BytesIO(source)
+    elif hasattr(source, "read"):
+        stream = source
+        if not (hasattr(stream, "seekable") and stream.seekable()):
+            stream = io.BytesIO(stream.read())
+    else:
+        return None, None
+
+    name = (filename or getattr(source, "name", "") or "").lower()
+    if name.endswith(".pdf"):
+        return "pdf", stream
+    if name.endswith(".docx"):
+        return "docx", stream
+
+    pos = stream.tell()
+    head = stream.read(5)
+    stream.seek(pos)
+    if head.startswith(b"%PDF"):
+        return "pdf", stream
+    if head.startswith(b"PK\x03\x04"):
+        return "docx", stream
+    return None, stream
+
+
+def read_resume(source, filename: str = None, max_pages: int = RESUME_MAX_PAGES,
+                enough_skills: int = RESUME_ENOUGH_SKILLS) -> dict:
+    """
+    Parse a resume in this process and report how it went:
+    {"kind", "text", "pages", "pages_read", "page_ms", "stopped", "error"}.
+    PDF parsing stops after `max_pages` pages ("page_budget"), or once an
+    email and `enough_skills` skills have been seen ("enough"); page_ms holds
+    the extraction time of every page read. Errors propagate.
+    """
+    kind, readable = _open_source(source, filename)
+    report = {"kind": kind, "text": "", "pages": 0, "pages_read": 0, "page_ms": [],
+              "stopped": None, "error": None}
+    if kind == "pdf":
+        from PyPDF2 import PdfReader
+        reader = PdfReader(readable)
+        report["pages"] = len(reader.pages)
+        pages_text = []
+        has_email = False
+        skills = set()
+        for i, page in enumerate(reader.pages):
+            if max_pages and i >= max_pages:
+                report["stopped"] = "page_budget"
+                break
+            started = time.perf_counter()
+            txt = page.extract_text()
+            report["page_ms"].append(round((time.perf_counter() - started) * 1000, 2))
+            if not txt:
+                continue
+            pages_text.append(txt)
+            if enough_skills:
+                has_email = has_email or extract_email(txt) is not None
+                skills.update(extract_skills(txt))
+                if has_email and len(skills) >= enough_skills and i + 1 < report["pages"]:
+                    report["stopped"] = "enough"
+                    break
+        report["pages_read"] = len(report["page_ms"])
+        report["text"] = " ".join(pages_text)
+    elif kind == "docx":
+        if _load_docx2txt() is None:
+            raise RuntimeError("docx2txt not installed; cannot extract .docx files")
+        report["text"] = docx2txt.process(readable) or ""
+    return report
+
+
+def extract_resume(source, filename: str = None, max_pages: int = RESUME_MAX_PAGES,
+                   enough_skills: int = RESUME_ENOUGH_SKILLS, sandbox: bool = None) -> dict:
+    """
+    read_resume() in the sandboxed subprocess pool when `sandbox` (default
+    RESUME_SANDBOX), else in this process. Never raises: failures come back
+    as report["error"] with empty text.
+    """
+    sandbox = RESUME_SANDBOX if sandbox is None else sandbox
+    try:
+        if sandbox:
+            from .sandbox import get_sandbox
+            return get_sandbox().extract(source, filename, max_pages=max_pages, enough_skills=enough_skills)
+        return read_resume(source, filename, max_pages=max_pages, enough_skills=enough_skills)
+    except Exception as e:
+        return {"kind": None, "text": "", "pages": 0, "pages_read": 0, "page_ms": [],
+                "stopped": None, "error": f"{e.__class__.__name__}: {e}"}
+
+
+def extract_text_from_resume(source, filename: str = None) -> str:
     """
     Extract text from a .pdf or .docx resume.
+    `source` is a file path, raw bytes/memoryview, or a binary file-like object
+    (e.g. an upload stream); `filename` optionally hints the type for non-paths.
     Returns an empty string if extraction fails or file type unsupported.
     """
-    if not file_path:
+    if source is None or (isinstance(source, str) and not source):
         return ""
 
-    file_path_lower = file_path.lower()
-    try:
-        if file_path_lower.endswith(".pdf"):
-            reader = PdfReader(file_path)
-            pages_text = []
-            for page in reader.pages:
-                txt = page.extract_text()
-                if txt:
-                    pages_text.append(txt)
-            return " ".join(pages_text)
-        elif file_path_lower.endswith(".docx"):
-            if docx2txt is None:
-                raise RuntimeError("docx2txt not installed; cannot extract .docx files")
-            return docx2txt.process(file_path) or ""
-        else:
-            # not supported type
-            return ""
-    except Exception as e:
+    report = extract_resume(source, filename)
+    if report["error"]:
         # Do not raise here; return empty string so caller can show friendly error.
-        print(f"[extractor] Error extracting text from {file_path}: {e}")
-        return ""
+        label = source if isinstance(source, str) else (filename or "<stream>")
+        print(f"[extractor] Error extracting text from {label}: {report['error']}")
+    return report["text"]
 
 
 def extract_skills(text: str):
     """
     Return a list of skills found in the provided text (case-insensitive).
     The returned list preserves the SKILLS_DB order and uniqueness.
+    Aliases (e.g. "sklearn", "JS") map to their SKILLS_DB entry.
     """
     if not text:
         return []
+    return get_skill_matcher().extract(text)
+
 
-    lower = text.lower()
-    found = []
-    seen = set()
-    for skill in SKILLS_DB:
-        if skill.lower() in lower and skill not in seen:
-            found.append(skill)
-            seen.add(skill)
-    return found
+def find_skills(text: str):
+    """
+    Like extract_skills, but returns match counts and character positions:
+    {skill: {"count": n, "positions": [(start, end), ...]}}
+    """
+    if not text:
+        return {}
+    return get_skill_matcher().find(text)
 
 
 def extract_name(text: str):
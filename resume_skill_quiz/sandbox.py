@@ -0,0 +1,243 @@
+# resume_skill_quiz/sandbox.py
+"""
+Resume parsing in a recyclable subprocess pool.
+PyPDF2 on a hostile or scanned PDF can pin a core and grow without bound, so
+the web workers never parse in-process: each slot is a one-process pool whose
+worker runs under an address-space limit (RLIMIT_AS) and a per-task CPU-time
+limit (RLIMIT_CPU, raised as SandboxError via SIGXCPU). A task that overruns
+its wall-clock timeout gets its slot terminated and replaced; a worker whose
+peak RSS passed the recycle threshold is replaced after its task.
+Resource limits need the Unix `resource` module; elsewhere only the timeout
+and worker recycling apply.
+Exposes:
+ - ExtractionSandbox(workers, cpu_seconds, memory_mb, rss_mb, timeout, tasks_per_worker)
+ - SandboxError
+ - get_sandbox()
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+RESUME_SANDBOX_WORKERS = int(os.getenv("RESUME_SANDBOX_WORKERS", "2"))
+RESUME_SANDBOX_CPU_SECONDS = float(os.getenv("RESUME_SANDBOX_CPU_SECONDS", "5"))
+RESUME_SANDBOX_MEMORY_MB = int(os.getenv("RESUME_SANDBOX_MEMORY_MB", "1024"))  # address space
+RESUME_SANDBOX_RSS_MB = int(os.getenv("RESUME_SANDBOX_RSS_MB", "256"))  # recycle above this peak RSS
+RESUME_SANDBOX_TIMEOUT = float(os.getenv("RESUME_SANDBOX_TIMEOUT", "10"))
+RESUME_SANDBOX_TASKS_PER_WORKER = int(os.getenv("RESUME_SANDBOX_TASKS_PER_WORKER", "50"))
+
+
+_POLL_SECONDS = 0.2
+
+
+class SandboxError(RuntimeError):
+    """Parsing was stopped by a sandbox limit (CPU time, memory, timeout) or no slot was free."""
+
+
+class _WorkerDied(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise SandboxError("CPU time limit exceeded")
+
+
+def _init_worker(memory_mb):
+    """Pool initializer: cap the worker's address space and turn SIGXCPU into an exception."""
+    # the parent handles Ctrl+C and tears the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if resource is None:
+        return
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run(source, filename, max_pages, enough_skills, cpu_seconds):
+    """Worker side: read_resume() under a CPU-time budget; returns (report, peak RSS in KiB)."""
+    from .extractor import read_resume
+
+    if resource is not None and cpu_seconds:
+        # RLIMIT_CPU counts the worker's whole lifetime, so the budget starts from what it has used so far
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(_cpu_used() + cpu_seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    report = read_resume(source, filename, max_pages=max_pages, enough_skills=enough_skills)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else 0
+    return report, peak_kb
+
+
+class ExtractionSandbox:
+    """
+    `workers` independent single-process pools, checked out one task at a
+    time. Pools are started on first use and replaced after a timeout, a
+    limit hit or `tasks_per_worker` tasks.
+    """
+
+    def __init__(self, workers=RESUME_SANDBOX_WORKERS, cpu_seconds=RESUME_SANDBOX_CPU_SECONDS,
+                 memory_mb=RESUME_SANDBOX_MEMORY_MB, rss_mb=RESUME_SANDBOX_RSS_MB,
+                 timeout=RESUME_SANDBOX_TIMEOUT, tasks_per_worker=RESUME_SANDBOX_TASKS_PER_WORKER):
+        methods = multiprocessing.get_all_start_methods()
+        # never fork the web worker: its threads and locks would be copied mid-flight
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.rss_mb = rss_mb
+        self.timeout = timeout
+        self.tasks_per_worker = tasks_per_worker or None
+        self.workers = max(1, workers)
+        self._slots = queue.Queue()
+        for _ in range(self.workers):
+            self._slots.put(None)  # pool started on first checkout
+        self._pools = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.calls = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.limit_hits = 0
+        self.recycled = 0
+
+    def _new_pool(self):
+        pool = self._ctx.Pool(1, initializer=_init_worker, initargs=(self.memory_mb,),
+                              maxtasksperchild=self.tasks_per_worker)
+        with self._lock:
+            self._pools.add(pool)
+        return pool
+
+    def _discard(self, pool):
+        with self._lock:
+            self._pools.discard(pool)
+            self.recycled += 1
+        pool.terminate()
+
+    def extract(self, source, filename=None, max_pages=None, enough_skills=None):
+        """
+        read_resume() in a sandboxed worker. `source` is a path, bytes or a
+        binary stream (read here and sent as bytes). Raises SandboxError when a
+        limit stopped the parse; parse errors propagate as in read_resume().
+        """
+        from .extractor import RESUME_ENOUGH_SKILLS, RESUME_MAX_PAGES
+
+        if self._closed:
+            raise SandboxError("sandbox is closed")
+        if isinstance(source, os.PathLike):
+            source = os.fspath(source)
+        elif isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+        elif hasattr(source, "read"):
+            filename = filename or getattr(source, "name", None)
+            source = source.read()
+        max_pages = RESUME_MAX_PAGES if max_pages is None else max_pages
+        enough_skills = RESUME_ENOUGH_SKILLS if enough_skills is None else enough_skills
+
+        started = time.monotonic()
+        try:
+            pool = self._slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise SandboxError(f"no extraction worker free after {self.timeout}s") from None
+        with self._lock:
+            self.calls += 1
+        try:
+            if pool is None:
+                pool = self._new_pool()
+            workers = list(pool._pool)
+            pending = pool.apply_async(_run, (source, filename, max_pages, enough_skills, self.cpu_seconds))
+            try:
+                report, peak_kb = self._wait(pending, workers, started + self.timeout)
+            except multiprocessing.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                self._discard(pool)
+                pool = None
+                raise SandboxError(f"resume parsing timed out after {self.timeout}s") from None
+            except _WorkerDied:
+                with self._lock:
+                    self.crashes += 1
+                self._discard(pool)
+                pool = None
+                raise SandboxError("extraction worker died (memory limit or signal)") from None
+            except (SandboxError, MemoryError) as e:
+                with self._lock:
+                    self.limit_hits += 1
+                self._discard(pool)
+                pool = None
+                if isinstance(e, MemoryError):
+                    raise SandboxError(f"memory limit exceeded ({self.memory_mb} MB)") from None
+                raise
+            if self.rss_mb and peak_kb > self.rss_mb * 1024:
+                self._discard(pool)
+                pool = None
+            return report
+        finally:
+            self._slots.put(pool)
+
+    @staticmethod
+    def _wait(pending, workers, deadline):
+        """pending.get() until `deadline`, noticing a worker that died mid-task (Pool never reports it)."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise multiprocessing.TimeoutError
+            pending.wait(min(remaining, _POLL_SECONDS))
+            if pending.ready():
+                return pending.get()
+            if any(w.exitcode is not None for w in workers):
+                # a worker retiring after maxtasksperchild posts its result first: allow it to arrive
+                pending.wait(_POLL_SECONDS)
+                if pending.ready():
+                    return pending.get()
+                raise _WorkerDied
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            pools, self._pools = list(self._pools), set()
+        for pool in pools:
+            pool.terminate()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._pools),
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "limit_hits": self.limit_hits,
+                "recycled": self.recycled,
+            }
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox():
+    global _sandbox
+    if _sandbox is None:
+        with _sandbox_lock:
+            if _sandbox is None:
+                _sandbox = ExtractionSandbox()
+                atexit.register(_sandbox.close)
+    return _sandbox
@@ -1,4 +1,40 @@
-from .skill_extractor import extract_text_from_resume, extract_skills_from_text, extract_email_from_text
-from .quiz_generator import generate_quiz_questions, evaluate_quiz_answers
-from .matching import match_partner_smart
-from .mistral_api import generate_quiz, get_explanation
+# studybuddy/__init__.py
+"""
+StudyBuddy package.
+The public helpers below are imported from their submodules on first access,
+so `import studybuddy` (or any one submodule) does not pull in requests,
+PyPDF2 or the Mistral SDK.
+Exposes:
+ - extract_text_from_resume, extract_skills_from_text, extract_email_from_text
+ - generate_quiz_questions, evaluate_quiz_answers
+ - match_partner_smart
+ - generate_quiz, get_explanation
+"""
+
+import importlib
+
+_LAZY = {
+    "extract_text_from_resume": "skill_extractor",
+    "extract_skills_from_text": "skill_extractor",
+    "extract_email_from_text": "skill_extractor",
+    "generate_quiz_questions": "quiz_generator",
+    "evaluate_quiz_answers": "quiz_generator",
+    "match_partner_smart": "matching",
+    "generate_quiz": "mistral_api",
+    "get_explanation": "mistral_api",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
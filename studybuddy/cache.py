@@ -0,0 +1,156 @@
+# studybuddy/cache.py
+"""
+Two-tier cache for StudyBuddy: in-memory LRU in front of a SQLite file.
+Exposes:
+ - PersistentCache(path, table="cache", ttl=86400, max_entries=5000, memory_entries=256)
+ - content_key(*parts)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(*parts) -> str:
+    """Stable SHA-256 key for any JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PersistentCache:
+    """
+    JSON value cache with TTL and size-based eviction.
+      - memory tier: OrderedDict LRU of at most `memory_entries` items
+      - disk tier: SQLite table evicted by least-recent access past `max_entries`
+    Pass path=None for a memory-only cache.
+    """
+
+    def __init__(self, path, table="cache", ttl=86400, max_entries=5000, memory_entries=256):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed)")
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._mem[key] = (value, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._mem[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._conn.execute(
+                            f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key)
+                        )
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self.hits += 1
+                        return value
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self.evictions += 1
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            cur = self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+            self.evictions += max(cur.rowcount, 0)
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def delete(self, key):
+        with self._lock:
+            self._mem.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._lock:
+            if self._conn is None:
+                return len(self._mem)
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._mem),
+            "entries": len(self),
+        }
@@ -0,0 +1,339 @@
+# studybuddy/jobs.py
+"""
+Local background job queue for StudyBuddy.
+Keeps slow work (LLM quiz generation) off the Flask request thread.
+Jobs run on the worker process that submitted them, but a job submitted with
+shared=True also mirrors its status, partial results and result into the
+shared state store, so a poll that lands on another worker still finds it.
+Exposes:
+ - JobQueue(workers=4, store=None)
+ - get_job_queue()
+ - publish_partial(item)   # called from inside a job to expose partial results
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+
+from .telemetry import trace, span, current_trace_id, log_event
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+_RECORD_FIELDS = ("id", "name", "status", "error", "result", "partial",
+                  "submitted_at", "started_at", "finished_at", "first_partial_at")
+
+# the job each worker thread is currently running, for publish_partial()
+_current = threading.local()
+
+
+class Job:
+    """A single unit of background work and its timing information."""
+
+    def __init__(self, fn, args, kwargs, name=None):
+        self.id = uuid.uuid4().hex
+        self.name = name or getattr(fn, "__name__", "job")
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # spans recorded while the job runs join the submitting request's trace
+        self.trace_id = current_trace_id()
+        self.partial = []
+        self.first_partial_at = None
+        self.store = None  # shared state store this job is mirrored to, if any
+        self.ttl = JOB_TTL_SECONDS
+        self._done = threading.Event()
+
+    @classmethod
+    def from_record(cls, record):
+        """Read-only copy of a job mirrored by another worker process."""
+        job = cls.__new__(cls)
+        job.fn, job.args, job.kwargs = None, (), {}
+        job.trace_id = None
+        job.store = None
+        job.ttl = JOB_TTL_SECONDS
+        for field in _RECORD_FIELDS:
+            setattr(job, field, record.get(field))
+        job.partial = list(job.partial or [])
+        job._done = threading.Event()
+        if job.status in (DONE, FAILED):
+            job._done.set()
+        return job
+
+    def save(self):
+        """Mirror this job to its shared store (no-op for process-local jobs)."""
+        if self.store is None:
+            return
+        try:
+            self.store.set(_record_key(self.id), {f: getattr(self, f) for f in _RECORD_FIELDS}, ttl=self.ttl)
+        except Exception as e:
+            log_event("job.save_failed", job=self.name, job_id=self.id, error=f"{e.__class__.__name__}: {e}")
+
+    @property
+    def queue_wait(self):
+        if self.started_at is None:
+            return time.time() - self.submitted_at
+        return self.started_at - self.submitted_at
+
+    @property
+    def run_time(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    @property
+    def latency(self):
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.submitted_at
+
+    @property
+    def time_to_first_partial(self):
+        if self.first_partial_at is None:
+            return None
+        return self.first_partial_at - self.submitted_at
+
+    def to_dict(self, include_result=False):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "queue_wait": round(self.queue_wait, 4),
+            "run_time": round(self.run_time, 4),
+            "latency": round(self.latency, 4),
+            "partial": len(self.partial),
+        }
+        if self.first_partial_at is not None:
+            data["time_to_first_partial"] = round(self.time_to_first_partial, 4)
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    Thread-backed job queue.
+    submit() returns a job id immediately; workers run jobs in FIFO order.
+    Finished jobs are kept for `ttl` seconds so clients can poll them.
+    `store` (a state store) holds the shared jobs' records; get() falls back
+    to it for jobs that another process is running.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, ttl: int = JOB_TTL_SECONDS, history: int = 500, store=None):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.store = store
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._latencies = deque(maxlen=history)
+        self._waits = deque(maxlen=history)
+        self._first_partials = deque(maxlen=history)
+        self._completed = 0
+        self._failed = 0
+
+    def _ensure_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(
+                    target=self._worker,
+                    name=f"studybuddy-job-{len(self._threads)}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            job.started_at = time.time()
+            job.status = RUNNING
+            job.save()
+            _current.job = job
+            try:
+                with trace(job.trace_id, job=job.name), \
+                        span("job." + job.name, job_id=job.id, queue_wait_ms=round(job.queue_wait * 1000, 2)):
+                    job.result = job.fn(*job.args, **job.kwargs)
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+                job.status = FAILED
+                print(f"[studybuddy.jobs] job {job.name} ({job.id}) failed:", e)
+                traceback.print_exc()
+            finally:
+                _current.job = None
+                job.finished_at = time.time()
+                job.save()
+                with self._lock:
+                    self._latencies.append(job.latency)
+                    self._waits.append(job.queue_wait)
+                    if job.first_partial_at is not None:
+                        self._first_partials.append(job.time_to_first_partial)
+                    if job.status == DONE:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                job._done.set()
+                self._queue.task_done()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [
+                jid for jid, j in self._jobs.items()
+                if j.finished_at is not None and j.finished_at < cutoff
+            ]
+            for jid in stale:
+                del self._jobs[jid]
+
+    def submit(self, fn, *args, name=None, shared=False, **kwargs) -> str:
+        """
+        Queue fn(*args, **kwargs) and return its job id. With shared=True the
+        job's progress and (JSON-serializable) result are visible from every
+        process that uses the same store.
+        """
+        self._prune()
+        job = Job(fn, args, kwargs, name=name)
+        if shared:
+            job.store = self.store
+            job.ttl = self.ttl
+            job.save()
+        with self._lock:
+            self._jobs[job.id] = job
+        self._ensure_workers()
+        self._queue.put(job)
+        return job.id
+
+    def get(self, job_id):
+        """The Job, or a read-only copy of a shared job from another process, or None."""
+        if not job_id:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            record = self.store.get(_record_key(job_id))
+            if record is not None:
+                job = Job.from_record(record)
+        return job
+
+    def status(self, job_id, include_result=False):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return job.to_dict(include_result=include_result)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (or timeout). Returns the Job or None."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._done.wait(timeout)
+        return job
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if self.store is not None and job_id:
+            self.store.delete(_record_key(job_id))
+
+    def stats(self):
+        """Queue depth and latency summary, used to size the worker pool."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            waits = sorted(self._waits)
+            first_partials = sorted(self._first_partials)
+            running = sum(1 for j in self._jobs.values() if j.status == RUNNING)
+            completed = self._completed
+            failed = self._failed
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "running": running,
+            "completed": completed,
+            "failed": failed,
+            "latency": _summary(latencies),
+            "queue_wait": _summary(waits),
+            "time_to_first_partial": _summary(first_partials),
+        }
+
+    def shutdown(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._threads = []
+
+
+def publish_partial(item):
+    """
+    Append `item` to the partial results of the job running on this thread,
+    so pollers can use it before the job finishes. No-op outside a job.
+    """
+    job = getattr(_current, "job", None)
+    if job is None:
+        return
+    if job.first_partial_at is None:
+        job.first_partial_at = time.time()
+    job.partial.append(item)
+    job.save()
+
+
+def _record_key(job_id):
+    return "job:" + job_id
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _summary(sorted_values):
+    if not sorted_values:
+        return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "count": len(sorted_values),
+        "avg": round(sum(sorted_values) / len(sorted_values), 4),
+        "p50": round(_percentile(sorted_values, 50), 4),
+        "p95": round(_percentile(sorted_values, 95), 4),
+        "max": round(sorted_values[-1], 4),
+    }
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue (created on first use), sharing the session state store."""
+    global _default_queue
+    if _default_queue is None:
+        with _default_lock:
+            if _default_queue is None:
+                from .state_store import get_state_store
+                _default_queue = JobQueue(store=get_state_store())
+    return _default_queue
@@ -0,0 +1,316 @@
+# studybuddy/leaderboard.py
+"""
+Quiz leaderboard: global and per-skill rankings of every student's best attempt.
+Each graded attempt is appended to SQLite and folded into a best-score row per
+(skill, student) in the same transaction; a revision counter lets each
+worker's in-memory Leaderboard pull only what changed, as with partners.
+Rankings are indexable skip lists, so recording an attempt, top-N and
+"my rank" are O(log n) and nothing is ever re-sorted.
+Exposes:
+ - SkipList()
+ - Leaderboard()
+ - LeaderboardStore(path, pool_size=4)
+ - GLOBAL
+"""
+
+import os
+import random
+import threading
+import time
+
+from .partner_store import ConnectionPool
+
+LEADERBOARD_DB_PATH = os.getenv("LEADERBOARD_DB_PATH", os.path.join("data", "leaderboard.sqlite3"))
+LEADERBOARD_DB_POOL_SIZE = int(os.getenv("LEADERBOARD_DB_POOL_SIZE", "4"))
+
+GLOBAL = ""  # skill name of the whole-quiz ranking
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaderboard_attempts (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    skill TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leaderboard_attempts_email ON leaderboard_attempts(email);
+CREATE TABLE IF NOT EXISTS leaderboard_best (
+    skill TEXT NOT NULL,
+    email TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    pct REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    updated REAL NOT NULL,
+    rev INTEGER NOT NULL,
+    PRIMARY KEY (skill, email)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS leaderboard_best_rev ON leaderboard_best(rev);
+"""
+
+# a new attempt replaces the stored best only if it is strictly better
+_BETTER = "(excluded.pct > pct OR (excluded.pct = pct AND excluded.correct > correct))"
+
+
+class _Node:
+    __slots__ = ("key", "value", "next", "width")
+
+    def __init__(self, key, value, level):
+        self.key = key
+        self.value = value
+        self.next = [None] * level
+        self.width = [0] * level  # bottom-level steps to next[i]
+
+
+class SkipList:
+    """
+    Ordered map from unique, comparable keys to values (indexable skip list).
+    Every link stores how many entries it skips, so insert, remove, rank(key)
+    and slice(start, count) are all O(log n) expected.
+    """
+
+    MAX_LEVEL = 16
+    P = 0.25
+
+    def __init__(self):
+        self._head = _Node(None, None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def _predecessors(self, key):
+        """Last node before `key` on every level, with its position (head = 0)."""
+        update = [self._head] * self.MAX_LEVEL
+        positions = [0] * self.MAX_LEVEL
+        x, pos = self._head, 0
+        for i in reversed(range(self._level)):
+            while x.next[i] is not None and x.next[i].key < key:
+                pos += x.width[i]
+                x = x.next[i]
+            update[i] = x
+            positions[i] = pos
+        return update, positions
+
+    def insert(self, key, value=None):
+        update, positions = self._predecessors(key)
+        nxt = update[0].next[0]
+        if nxt is not None and nxt.key == key:
+            raise KeyError(f"duplicate key {key!r}")
+        level = self._random_level()
+        if level > self._level:
+            self._level = level  # update[]/positions[] already point at the head there
+        node = _Node(key, value, level)
+        pos = positions[0] + 1
+        for i in range(level):
+            prev = update[i]
+            if prev.next[i] is not None:
+                node.width[i] = positions[i] + prev.width[i] + 1 - pos
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            prev.width[i] = pos - positions[i]
+        for i in range(level, self._level):
+            if update[i].next[i] is not None:
+                update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Remove `key` and return its value; KeyError if absent."""
+        update, _ = self._predecessors(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(self._level):
+            prev = update[i]
+            if prev.next[i] is node:
+                if node.next[i] is not None:
+                    prev.width[i] += node.width[i] - 1
+                prev.next[i] = node.next[i]
+            elif prev.next[i] is not None:
+                prev.width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return node.value
+
+    def rank(self, key):
+        """0-based position of `key`, or None if absent."""
+        update, positions = self._predecessors(key)
+        node = update[0].next[0]
+        return positions[0] if node is not None and node.key == key else None
+
+    def slice(self, start=0, count=10):
+        """Up to `count` (key, value) pairs from 0-based position `start`."""
+        if start < 0 or count <= 0 or start >= self._size:
+            return []
+        x, pos = self._head, 0
+        for i in reversed(range(self._level)):
+            while x.next[i] is not None and pos + x.width[i] <= start:
+                pos += x.width[i]
+                x = x.next[i]
+        out = []
+        x = x.next[0]
+        while x is not None and len(out) < count:
+            out.append((x.key, x.value))
+            x = x.next[0]
+        return out
+
+
+class Leaderboard:
+    """
+    In-memory rankings, one SkipList per skill plus GLOBAL.
+    Entries are ordered by percentage, then correct answers, then who got
+    there first.
+    """
+
+    def __init__(self):
+        self._boards = {}
+        self._keys = {}  # (skill, email) -> current key in that skill's board
+        self._lock = threading.Lock()
+        self.synced_rev = 0
+
+    @staticmethod
+    def _key(entry):
+        return (-entry["pct"], -entry["correct"], entry["updated"], entry["email"])
+
+    def update(self, entry):
+        """Insert or move one student's best entry for entry["skill"]."""
+        skill, email = entry["skill"], entry["email"]
+        with self._lock:
+            board = self._boards.get(skill)
+            if board is None:
+                board = self._boards[skill] = SkipList()
+            old = self._keys.get((skill, email))
+            if old is not None:
+                board.remove(old)
+            key = self._key(entry)
+            board.insert(key, entry)
+            self._keys[(skill, email)] = key
+
+    def top(self, skill=GLOBAL, n=10, offset=0):
+        """The n best entries from 1-based rank offset + 1, each with its "rank"."""
+        with self._lock:
+            board = self._boards.get(skill)
+            rows = board.slice(offset, n) if board is not None else []
+        return [dict(entry, rank=offset + i + 1) for i, (_, entry) in enumerate(rows)]
+
+    def rank(self, email, skill=GLOBAL):
+        """A student's entry with its 1-based "rank" and "of" (board size), or None."""
+        email = (email or "").strip().lower()
+        with self._lock:
+            key = self._keys.get((skill, email))
+            if key is None:
+                return None
+            board = self._boards[skill]
+            position = board.rank(key)
+            return dict(board.slice(position, 1)[0][1], rank=position + 1, of=len(board))
+
+    def skills(self):
+        """[(skill, students)] for every per-skill board, most contested first."""
+        with self._lock:
+            counts = [(skill, len(board)) for skill, board in self._boards.items() if skill != GLOBAL]
+        return sorted(counts, key=lambda c: (-c[1], c[0].lower()))
+
+    def __len__(self):
+        board = self._boards.get(GLOBAL)
+        return len(board) if board is not None else 0
+
+
+class LeaderboardStore:
+    """SQLite-backed attempt log and best-score table."""
+
+    def __init__(self, path=LEADERBOARD_DB_PATH, pool_size=LEADERBOARD_DB_POOL_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.pool = ConnectionPool(path, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+        self._sync_lock = threading.Lock()
+
+    @staticmethod
+    def _tally(score, total, results):
+        """{skill: (correct, total)} for GLOBAL and every skill in the graded results."""
+        tally = {GLOBAL: (int(score), int(total))}
+        for r in results or []:
+            skill = str(r.get("skill") or "").strip()
+            if not skill:
+                continue
+            correct, count = tally.get(skill, (0, 0))
+            tally[skill] = (correct + bool(r.get("is_correct")), count + 1)
+        return tally
+
+    def record(self, email, score, total, results=None) -> int:
+        """
+        Record one graded attempt (evaluate_quiz_answers output) for `email`;
+        returns the new revision.
+        """
+        email = (email or "").strip().lower()
+        if not email:
+            raise ValueError("email is required")
+        if not total:
+            raise ValueError("attempt has no questions")
+        now = time.time()
+        rows = [(skill, correct, count) for skill, (correct, count) in self._tally(score, total, results).items()]
+
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rev = conn.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM leaderboard_best").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO leaderboard_attempts (email, skill, correct, total, created) VALUES (?, ?, ?, ?, ?)",
+                    [(email, skill, correct, count, now) for skill, correct, count in rows],
+                )
+                conn.executemany(
+                    "INSERT INTO leaderboard_best (skill, email, correct, total, pct, attempts, updated, rev)"
+                    " VALUES (?, ?, ?, ?, ?, 1, ?, ?)"
+                    " ON CONFLICT(skill, email) DO UPDATE SET"
+                    f" correct = CASE WHEN {_BETTER} THEN excluded.correct ELSE correct END,"
+                    f" total = CASE WHEN {_BETTER} THEN excluded.total ELSE total END,"
+                    f" updated = CASE WHEN {_BETTER} THEN excluded.updated ELSE updated END,"
+                    f" pct = CASE WHEN {_BETTER} THEN excluded.pct ELSE pct END,"
+                    " attempts = attempts + 1, rev = excluded.rev",
+                    [(skill, email, correct, count, correct / count, now, rev) for skill, correct, count in rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rev
+
+    def count(self) -> int:
+        """Students with at least one recorded attempt."""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM leaderboard_best WHERE skill = ?", (GLOBAL,)).fetchone()[0]
+
+    def changes_since(self, rev):
+        """[(rev, entry)] for every best-score row changed after `rev`, oldest first."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT skill, email, correct, total, pct, attempts, updated, rev FROM leaderboard_best"
+                " WHERE rev > ? ORDER BY rev",
+                (rev,),
+            ).fetchall()
+        return [(r[7], {"skill": r[0], "email": r[1], "correct": r[2], "total": r[3], "pct": r[4],
+                        "attempts": r[5], "updated": r[6]}) for r in rows]
+
+    def sync(self, board) -> int:
+        """
+        Apply best-score changes newer than board.synced_rev to a Leaderboard.
+        Returns the number of changes applied.
+        """
+        with self._sync_lock:
+            changes = self.changes_since(board.synced_rev)
+            for rev, entry in changes:
+                board.update(entry)
+                board.synced_rev = rev
+        return len(changes)
@@ -1,18 +1,19 @@
 # studybuddy/matching.py
 """
 Partner matching logic for StudyBuddy.
-Exposes match_partner_smart(score, user_skills, user_email)
+Exposes match_partner_smart(score, user_skills, user_email),
+top_partners(score, user_skills, user_email, k=5),
+and PartnerIndex, the sparse TF-IDF index they query.
 """
 
+import heapq
+import itertools
+import math
+import re
+import threading
 from typing import List, Dict
 
-# optional vector similarity with sklearn
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
-    _HAVE_SKLEARN = True
-except Exception:
-    _HAVE_SKLEARN = False
+from .telemetry import span
 
 # sample partners (replace with CSV/database in future)
 SAMPLE_PARTNERS = [
@@ -41,27 +42,261 @@ SAMPLE_PARTNERS = [
 ]
 
 
-def _set_overlap_score(a: List[str], b: List[str]) -> float:
-    sa = set([x.lower() for x in a])
-    sb = set([x.lower() for x in b])
-    if not sa or not sb:
-        return 0.0
-    inter = len(sa & sb)
-    union = len(sa | sb)
-    return inter / union if union else 0.0
+_TOKEN = re.compile(r"\w[\w+#]*")
 
 
-def _tfidf_similarity(a: List[str], b: List[str]) -> float:
+def _skill_terms(skill) -> List[str]:
+    """
+    Word-level TF-IDF terms of one skill, as the original TfidfVectorizer
+    matching tokenized them: "Data Analysis" and "Data Science" share "data".
+    Unlike sklearn's default pattern, one-letter words and "+"/"#" are kept,
+    so "C", "C++" and "C#" are distinct terms instead of being dropped.
+    """
+    return _TOKEN.findall(str(skill).lower())
+
+
+class PartnerIndex:
+    """
+    Sparse TF-IDF index over partner skill sets.
+    Every word of a skill is one vocabulary term (see _skill_terms), so related
+    skills share weight; the index keeps, per term,
+    the postings {partner id: term frequency}, i.e. the columns of a sparse
+    partner x skill matrix. A query is one sparse matrix-vector product: only
+    partners sharing at least one skill with the user are touched. IDF is
+    smoothed (log((1 + N) / (1 + df)) + 1) and computed over the whole pool,
+    and partners can be added or removed without rebuilding the index.
+    """
+
+    def __init__(self, partners=None):
+        self._partners = {}
+        # last PartnerStore revision applied (see partner_store.PartnerStore.sync)
+        self.synced_rev = 0
+        self._terms = {}
+        self._postings = {}
+        self._order = {}
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+        self._version = 0
+        self._norms = {}
+        self._norms_version = -1
+        for p in partners or []:
+            self.add(p)
+
+    @staticmethod
+    def partner_id(partner) -> str:
+        return (partner.get("email") or "").lower() or partner.get("name", "")
+
+    def __len__(self):
+        return len(self._partners)
+
+    def __contains__(self, pid):
+        return pid in self._partners
+
+    def get(self, pid):
+        return self._partners.get(pid)
+
+    def partners(self):
+        """Partners in insertion order."""
+        with self._lock:
+            return list(self._partners.values())
+
+    def take(self, predicate, exclude=(), limit=1):
+        """Ids of the earliest-inserted partners not in `exclude` satisfying predicate."""
+        found = []
+        if limit <= 0:
+            return found
+        with self._lock:
+            for pid, partner in self._partners.items():
+                if pid not in exclude and predicate(partner):
+                    found.append(pid)
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def first(self, predicate, exclude=()):
+        found = self.take(predicate, exclude, 1)
+        return found[0] if found else None
+
+    def add(self, partner) -> str:
+        """Insert or replace a partner; returns its id."""
+        pid = self.partner_id(partner)
+        with self._lock:
+            if pid in self._partners:
+                self._remove_terms(pid)
+            else:
+                self._order[pid] = next(self._seq)
+            terms = {}
+            for skill in partner.get("skills", []):
+                for term in _skill_terms(skill):
+                    terms[term] = terms.get(term, 0) + 1
+            self._partners[pid] = partner
+            self._terms[pid] = terms
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[pid] = tf
+            self._version += 1
+        return pid
+
+    def _remove_terms(self, pid):
+        for term in self._terms.pop(pid, {}):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(pid, None)
+                if not posting:
+                    del self._postings[term]
+
+    def remove(self, pid) -> bool:
+        with self._lock:
+            if pid not in self._partners:
+                return False
+            self._remove_terms(pid)
+            del self._partners[pid]
+            del self._order[pid]
+            self._version += 1
+            return True
+
+    def idf(self, term) -> float:
+        df = len(self._postings.get(term, ()))
+        return math.log((1 + len(self._partners)) / (1 + df)) + 1.0
+
+    def _row_norm(self, pid):
+        # norms depend on the pool-wide IDF, so they are cached per index version
+        if self._norms_version != self._version:
+            self._norms = {}
+            self._norms_version = self._version
+        norm = self._norms.get(pid)
+        if norm is None:
+            norm = math.sqrt(sum((tf * self.idf(t)) ** 2 for t, tf in self._terms[pid].items()))
+            self._norms[pid] = norm
+        return norm
+
+    @staticmethod
+    def _query_terms(user_skills):
+        query = {}
+        for skill in user_skills or []:
+            for term in _skill_terms(skill):
+                query[term] = query.get(term, 0) + 1
+        return query
+
+    def scores(self, user_skills) -> Dict[str, float]:
+        """Cosine similarity for every partner sharing at least one skill."""
+        query = self._query_terms(user_skills)
+
+        with self._lock:
+            weights = {t: tf * self.idf(t) for t, tf in query.items()}
+            qnorm = math.sqrt(sum(w * w for w in weights.values()))
+            if not qnorm:
+                return {}
+            dots = {}
+            for term, w in weights.items():
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = self.idf(term)
+                for pid, tf in posting.items():
+                    dots[pid] = dots.get(pid, 0.0) + w * tf * idf
+            return {pid: dot / (qnorm * self._row_norm(pid)) for pid, dot in dots.items()}
+
+    def order(self, pid) -> int:
+        return self._order[pid]
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_partner_index() -> PartnerIndex:
+    """Process-wide index over SAMPLE_PARTNERS (built once)."""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = PartnerIndex(SAMPLE_PARTNERS)
+    return _default_index
+
+
+SCORE_BONUS = 0.12
+
+
+def _score_bonus(score, cand) -> float:
+    # boost for candidates with score >= user score when user is advanced
     try:
-        docs = [" ".join(a), " ".join(b)]
-        vec = TfidfVectorizer().fit_transform(docs)
-        sim = cosine_similarity(vec[0:1], vec[1:2])[0][0]
-        return float(sim)
+        if score >= 4 and cand.get("score", 0) >= 4:
+            return SCORE_BONUS
     except Exception:
-        return _set_overlap_score(a, b)
+        pass
+    return 0.0
+
+
+def _rank(index, score, user_skills, user_email, k):
+    """
+    Best k (final_score, partner id) pairs, final_score = similarity + bonus.
+    Ties go to the earliest-inserted partner; the user is excluded by email.
+    """
+    with span("match.rank", pool=len(index), k=k) as sp:
+        ranked = _rank_pairs(index, score, user_skills, user_email, k)
+        sp.set(results=len(ranked))
+    return ranked
+
+
+def _rank_pairs(index, score, user_skills, user_email, k):
+    self_id = (user_email or "").lower()
+    sims = index.scores(user_skills)
+    sims.pop(self_id, None)
+
+    # the bonus is bounded, so only similarities near the k-th best can still win
+    if len(sims) > k:
+        cutoff = heapq.nlargest(k, sims.values())[-1] - SCORE_BONUS
+    else:
+        cutoff = float("-inf")
+    keyed = (
+        (sim + _score_bonus(score, index.get(pid)), -index.order(pid), pid)
+        for pid, sim in sims.items() if sim >= cutoff
+    )
+    top = heapq.nlargest(k, keyed)
+
+    # partners sharing no skill can only score their bonus; earliest ones win ties
+    if len(top) < k or top[-1][0] <= SCORE_BONUS:
+        skip = set(sims)
+        skip.add(self_id)
+        extra = index.take(lambda cand: _score_bonus(score, cand) > 0, exclude=skip, limit=k)
+        extra += index.take(lambda cand: True, exclude=skip.union(extra), limit=k)
+        top = heapq.nlargest(k, top + [
+            (_score_bonus(score, index.get(pid)), -index.order(pid), pid) for pid in extra
+        ])
 
+    return [(final, pid) for final, _, pid in top]
 
-def match_partner_smart(score: int, user_skills: List[str], user_email: str = None) -> Dict:
+
+def _shared_skills(partner, user_skills):
+    uset = set(s.lower() for s in user_skills)
+    return [s for s in partner.get("skills", []) if s.lower() in uset]
+
+
+def top_partners(score: int, user_skills: List[str], user_email: str = None, k: int = 5,
+                 index: PartnerIndex = None) -> List[Dict]:
+    """
+    Return the k best partners, best first, each as
+    {name, email, bio, skills, shared_skills, similarity}.
+    """
+    index = index or get_partner_index()
+    if not user_skills or k <= 0:
+        return []
+
+    results = []
+    for final, pid in _rank(index, score, user_skills, user_email, k):
+        cand = index.get(pid)
+        results.append({
+            "name": cand.get("name"),
+            "email": cand.get("email"),
+            "bio": cand.get("bio", ""),
+            "skills": list(cand.get("skills", [])),
+            "shared_skills": _shared_skills(cand, user_skills),
+            "similarity": round(final, 4),
+        })
+    return results
+
+
+def match_partner_smart(score: int, user_skills: List[str], user_email: str = None, index: PartnerIndex = None) -> Dict:
     """
     Return best partner dict (name, email, shared_skill, bio).
     Heuristics:
@@ -69,47 +304,24 @@ def match_partner_smart(score: int, user_skills: List[str], user_email: str = No
       - prefer candidates with slightly higher score (if user is intermediate/advanced)
       - avoid matching with self (by email)
     """
+    index = index or get_partner_index()
+
     if not user_skills:
         # fallback: return first partner
-        return SAMPLE_PARTNERS[0]
-
-    scored = []
-    for cand in SAMPLE_PARTNERS:
-        if user_email and cand.get("email", "").lower() == user_email.lower():
-            continue
-        if _HAVE_SKLEARN:
-            sim = _tfidf_similarity(user_skills, cand.get("skills", []))
-        else:
-            sim = _set_overlap_score(user_skills, cand.get("skills", []))
-
-        # boost for candidates with score >= user score when user is advanced
-        bonus = 0.0
-        try:
-            if score >= 4 and cand.get("score", 0) >= 4:
-                bonus = 0.12
-        except Exception:
-            bonus = 0.0
-
-        final_score = sim + bonus
-        scored.append((final_score, cand))
-
-    if not scored:
-        return {"name": "No match", "email": "", "shared_skill": None, "bio": ""}
+        pid = index.first(lambda cand: True)
+        return index.get(pid) if pid is not None else SAMPLE_PARTNERS[0]
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = scored[0][1]
+    ranked = _rank(index, score, user_skills, user_email, 1)
+    if not ranked:
+        return {"name": "No match", "email": "", "shared_skill": None, "bio": ""}
+    top = index.get(ranked[0][1])
 
     # find best shared skill or pick first skill
-    shared = None
-    uset = set(s.lower() for s in user_skills)
-    for s in top.get("skills", []):
-        if s.lower() in uset:
-            shared = s
-            break
+    shared = _shared_skills(top, user_skills)
 
     return {
         "name": top.get("name"),
         "email": top.get("email"),
-        "shared_skill": shared or (top.get("skills")[0] if top.get("skills") else None),
+        "shared_skill": shared[0] if shared else (top.get("skills")[0] if top.get("skills") else None),
         "bio": top.get("bio", "")
     }
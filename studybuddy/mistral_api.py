@@ -1,106 +1,965 @@
-# resume_skill_quiz/mistral_api.py
+# studybuddy/mistral_api.py
 """
 Stable working wrapper for Mistral LLM.
 Guaranteed to return clean JSON quiz output.
 """
 
 import os
+import contextvars
+import hashlib
+import importlib.util
 import json
+import random
+import re
+import threading
+import time
 import traceback
-import requests
 
-# Try import official mistralai client
-try:
-    from mistralai import Mistral
-    _HAS_CLIENT = True
-except Exception:
-    _HAS_CLIENT = False
+from .rate_limit import TokenBucketLimiter, RateLimitExceeded, estimate_tokens, HIGH, LOW
+from .telemetry import span, current_span, counter, histogram, log_event
+
+# The official mistralai client is used when installed. It (like requests) is
+# only imported on the first call, so importing this module stays cheap.
+_HAS_CLIENT = importlib.util.find_spec("mistralai") is not None
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
 MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-small")
-MISTRAL_URL = "https://api.mistral.ai/v1/chat/completions"
+MISTRAL_URL = os.getenv("MISTRAL_URL", "https://api.mistral.ai/v1/chat/completions")
+MISTRAL_TIMEOUT = float(os.getenv("MISTRAL_TIMEOUT", "40"))
+MISTRAL_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "5"))
+MISTRAL_MAX_CONCURRENCY = int(os.getenv("MISTRAL_MAX_CONCURRENCY", "8"))
+MISTRAL_MAX_RETRIES = int(os.getenv("MISTRAL_MAX_RETRIES", "3"))
+MISTRAL_BREAKER_THRESHOLD = int(os.getenv("MISTRAL_BREAKER_THRESHOLD", "5"))
+MISTRAL_BREAKER_RESET = float(os.getenv("MISTRAL_BREAKER_RESET", "30"))
+# identical concurrent calls share one upstream request (see SingleFlight)
+MISTRAL_COALESCE = os.getenv("MISTRAL_COALESCE", "1").lower() not in ("0", "false", "no", "off")
+MISTRAL_COALESCE_TIMEOUT = float(os.getenv("MISTRAL_COALESCE_TIMEOUT", "60"))
 
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-def _client_chat(prompt):
-    """Uses mistralai client; falls back to HTTP. Requires MISTRAL_API_KEY."""
-    if not MISTRAL_API_KEY:
-        raise ValueError("MISTRAL_API_KEY not set. Create .env with MISTRAL_API_KEY=<your_key> or export it.")
+LLM_RETRIES = counter("studybuddy_llm_retries_total", "Mistral HTTP retries.", labels=("reason",))
+LLM_TOKENS = counter("studybuddy_llm_tokens_total", "Tokens reported by Mistral.", labels=("kind",))
+LLM_PARSE = counter("studybuddy_llm_parse_total", "LLM replies by JSON parse outcome.", labels=("what", "outcome"))
+LLM_RATE_WAIT = histogram("studybuddy_llm_rate_wait_seconds",
+                          "Time LLM calls waited for the shared rate limiter.", labels=("purpose", "priority"))
+LLM_RATE_SHED = counter("studybuddy_llm_rate_shed_total",
+                        "LLM calls rejected by the rate limiter instead of waiting.", labels=("purpose", "priority"))
+LLM_COALESCED = counter("studybuddy_llm_coalesced_total",
+                        "LLM calls served by an identical in-flight call (upstream calls saved).", labels=("purpose",))
+LLM_COALESCE_ABANDONED = counter("studybuddy_llm_coalesce_abandoned_total",
+                                 "Callers that stopped waiting on a shared LLM call.", labels=("purpose", "reason"))
+
+
+def _api_key():
+    # .env may be loaded after this module is imported (see app.py)
+    return os.getenv("MISTRAL_API_KEY") or MISTRAL_API_KEY
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker rejects a call without contacting Mistral."""
+
+
+class CoalescedCallCancelled(RuntimeError):
+    """Raised in callers that were waiting on a shared call when it was cancelled."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After `failure_threshold` consecutive failed calls the circuit opens and
+    calls fail fast for `reset_timeout` seconds; then one probe call is let
+    through and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=MISTRAL_BREAKER_THRESHOLD, reset_timeout=MISTRAL_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Hand back a half-open probe whose call never reached Mistral (neither success nor failure)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def _is_transport_error(e):
+    # httpx, under the mistralai SDK, raises TransportError subclasses for connect/read failures and timeouts
+    return isinstance(e, (ConnectionError, TimeoutError)) or any(
+        c.__name__ == "TransportError" for c in type(e).__mro__)
+
+
+def _retry_after_seconds(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class MistralHTTPClient:
+    """
+    Thread-safe chat-completions client shared by the whole process.
+      - one requests.Session with a keep-alive connection pool
+      - a semaphore bounding concurrent upstream calls
+      - retries on 429/5xx and connection errors with jittered exponential backoff,
+        honoring Retry-After
+      - a circuit breaker so an outage fails fast
+    call() applies the same guards to a request made another way (the SDK).
+    `url` can point at a local stub server for testing.
+    """
+
+    def __init__(self, api_key=None, url=None, timeout=None, max_concurrency=None,
+                 max_retries=None, backoff_base=0.5, backoff_max=8.0, breaker=None):
+        self.api_key = api_key
+        self.url = url or MISTRAL_URL
+        self.timeout = (MISTRAL_CONNECT_TIMEOUT, timeout or MISTRAL_TIMEOUT)
+        self.max_concurrency = max_concurrency or MISTRAL_MAX_CONCURRENCY
+        self.max_retries = MISTRAL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.streams = 0
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key or _api_key()}",
+            "Content-Type": "application/json",
+        }
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # full jitter: uniform(0, base * 2^attempt), capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _send(self, payload, stream=False):
+        """POST with retries and backoff; returns the successful response (caller holds a slot)."""
+        import requests
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                resp = self.session.post(self.url, headers=self._headers(), json=payload,
+                                         timeout=self.timeout, stream=stream)
+                if resp.status_code not in RETRY_STATUS:
+                    # upstream answered; 4xx client errors are not an outage
+                    self.breaker.record_success()
+                    resp.raise_for_status()
+                    return resp
+                retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                error = requests.HTTPError(f"{resp.status_code} from Mistral", response=resp)
+                resp.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.HTTPError:
+                raise
+            except requests.RequestException:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+
+            if attempt >= self.max_retries:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise error
+
+            reason = str(resp.status_code) if isinstance(error, requests.HTTPError) else error.__class__.__name__
+            attempt = self._retry_wait(attempt, retry_after, reason, error)
+
+    def _retry_wait(self, attempt, retry_after, reason, error):
+        """Log and count one retry, sleep its backoff; returns the next attempt number."""
+        delay = self._backoff(attempt, retry_after)
+        log_event("llm.retry", attempt=attempt + 1, max_retries=self.max_retries,
+                  delay_s=round(delay, 3), reason=reason, error=str(error))
+        LLM_RETRIES.inc(reason=reason)
+        self.retries += 1
+        attempt += 1
+        sp = current_span()
+        if sp is not None:
+            sp.set(retries=attempt)
+        time.sleep(delay)
+        return attempt
+
+    def chat(self, payload):
+        """POST a chat-completions payload and return the decoded JSON body."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Mistral circuit breaker is open; failing fast.")
+
+        with self._slots:
+            self.calls += 1
+            return self._send(payload).json()
+
+    def call(self, fn):
+        """
+        Return fn() - one chat request made through another client, i.e. the
+        mistralai SDK - under the breaker, concurrency slots and retry policy
+        of chat(). Errors carrying a retryable status_code and transport
+        errors are retried; other API errors raise at once, as does an error
+        that never reached Mistral (e.g. an SDK version mismatch).
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Mistral circuit breaker is open; failing fast.")
+
+        with self._slots:
+            self.calls += 1
+            attempt = 0
+            while True:
+                try:
+                    result = fn()
+                except Exception as e:
+                    status = getattr(e, "status_code", None)
+                    if status is None and not _is_transport_error(e):
+                        self.breaker.release()
+                        raise
+                    if status is not None and status not in RETRY_STATUS:
+                        self.breaker.record_success()
+                        raise
+                    if attempt >= self.max_retries:
+                        self.failures += 1
+                        self.breaker.record_failure()
+                        raise
+                    headers = getattr(getattr(e, "raw_response", None), "headers", None) or {}
+                    attempt = self._retry_wait(attempt, _retry_after_seconds(headers.get("Retry-After")),
+                                               str(status) if status is not None else e.__class__.__name__, e)
+                    continue
+                self.breaker.record_success()
+                return result
+
+    def stream_chat(self, payload):
+        """
+        POST with "stream": true and yield content deltas from the SSE response.
+        Retries only happen before the first byte; a broken stream raises.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Mistral circuit breaker is open; failing fast.")
+
+        with self._slots:
+            self.calls += 1
+            self.streams += 1
+            resp = self._send(dict(payload, stream=True), stream=True)
+            # text/event-stream has no charset, which requests would read as latin-1
+            resp.encoding = "utf-8"
+            with resp:
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if chunk.get("usage") and current_span() is not None:
+                        _record_usage(current_span(), chunk["usage"])
+                    for choice in chunk.get("choices") or []:
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            yield text
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "streams": self.streams,
+            "breaker_state": self.breaker.state,
+            "breaker_rejected": self.breaker.rejected,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def close(self):
+        self.session.close()
 
-    if _HAS_CLIENT and MISTRAL_API_KEY:
+
+_http_client = None
+_sdk_client = None
+_rate_limiter = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide pooled HTTP client (created on first use)."""
+    global _http_client
+    if _http_client is None:
+        with _client_lock:
+            if _http_client is None:
+                _http_client = MistralHTTPClient()
+    return _http_client
+
+
+def _get_sdk_client():
+    global _sdk_client, _HAS_CLIENT
+    if _sdk_client is None:
+        with _client_lock:
+            if _sdk_client is None:
+                try:
+                    from mistralai import Mistral
+                except Exception:
+                    _HAS_CLIENT = False  # installed but unusable: stay on pooled HTTP
+                    raise
+                _sdk_client = Mistral(api_key=_api_key())
+    return _sdk_client
+
+
+def get_rate_limiter():
+    """Process-wide handle on the host-wide Mistral quota (MISTRAL_RPM / MISTRAL_TPM)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _client_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucketLimiter()
+    return _rate_limiter
+
+
+def _rate_priority(purpose):
+    # explanations are a nice-to-have on the result page and bank refills are
+    # background stock; quizzes block the student
+    return LOW if purpose in ("explanation", "explanations", "bank_refill") else HIGH
+
+
+def _acquire_quota(sp, purpose, prompt, max_tokens):
+    """Wait for the rate limiter; returns the tokens reserved (0 when limiting is off)."""
+    limiter = get_rate_limiter()
+    if not limiter.enabled:
+        return 0
+    estimate = estimate_tokens(prompt, max_tokens)
+    priority = _rate_priority(purpose)
+    try:
+        waited = limiter.acquire(estimate, priority)
+    except RateLimitExceeded:
+        LLM_RATE_SHED.inc(purpose=purpose, priority=priority)
+        sp.set(rate_limited=True, priority=priority)
+        raise
+    LLM_RATE_WAIT.observe(waited, purpose=purpose, priority=priority)
+    sp.set(rate_wait_ms=round(waited * 1000, 2), priority=priority)
+    return estimate
+
+
+def _settle_quota(sp, reserved, max_tokens):
+    """Give back the part of the reservation Mistral did not use."""
+    if not reserved:
+        return
+    used = (sp.attrs.get("prompt_tokens") or 0) + (sp.attrs.get("completion_tokens") or 0)
+    if not used:
+        used = reserved - int(max_tokens or 0)  # no usage reported (e.g. failed call): keep the prompt part
+    get_rate_limiter().refund(reserved - used)
+
+
+def _record_usage(sp, usage):
+    """Copy a chat-completions "usage" block onto the span and the token counter."""
+    if not usage:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = get(kind)
+        if isinstance(n, int):
+            sp.set(**{kind: n})
+            LLM_TOKENS.inc(n, kind=kind.split("_")[0])
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        # streamed calls: pieces so far, replayed to every subscriber
+        self.chunks = []
+        self.finished = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """
+    Request coalescing for identical in-flight calls.
+    The first caller for a key makes the upstream call; callers arriving with
+    the same key while it runs wait for it and receive the same result (or
+    exception). The key is forgotten as soon as the call finishes, so this is
+    not a cache.
+      - do(key, fn): the first caller runs fn() in its own thread
+      - stream(key, fn): fn() yields text pieces; a pump thread reads it and
+        every subscriber gets all pieces from the start. When the last
+        subscriber goes away the upstream stream is closed.
+    Waiting is bounded by `timeout` seconds per caller (for streams: between
+    two pieces); cancel(key) releases everyone waiting on a key.
+    """
+
+    def __init__(self, timeout=MISTRAL_COALESCE_TIMEOUT):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def _join(self, key, streaming=False):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            if streaming:
+                flight.subscribers += 1
+        return flight, leader
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _abandon(self, purpose, reason):
+        with self._lock:
+            if reason == "timeout":
+                self.timeouts += 1
+        LLM_COALESCE_ABANDONED.inc(purpose=purpose, reason=reason)
+
+    def do(self, key, fn, timeout=None, purpose=""):
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                flight.result = fn()
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._forget(key, flight)
+                flight.done.set()
+
+        LLM_COALESCED.inc(purpose=purpose)
+        with span("llm.coalesced", purpose=purpose) as sp:
+            if not flight.done.wait(self.timeout if timeout is None else timeout):
+                self._abandon(purpose, "timeout")
+                sp.set(outcome="timeout")
+                raise TimeoutError(f"shared {purpose or 'LLM'} call did not finish in time")
+            if flight.cancelled:
+                sp.set(outcome="cancelled")
+                raise CoalescedCallCancelled(f"shared {purpose or 'LLM'} call was cancelled")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+    def stream(self, key, fn, timeout=None, purpose=""):
+        flight, leader = self._join(key, streaming=True)
+        if leader:
+            ctx = contextvars.copy_context()  # the upstream span joins the first caller's trace
+            threading.Thread(target=ctx.run, args=(self._pump, key, flight, fn),
+                             name="llm-single-flight", daemon=True).start()
+        else:
+            LLM_COALESCED.inc(purpose=purpose)
+
+        timeout = self.timeout if timeout is None else timeout
+        pos = 0
         try:
-            client = Mistral(api_key=MISTRAL_API_KEY)
+            while True:
+                with flight.cond:
+                    while pos >= len(flight.chunks) and not (flight.finished or flight.cancelled):
+                        if not flight.cond.wait(timeout) and pos >= len(flight.chunks) \
+                                and not (flight.finished or flight.cancelled):
+                            self._abandon(purpose, "timeout")
+                            raise TimeoutError(f"shared {purpose or 'LLM'} stream stalled")
+                    if flight.cancelled:
+                        raise CoalescedCallCancelled(f"shared {purpose or 'LLM'} stream was cancelled")
+                    pieces = flight.chunks[pos:]
+                    finished = flight.finished
+                pos += len(pieces)
+                yield from pieces
+                if finished:
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                orphaned = flight.subscribers == 0 and not flight.finished
+                if orphaned and self._flights.get(key) is flight:
+                    del self._flights[key]
+            if orphaned:
+                # nobody is reading any more: stop the upstream stream
+                with flight.cond:
+                    flight.cancelled = True
 
-            # ✅ Correct 2024/2025 SDK method
-            resp = client.chat.completions.create(
-                model=MISTRAL_MODEL,
-                messages=[{"role": "user", "content": prompt}]
-            )
+    def _pump(self, key, flight, fn):
+        pieces = None
+        try:
+            pieces = fn()
+            for piece in pieces:
+                with flight.cond:
+                    if flight.cancelled:
+                        break
+                    flight.chunks.append(piece)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            close = getattr(pieces, "close", None)
+            if close is not None:
+                close()
+            self._forget(key, flight)
+            with flight.cond:
+                flight.finished = True
+                flight.cond.notify_all()
+
+    def cancel(self, key):
+        """Release everyone waiting on `key` with CoalescedCallCancelled; returns False if not in flight."""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if flight is None:
+                return False
+            self.cancelled += 1
+        with flight.cond:
+            flight.cancelled = True
+            flight.cond.notify_all()
+        flight.done.set()
+        return True
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "upstream_calls": self.calls,
+                "calls_saved": self.coalesced,
+                "in_flight": len(self._flights),
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+            }
+
+
+single_flight = SingleFlight()
+
+
+def coalesce_key(prompt, max_tokens, temperature, stream=False):
+    """
+    Key for identical calls: model, sampling settings and the prompt with
+    whitespace collapsed. Case is kept: code, identifiers and quoted answers
+    in a prompt are case-sensitive.
+    """
+    normalized = " ".join(prompt.split())
+    raw = json.dumps([MISTRAL_MODEL, max_tokens, temperature, bool(stream), normalized])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _client_chat(prompt, max_tokens=1000, temperature=0.2, purpose="chat"):
+    """
+    Uses mistralai client; falls back to pooled HTTP. Requires MISTRAL_API_KEY.
+    Identical concurrent calls share one upstream request (MISTRAL_COALESCE).
+    """
+    if not _api_key():
+        raise ValueError("MISTRAL_API_KEY not set. Create .env with MISTRAL_API_KEY=<your_key> or export it.")
+
+    if not MISTRAL_COALESCE:
+        return _chat_upstream(prompt, max_tokens, temperature, purpose)
+    return single_flight.do(coalesce_key(prompt, max_tokens, temperature),
+                            lambda: _chat_upstream(prompt, max_tokens, temperature, purpose), purpose=purpose)
+
+
+def _chat_upstream(prompt, max_tokens, temperature, purpose):
+    with span("llm.call", purpose=purpose, max_tokens=max_tokens, prompt_chars=len(prompt)) as sp:
+        reserved = _acquire_quota(sp, purpose, prompt, max_tokens)
+        try:
+            return _chat_send(sp, prompt, max_tokens, temperature)
+        finally:
+            _settle_quota(sp, reserved, max_tokens)
 
-            return resp.choices[0].message["content"]
 
+def _chat_send(sp, prompt, max_tokens, temperature):
+    if _HAS_CLIENT:
+        try:
+            client = _get_sdk_client()
+            # same sizing as the HTTP payload, and the same retry/breaker/concurrency guards
+            resp = get_http_client().call(lambda: client.chat.complete(
+                model=MISTRAL_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ))
+            message = resp.choices[0].message
+            content = message["content"] if isinstance(message, dict) else message.content
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print("[mistral_api] SDK client failed:", e)
+            if getattr(e, "status_code", None) is not None or _is_transport_error(e):
+                raise  # Mistral answered (or is down): the HTTP path would fare no better
+            log_event("llm.sdk_failed", error=f"{e.__class__.__name__}: {e}")
+        else:
+            sp.set(client="sdk", reply_chars=len(content or ""))
+            _record_usage(sp, getattr(resp, "usage", None))
+            return content
 
-    # ---- HTTP fallback ----
-    headers = {
-        "Authorization": f"Bearer {MISTRAL_API_KEY}",
-        "Content-Type": "application/json"
+    # ---- pooled HTTP fallback ----
+    payload = {
+        "model": MISTRAL_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens
     }
 
+    sp.set(client="http")
+    data = get_http_client().chat(payload)
+    _record_usage(sp, data.get("usage"))
+    content = data["choices"][0]["message"]["content"]
+    sp.set(reply_chars=len(content or ""))
+    return content
+
+
+def _client_chat_stream(prompt, max_tokens=1000, temperature=0.2, purpose="chat"):
+    """
+    Yields the completion text in pieces as Mistral streams it (pooled HTTP only).
+    Identical concurrent streams share one upstream request (MISTRAL_COALESCE).
+    """
+    if not _api_key():
+        raise ValueError("MISTRAL_API_KEY not set. Create .env with MISTRAL_API_KEY=<your_key> or export it.")
+
+    if not MISTRAL_COALESCE:
+        return _chat_stream_upstream(prompt, max_tokens, temperature, purpose)
+    return single_flight.stream(coalesce_key(prompt, max_tokens, temperature, stream=True),
+                                lambda: _chat_stream_upstream(prompt, max_tokens, temperature, purpose),
+                                purpose=purpose)
+
+
+def _chat_stream_upstream(prompt, max_tokens, temperature, purpose):
     payload = {
         "model": MISTRAL_MODEL,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.2,
-        "max_tokens": 1000
+        "temperature": temperature,
+        "max_tokens": max_tokens
     }
+    with span("llm.call", purpose=purpose, max_tokens=max_tokens, prompt_chars=len(prompt),
+              client="http", stream=True) as sp:
+        reserved = _acquire_quota(sp, purpose, prompt, max_tokens)
+        sent = time.perf_counter()
+        chars = 0
+        try:
+            for piece in get_http_client().stream_chat(payload):
+                if not chars:
+                    sp.set(first_token_ms=round((time.perf_counter() - sent) * 1000, 2))
+                chars += len(piece)
+                yield piece
+        finally:
+            _settle_quota(sp, reserved, max_tokens)
+        sp.set(reply_chars=chars)
 
-    resp = requests.post(MISTRAL_URL, headers=headers, json=payload, timeout=40)
-    resp.raise_for_status()
-    return resp.json()["choices"][0]["message"]["content"]
 
+class StreamingArrayParser:
+    """
+    Incremental JSON scanner for streamed LLM output.
+    feed() takes the next piece of text and returns every object that is a
+    direct element of the array under `key` (e.g. "quiz": [...]) or of a
+    top-level array, and closed within that piece. Strings and escapes are
+    tracked, so braces inside question text do not confuse it. Once such an
+    array closes the scanner looks for the next one, so a format example or
+    a bracket in prose ("enjoy [:") does not hide the real list; a `key`
+    array also takes over from a top-level one that has yielded nothing.
+    """
 
-def _try_parse_json(text):
-    """Extracts valid JSON from messy LLM output."""
-    if not text:
-        return None
+    def __init__(self, key=None):
+        self.buffer = ""
+        self.objects = 0
+        self._key = re.compile(r'"%s"\s*:\s*$' % re.escape(key)) if key else None
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None
+        self._array_objects = 0
+        self._obj_start = None
 
-    try:
-        return json.loads(text)
-    except:
-        pass
+    def _is_key_array(self, i):
+        return self._key is not None and self._key.search(self.buffer, max(0, i - 64), i) is not None
 
-    # Try to extract first JSON block
-    start = None
-    for i, c in enumerate(text):
-        if c in ["{", "["]:
-            start = i
-            break
+    def feed(self, text):
+        self.buffer += text
+        found = []
+        buf = self.buffer
+        stack = self._stack
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "[{":
+                stack.append(c)
+                if c == "[" and (self._array_depth is None and len(stack) == 1
+                                 or (self._array_depth is None or not self._array_objects)
+                                 and self._is_key_array(i)):
+                    self._array_depth = len(stack)
+                    self._array_objects = 0
+                    self._obj_start = None
+                elif c == "{" and self._array_depth is not None and len(stack) == self._array_depth + 1:
+                    self._obj_start = i
+            elif c in "]}":
+                if not stack:
+                    continue
+                stack.pop()
+                if c == "}" and self._obj_start is not None and len(stack) == self._array_depth:
+                    obj = _loads_repaired(buf[self._obj_start:i + 1])
+                    if obj is not None:
+                        found.append(obj)
+                        self._array_objects += 1
+                    self._obj_start = None
+                elif self._array_depth is not None and len(stack) < self._array_depth:
+                    # the array (or a bracket enclosing it) closed: look for the next one
+                    self._array_depth = None
+                    self._obj_start = None
+        self._pos = len(buf)
+        self.objects += len(found)
+        return found
+
+
+_CLOSERS = {"{": "}", "[": "]"}
 
-    if start is None:
-        return None
 
+def _json_candidates(text):
+    """
+    Single pass over `text` yielding every top-level JSON object/array as
+    (start, end, truncated_at), truncated_at being None for complete ones.
+    Brackets inside string literals are skipped. A stray or mismatched closer
+    abandons the current candidate instead of raising, and so does reaching
+    the end of the text; in both cases the complete values directly inside
+    it are yielded instead (prose like "enjoy [:" before the real JSON).
+    Output cut off mid-JSON is also yielded as a truncated candidate with its
+    last element boundary.
+    """
     stack = []
-    for j in range(start, len(text)):
-        if text[j] in ["{", "["]:
-            stack.append(text[j])
-        elif text[j] in ["}", "]"]:
+    start = None
+    in_string = False
+    escape = False
+    children = []   # complete values directly inside the current candidate
+    child_start = None
+    last_cut = None  # (index of the last comma between elements, open brackets there)
+
+    for i, c in enumerate(text):
+        if start is None:
+            if c in _CLOSERS:
+                start = i
+                stack = [c]
+                children = []
+                last_cut = None
+            continue
+
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in _CLOSERS:
+            stack.append(c)
+            if len(stack) == 2:
+                child_start = i
+        elif c in "}]":
+            if _CLOSERS[stack[-1]] != c:
+                # not JSON after all (e.g. "[see {below]"); keep what was complete inside
+                for child in children:
+                    yield child[0], child[1], None
+                start = None
+                continue
             stack.pop()
             if not stack:
-                try:
-                    return json.loads(text[start:j+1])
-                except:
-                    return None
+                yield start, i + 1, None
+                start = None
+            elif len(stack) == 1:
+                children.append((child_start, i + 1))
+        elif c == ",":
+            last_cut = (i, tuple(stack))
+
+    if start is not None:
+        for child in children:
+            yield child[0], child[1], None
+        yield start, len(text), last_cut
+
+
+def _strip_trailing_commas(chunk):
+    """Drop commas directly before a closing bracket, outside string literals."""
+    out = []
+    in_string = False
+    escape = False
+    pending = None  # index in `out` of a comma that may turn out to be trailing
+    for c in chunk:
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            pending = None
+        elif c == ",":
+            pending = len(out)
+        elif c in "}]":
+            if pending is not None:
+                out[pending] = ""
+            pending = None
+        elif not c.isspace():
+            pending = None
+        out.append(c)
+    return "".join(out)
+
+
+def _loads_repaired(chunk):
+    """json.loads, then again with trailing commas removed; None if both fail."""
+    try:
+        return json.loads(chunk, strict=False)
+    except ValueError:
+        pass
+    repaired = _strip_trailing_commas(chunk)
+    if repaired != chunk:
+        try:
+            return json.loads(repaired, strict=False)
+        except ValueError:
+            pass
     return None
 
 
-def generate_quiz(skills, num_questions=5):
-    """Returns clean list of MCQs."""
-    if isinstance(skills, list):
-        skills = ", ".join(skills)
+def _close_truncated(text, start, last_cut):
+    """Best-effort completion of JSON cut off by max_tokens: keep whole elements only."""
+    if last_cut is None:
+        return None
+    cut, open_brackets = last_cut
+    suffix = "".join(_CLOSERS[b] for b in reversed(open_brackets))
+    return _loads_repaired(text[start:cut] + suffix)
 
-    prompt = f"""
+
+def _try_parse_json(text, want=None):
+    """
+    Extracts valid JSON from messy LLM output: code fences, prose around the
+    JSON, several JSON blocks, brackets inside strings, trailing commas and
+    replies truncated mid-JSON. When `want` is a key, the object containing
+    it with the longest value wins (a short format example often comes
+    first); otherwise the first candidate that parses.
+    """
+    if not text:
+        return None
+
+    try:
+        parsed = json.loads(text, strict=False)
+        if want is None or (isinstance(parsed, dict) and want in parsed):
+            return parsed
+    except ValueError:
+        pass
+
+    first = None
+    best = None
+    best_size = -1
+    for start, end, truncated_at in _json_candidates(text):
+        if truncated_at is None:
+            parsed = _loads_repaired(text[start:end])
+        else:
+            parsed = _close_truncated(text, start, truncated_at)
+        if parsed is None:
+            continue
+        if want is None:
+            return parsed
+        if first is None:
+            first = parsed
+        if isinstance(parsed, dict) and want in parsed:
+            value = parsed[want]
+            size = len(value) if isinstance(value, (list, dict, str)) else 0
+            if size > best_size:
+                best, best_size = parsed, size
+    return best if best is not None else first
+
+
+def _parse_reply(raw, want, what):
+    """_try_parse_json() under a span, counting ok / failed parses per reply type."""
+    with span("llm.parse_json", what=what, chars=len(raw or "")) as sp:
+        parsed = _try_parse_json(raw, want=want)
+        ok = isinstance(parsed, dict) and want in parsed
+        sp.set(ok=ok)
+    LLM_PARSE.inc(what=what, outcome="ok" if ok else "failed")
+    return parsed
+
+
+def _is_mcq(obj):
+    """A plausible MCQ: real question text (not the prompt's "..." placeholder) and four options."""
+    if not isinstance(obj, dict):
+        return False
+    question, options = obj.get("question"), obj.get("options")
+    return (isinstance(question, str) and any(ch.isalnum() for ch in question)
+            and isinstance(options, list) and len(options) == 4)
+
+
+def _quiz_prompt(skills, num_questions):
+    return f"""
 Generate {num_questions} multiple-choice questions for these skills: {skills}.
 Each MCQ must have exactly 4 options and one correct answer (A–D).
+Each MCQ must also include a 1–2 sentence explanation of why the correct answer is right,
+and the skill (one of: {skills}) it tests.
 
 Return STRICT JSON ONLY:
 
@@ -109,29 +968,85 @@ Return STRICT JSON ONLY:
     {{
       "question": "...",
       "options": ["A", "B", "C", "D"],
-      "answer": "A"
+      "answer": "A",
+      "explanation": "...",
+      "skill": "..."
     }}
   ]
 }}
-No explanation. No extra text.
+No extra text.
 """
 
+
+def _quiz_max_tokens(num_questions):
+    return min(4000, 220 * int(num_questions) + 200)
+
+
+def generate_quiz(skills, num_questions=5, purpose="quiz"):
+    """
+    Returns clean list of MCQs, each with its explanation and skill tag.
+    `purpose` labels the call for the rate limiter ("bank_refill" runs at LOW priority).
+    """
+    if isinstance(skills, list):
+        skills = ", ".join(skills)
+
+    prompt = _quiz_prompt(skills, num_questions)
+
     try:
-        raw = _client_chat(prompt)
-        parsed = _try_parse_json(raw)
+        raw = _client_chat(prompt, max_tokens=_quiz_max_tokens(num_questions), purpose=purpose)
+        parsed = _parse_reply(raw, "quiz", "quiz")
 
-        if parsed and "quiz" in parsed:
+        if isinstance(parsed, dict) and "quiz" in parsed:
             return parsed["quiz"]
 
-        print("[mistral_api] JSON not parsed:", raw)
+        log_event("llm.unparsed", what="quiz", reply=raw)
         return []
 
     except Exception as e:
-        print("[mistral_api] error:", e)
-        traceback.print_exc()
+        log_event("llm.error", what="quiz", error=f"{e.__class__.__name__}: {e}",
+                  traceback=traceback.format_exc())
         return []
 
 
+def generate_quiz_stream(skills, num_questions=5):
+    """
+    Like generate_quiz(), but yields each MCQ dict as soon as the model has
+    finished writing it. Falls back to generate_quiz() when streaming fails
+    before the first question.
+    """
+    if isinstance(skills, list):
+        skills = ", ".join(skills)
+
+    parser = StreamingArrayParser(key="quiz")
+    yielded = 0
+    try:
+        for piece in _client_chat_stream(_quiz_prompt(skills, num_questions),
+                                         max_tokens=_quiz_max_tokens(num_questions), purpose="quiz"):
+            for obj in parser.feed(piece):
+                if _is_mcq(obj):
+                    yielded += 1
+                    yield obj
+    except Exception as e:
+        log_event("llm.stream_error", what="quiz", error=f"{e.__class__.__name__}: {e}",
+                  questions=yielded)
+        # a shed call would only be shed again
+        if not yielded and not isinstance(e, RateLimitExceeded):
+            yield from generate_quiz(skills, num_questions=num_questions)
+        return
+
+    if yielded:
+        LLM_PARSE.inc(what="quiz_stream", outcome="ok")
+        return
+
+    # nothing usable streamed (the model ignored the requested shape, or the
+    # scanner lost track in prose): parse the whole reply instead
+    parsed = _parse_reply(parser.buffer, "quiz", "quiz_stream")
+    if isinstance(parsed, dict) and isinstance(parsed.get("quiz"), list):
+        yield from (q for q in parsed["quiz"] if _is_mcq(q))
+    else:
+        log_event("llm.unparsed", what="quiz_stream", reply=parser.buffer)
+
+
 def get_explanation(q, user, correct):
     prompt = f"""
 Explain why '{user}' is incorrect and '{correct}' is correct for this question:
@@ -139,7 +1054,66 @@ Explain why '{user}' is incorrect and '{correct}' is correct for this question:
 Give a short 2–3 line explanation.
 """
     try:
-        ans = _client_chat(prompt)
+        ans = _client_chat(prompt, purpose="explanation")
         return ans
     except:
         return "Explanation unavailable."
+
+
+def get_explanations_batch(items):
+    """
+    Explain several wrong answers with a single LLM call.
+    items: list of dicts with "question", "user" and "correct".
+    Returns a list aligned with items; entries the model did not return are None.
+    """
+    if not items:
+        return []
+
+    lines = []
+    for i, item in enumerate(items, start=1):
+        lines.append(
+            f"{i}. Question: {item.get('question', '')}\n"
+            f"   Student answered: '{item.get('user', '')}'. Correct answer: '{item.get('correct', '')}'."
+        )
+    numbered = "\n".join(lines)
+
+    prompt = f"""
+For each numbered question below, explain in 2–3 lines why the student's answer is incorrect and the correct answer is correct.
+
+{numbered}
+
+Return STRICT JSON ONLY:
+
+{{
+  "explanations": [
+    {{"index": 1, "explanation": "..."}}
+  ]
+}}
+"""
+
+    explanations = [None] * len(items)
+    try:
+        raw = _client_chat(prompt, max_tokens=min(4000, 160 * len(items) + 100), purpose="explanations")
+    except Exception as e:
+        log_event("llm.error", what="explanations", error=f"{e.__class__.__name__}: {e}")
+        return explanations
+
+    parsed = _parse_reply(raw, "explanations", "explanations")
+    entries = parsed.get("explanations") if isinstance(parsed, dict) else parsed
+    if not isinstance(entries, list):
+        log_event("llm.unparsed", what="explanations", reply=raw)
+        return explanations
+
+    for pos, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            text = entry.get("explanation")
+            idx = entry.get("index", pos + 1)
+        else:
+            text, idx = entry, pos + 1
+        try:
+            idx = int(idx) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= idx < len(items) and isinstance(text, str) and text.strip():
+            explanations[idx] = text.strip()
+    return explanations
@@ -0,0 +1,226 @@
+# studybuddy/partner_store.py
+"""
+Persistent partner registry for StudyBuddy (SQLite by default).
+Every student who finishes the quiz is registered with their skills and
+score. A skill -> partner inverted index table keeps candidate lookups to
+students sharing at least one skill, and a revision counter lets each
+worker's in-memory PartnerIndex pull only what changed.
+Exposes:
+ - PartnerStore(path, pool_size=4)
+ - ConnectionPool(path, size=4)
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+PARTNER_DB_PATH = os.getenv("PARTNER_DB_PATH", os.path.join("data", "partners.sqlite3"))
+PARTNER_DB_POOL_SIZE = int(os.getenv("PARTNER_DB_POOL_SIZE", "4"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS partners (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    bio TEXT NOT NULL DEFAULT '',
+    score INTEGER NOT NULL DEFAULT 0,
+    skills TEXT NOT NULL DEFAULT '[]',
+    rev INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS partners_rev ON partners(rev);
+CREATE TABLE IF NOT EXISTS partner_skills (
+    skill TEXT NOT NULL,
+    partner_id INTEGER NOT NULL REFERENCES partners(id),
+    PRIMARY KEY (skill, partner_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS partner_skills_partner ON partner_skills(partner_id);
+"""
+
+
+def _normalize_skill(skill) -> str:
+    return " ".join(str(skill).lower().split())
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by request threads."""
+
+    def __init__(self, path, size=PARTNER_DB_POOL_SIZE, timeout=10.0):
+        self.path = path
+        self.size = max(1, size)
+        self._pool = queue.Queue(maxsize=self.size)
+        for _ in range(self.size):
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=%d" % int(timeout * 1000))
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class PartnerStore:
+    """
+    SQLite-backed partner registry.
+    Partners are keyed by lower-cased email; removals are soft deletes so
+    incremental syncs can see them.
+    """
+
+    def __init__(self, path=PARTNER_DB_PATH, pool_size=PARTNER_DB_POOL_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.pool = ConnectionPool(path, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+        self._sync_lock = threading.Lock()
+
+    @staticmethod
+    def _row_to_partner(row):
+        return {
+            "name": row[1],
+            "email": row[0],
+            "skills": json.loads(row[3]),
+            "score": row[4],
+            "bio": row[2],
+        }
+
+    def register(self, partner) -> int:
+        """Insert or update a partner (by email); returns the new revision."""
+        email = (partner.get("email") or "").strip().lower()
+        if not email:
+            raise ValueError("partner email is required")
+        skills = [str(s).strip() for s in partner.get("skills", []) if str(s).strip()]
+        terms = sorted({_normalize_skill(s) for s in skills})
+        name = partner.get("name") or email.split("@")[0]
+        try:
+            score = int(partner.get("score") or 0)
+        except (TypeError, ValueError):
+            score = 0
+
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rev = conn.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM partners").fetchone()[0]
+                conn.execute(
+                    "INSERT INTO partners (email, name, bio, score, skills, rev, deleted, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, 0, ?)"
+                    " ON CONFLICT(email) DO UPDATE SET name = excluded.name, bio = excluded.bio,"
+                    " score = excluded.score, skills = excluded.skills, rev = excluded.rev,"
+                    " deleted = 0, updated = excluded.updated",
+                    (email, name, partner.get("bio", "") or "", score, json.dumps(skills), rev, time.time()),
+                )
+                pid = conn.execute("SELECT id FROM partners WHERE email = ?", (email,)).fetchone()[0]
+                conn.execute("DELETE FROM partner_skills WHERE partner_id = ?", (pid,))
+                conn.executemany(
+                    "INSERT INTO partner_skills (skill, partner_id) VALUES (?, ?)",
+                    [(t, pid) for t in terms],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rev
+
+    def remove(self, email) -> bool:
+        email = (email or "").strip().lower()
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT id FROM partners WHERE email = ? AND deleted = 0", (email,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return False
+                rev = conn.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM partners").fetchone()[0]
+                conn.execute("UPDATE partners SET deleted = 1, rev = ?, updated = ? WHERE id = ?",
+                             (rev, time.time(), row[0]))
+                conn.execute("DELETE FROM partner_skills WHERE partner_id = ?", (row[0],))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def seed(self, partners) -> int:
+        """Register `partners` only if the registry is empty; returns how many were added."""
+        if self.count():
+            return 0
+        for p in partners:
+            self.register(p)
+        return len(partners)
+
+    def count(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM partners WHERE deleted = 0").fetchone()[0]
+
+    def get(self, email):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT email, name, bio, skills, score FROM partners WHERE email = ? AND deleted = 0",
+                ((email or "").strip().lower(),),
+            ).fetchone()
+        return self._row_to_partner(row) if row else None
+
+    def find_by_skills(self, skills, limit=None):
+        """
+        Partners sharing at least one skill, most shared skills first.
+        Uses the skill -> partner index, so only those partners are read.
+        """
+        terms = sorted({_normalize_skill(s) for s in skills or [] if str(s).strip()})
+        if not terms:
+            return []
+        marks = ",".join("?" * len(terms))
+        sql = (
+            "SELECT p.email, p.name, p.bio, p.skills, p.score, COUNT(*) AS shared"
+            " FROM partner_skills ps JOIN partners p ON p.id = ps.partner_id"
+            f" WHERE ps.skill IN ({marks}) AND p.deleted = 0"
+            " GROUP BY p.id ORDER BY shared DESC, p.id ASC"
+        )
+        params = list(terms)
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [dict(self._row_to_partner(r), shared=r[5]) for r in rows]
+
+    def changes_since(self, rev):
+        """[(rev, partner, deleted)] for every change after `rev`, oldest first."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT email, name, bio, skills, score, rev, deleted FROM partners"
+                " WHERE rev > ? ORDER BY rev",
+                (rev,),
+            ).fetchall()
+        return [(r[5], self._row_to_partner(r), bool(r[6])) for r in rows]
+
+    def sync(self, index) -> int:
+        """
+        Apply registry changes newer than index.synced_rev to a PartnerIndex.
+        Returns the number of changes applied.
+        """
+        with self._sync_lock:
+            changes = self.changes_since(index.synced_rev)
+            for rev, partner, deleted in changes:
+                if deleted:
+                    index.remove(index.partner_id(partner))
+                else:
+                    index.add(partner)
+                index.synced_rev = rev
+        return len(changes)
@@ -0,0 +1,318 @@
+# studybuddy/question_bank.py
+"""
+Per-skill question bank for StudyBuddy.
+Validated MCQs are stored per skill in SQLite. A quiz is assembled by
+sampling from the bank, skipping questions the student has already seen,
+and a background refiller tops up skills whose pool falls below a
+watermark, so peak-time quizzes need no LLM call at all. Refills stand
+aside while a student's quiz is being generated, back off per skill after
+failures and give up on a skill after QUESTION_BANK_REFILL_GIVE_UP of them;
+each skill's pool is capped at QUESTION_BANK_MAX_PER_SKILL questions.
+Exposes:
+ - QuestionBank(path, normalize=None, max_per_skill=200)
+ - BankRefiller(bank, generate, watermark=20, batch=10, interval=60, busy=None)
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from .cache import content_key
+from .telemetry import log_event
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join("data", "question_bank.sqlite3"))
+QUESTION_BANK_WATERMARK = int(os.getenv("QUESTION_BANK_WATERMARK", "20"))
+QUESTION_BANK_BATCH = int(os.getenv("QUESTION_BANK_BATCH", "10"))
+QUESTION_BANK_REFILL_INTERVAL = float(os.getenv("QUESTION_BANK_REFILL_INTERVAL", "60"))
+QUESTION_BANK_REFILL_MAX_BACKOFF = float(os.getenv("QUESTION_BANK_REFILL_MAX_BACKOFF", "3600"))
+QUESTION_BANK_REFILL_GIVE_UP = int(os.getenv("QUESTION_BANK_REFILL_GIVE_UP", "5"))
+QUESTION_BANK_MAX_PER_SKILL = int(os.getenv("QUESTION_BANK_MAX_PER_SKILL", "200"))
+
+
+def _skill_key(skill) -> str:
+    return " ".join(str(skill).lower().split())
+
+
+def _question_key(q) -> str:
+    # same question text and options -> same bank entry, whatever the skill spelling
+    return content_key(" ".join(q["question"].lower().split()), [o.lower() for o in q["options"]])
+
+
+class QuestionBank:
+    """
+    SQLite-backed MCQ pool keyed by normalized skill.
+    `normalize(raw, skills)` validates incoming questions (quiz_generator's
+    _normalize_questions); anything it rejects never enters the bank.
+    A skill keeps at most `max_per_skill` questions (0 = no cap); the oldest
+    are dropped first.
+    """
+
+    def __init__(self, path=QUESTION_BANK_PATH, normalize=None, max_per_skill=QUESTION_BANK_MAX_PER_SKILL):
+        self.path = path or ":memory:"
+        self.max_per_skill = max_per_skill
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS bank_questions ("
+            " id INTEGER PRIMARY KEY,"
+            " skill TEXT NOT NULL,"
+            " qkey TEXT NOT NULL UNIQUE,"
+            " data TEXT NOT NULL,"
+            " created REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bank_questions_skill ON bank_questions(skill);"
+            "CREATE TABLE IF NOT EXISTS bank_skills ("
+            " skill TEXT PRIMARY KEY,"
+            " label TEXT NOT NULL,"
+            " requests INTEGER NOT NULL DEFAULT 0,"
+            " last_requested REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS bank_seen ("
+            " student TEXT NOT NULL,"
+            " qkey TEXT NOT NULL,"
+            " seen REAL NOT NULL,"
+            " PRIMARY KEY (student, qkey)) WITHOUT ROWID;"
+        )
+        self.served = 0
+        self.shortfalls = 0
+        self.added = 0
+        self.evicted = 0
+
+    def add(self, skill, questions) -> int:
+        """Validate and store questions under `skill`; returns how many were new."""
+        if self.normalize is not None:
+            questions = self.normalize(questions, [skill])
+        skill_key = _skill_key(skill)
+        now = time.time()
+        rows = []
+        for q in questions or []:
+            q = dict(q, skill=q.get("skill") or str(skill).strip())
+            rows.append((skill_key, _question_key(q), json.dumps(q, ensure_ascii=False), now))
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bank_questions (skill, qkey, data, created) VALUES (?, ?, ?, ?)", rows
+            )
+            added = self._conn.total_changes - before
+            evicted = 0
+            if added and self.max_per_skill:
+                evicted = self._conn.execute(
+                    "DELETE FROM bank_questions WHERE skill = ? AND id NOT IN"
+                    " (SELECT id FROM bank_questions WHERE skill = ? ORDER BY id DESC LIMIT ?)",
+                    (skill_key, skill_key, self.max_per_skill),
+                ).rowcount
+            self._conn.execute(
+                "INSERT OR IGNORE INTO bank_skills (skill, label, requests, last_requested) VALUES (?, ?, 0, ?)",
+                (skill_key, str(skill).strip(), now),
+            )
+            self._conn.execute("COMMIT")
+        self.added += added
+        self.evicted += max(evicted, 0)
+        return added
+
+    def note_demand(self, skills):
+        """Record that students asked for these skills, so the refiller keeps them stocked."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO bank_skills (skill, label, requests, last_requested) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT(skill) DO UPDATE SET requests = requests + 1, last_requested = excluded.last_requested",
+                [(_skill_key(s), str(s).strip(), now) for s in skills if str(s).strip()],
+            )
+
+    def count(self, skill) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM bank_questions WHERE skill = ?", (_skill_key(skill),)
+            ).fetchone()[0]
+
+    def _unseen(self, skill_key, student, limit):
+        if student:
+            rows = self._conn.execute(
+                "SELECT qkey, data FROM bank_questions q WHERE skill = ?"
+                " AND NOT EXISTS (SELECT 1 FROM bank_seen s WHERE s.student = ? AND s.qkey = q.qkey)",
+                (skill_key, student),
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                "SELECT qkey, data FROM bank_questions WHERE skill = ?", (skill_key,)
+            ).fetchall()
+        return random.sample(rows, min(limit, len(rows)))
+
+    def sample(self, skills, num_questions, student=None):
+        """
+        Up to `num_questions` questions spread round-robin over `skills`,
+        none of which `student` has seen before (see mark_seen()).
+        Returns fewer questions when the bank runs short.
+        """
+        keys = []
+        for s in skills:
+            k = _skill_key(s)
+            if k and k not in keys:
+                keys.append(k)
+        if not keys or num_questions <= 0:
+            return []
+        student = (student or "").strip().lower() or None
+
+        with self._lock:
+            pools = {k: self._unseen(k, student, num_questions) for k in keys}
+            picked = []
+            while len(picked) < num_questions and any(pools.values()):
+                for k in keys:
+                    if pools[k] and len(picked) < num_questions:
+                        picked.append(pools[k].pop())
+
+        if len(picked) < num_questions:
+            self.shortfalls += 1
+        self.served += len(picked)
+        return [json.loads(data) for _, data in picked]
+
+    def mark_seen(self, student, questions):
+        """Exclude `questions` from the student's future samples."""
+        student = (student or "").strip().lower()
+        if not student or not questions:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bank_seen (student, qkey, seen) VALUES (?, ?, ?)",
+                [(student, _question_key(q), now) for q in questions],
+            )
+
+    def unseen_by(self, student, questions):
+        """The subset of `questions` that `student` has not been served yet."""
+        student = (student or "").strip().lower()
+        if not student or not questions:
+            return list(questions or [])
+        keys = [_question_key(q) for q in questions]
+        with self._lock:
+            seen = {row[0] for row in self._conn.execute(
+                "SELECT qkey FROM bank_seen WHERE student = ? AND qkey IN (%s)" % ",".join("?" * len(keys)),
+                [student] + keys,
+            )}
+        return [q for q, k in zip(questions, keys) if k not in seen]
+
+    def low_skills(self, watermark=QUESTION_BANK_WATERMARK):
+        """[(label, count)] for known skills with fewer than `watermark` questions, most requested first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT k.label, COUNT(q.id) AS n FROM bank_skills k"
+                " LEFT JOIN bank_questions q ON q.skill = k.skill"
+                " GROUP BY k.skill HAVING n < ?"
+                " ORDER BY k.requests DESC, k.last_requested DESC",
+                (watermark,),
+            ).fetchall()
+
+    def stats(self):
+        with self._lock:
+            questions, skills = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT skill) FROM bank_questions"
+            ).fetchone()
+        return {"questions": questions, "skills": skills, "served": self.served,
+                "shortfalls": self.shortfalls, "added": self.added, "evicted": self.evicted}
+
+
+class BankRefiller:
+    """
+    Daemon thread that tops up low skills with `generate([skill], num_questions=batch)`.
+    It wakes every `interval` seconds, or immediately after wake(), and ends a
+    pass early while `busy()` is true (student-facing generation in progress).
+    A skill whose refill fails waits interval * 2^failures (capped at
+    `max_backoff`) before its next try, and is dropped after `give_up`
+    consecutive failures.
+    """
+
+    def __init__(self, bank, generate, watermark=QUESTION_BANK_WATERMARK,
+                 batch=QUESTION_BANK_BATCH, interval=QUESTION_BANK_REFILL_INTERVAL, busy=None,
+                 max_backoff=QUESTION_BANK_REFILL_MAX_BACKOFF, give_up=QUESTION_BANK_REFILL_GIVE_UP):
+        self.bank = bank
+        self.generate = generate
+        self.watermark = watermark
+        self.batch = batch
+        self.interval = interval
+        self.busy = busy
+        self.max_backoff = max_backoff
+        self.give_up = give_up
+        self._retry = {}  # skill key -> (consecutive failures, monotonic time of the next try)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.calls = 0
+        self.failures = 0
+        self.deferred = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="studybuddy-bank-refill", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _failed(self, key):
+        failures = self._retry.get(key, (0, 0.0))[0] + 1
+        delay = min(self.max_backoff, self.interval * (2 ** failures))
+        self._retry[key] = (failures, time.monotonic() + delay)
+        self.failures += 1
+
+    def refill_once(self) -> int:
+        """One pass over the low skills; returns the number of questions added."""
+        added = 0
+        for label, count in self.bank.low_skills(self.watermark):
+            if self._stop.is_set():
+                break
+            if self.busy is not None and self.busy():
+                # a student is waiting on the LLM: leave the rest for the next round
+                self.deferred += 1
+                break
+            key = _skill_key(label)
+            failures, next_try = self._retry.get(key, (0, 0.0))
+            if (self.give_up and failures >= self.give_up) or time.monotonic() < next_try:
+                continue
+            self.calls += 1
+            try:
+                raw = self.generate([label], num_questions=min(self.batch, self.watermark - count))
+                new = self.bank.add(label, raw)
+            except Exception as e:
+                self._failed(key)
+                log_event("bank.refill_failed", skill=label, error=f"{e.__class__.__name__}: {e}")
+                continue
+            if not new:
+                # the LLM is down or returned only duplicates: back off before the next try
+                self._failed(key)
+            else:
+                self._retry.pop(key, None)
+            added += new
+        return added
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.refill_once()
+
+    def stats(self):
+        given_up = sorted(k for k, (failures, _) in self._retry.items() if self.give_up and failures >= self.give_up)
+        return {"running": bool(self._thread and self._thread.is_alive()),
+                "calls": self.calls, "failures": self.failures, "deferred": self.deferred,
+                "backing_off": len(self._retry) - len(given_up), "given_up": given_up}
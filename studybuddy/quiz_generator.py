@@ -2,66 +2,584 @@
 """
 Quiz wrapper for StudyBuddy that reuses studybuddy.mistral_api.
 Exposes:
- - generate_quiz_questions(skills, num_questions=5)
- - evaluate_quiz_answers(questions, user_answers)
+ - generate_quiz_questions(skills, num_questions=5, student=None, on_question=None)
+ - evaluate_quiz_answers(questions, user_answers, explain_mode=None, deadline=None)
+ - collect_late_explanations(token)
+ - quiz_cache_key(skills, num_questions)
+ - get_quiz_cache(), get_question_bank(), start_bank_refiller()
+Both stores are opened on first use, so importing this module creates no
+database files; `quiz_cache` / `question_bank` still resolve (to the same
+objects) as module attributes.
 """
 
+import contextvars
+import functools
 import json
+import os
+import queue
+import re
+import threading
+import time
 import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from .cache import PersistentCache, content_key
+from .question_bank import QuestionBank, BankRefiller, QUESTION_BANK_PATH
+from .telemetry import span, log_event
 
 # ✅ Use relative import for reliability
 try:
-    from .mistral_api import generate_quiz as _mistral_generate, get_explanation as _mistral_explain
+    from .mistral_api import (
+        generate_quiz as _mistral_generate,
+        generate_quiz_stream as _mistral_generate_stream,
+        get_explanation as _mistral_explain,
+        get_explanations_batch as _mistral_explain_batch,
+    )
     _HAVE_MISTRAL = True
 except Exception as e:
     _mistral_generate = None
+    _mistral_generate_stream = None
     _mistral_explain = None
+    _mistral_explain_batch = None
     _HAVE_MISTRAL = False
-    print("[studybuddy.quiz] Warning: could not import mistral_api:", e)
+    log_event("quiz.mistral_unavailable", error=str(e))
+
+QUIZ_CACHE_PATH = os.getenv("QUIZ_CACHE_PATH", os.path.join("data", "quiz_cache.sqlite3"))
+QUIZ_CACHE_TTL = int(os.getenv("QUIZ_CACHE_TTL", str(7 * 24 * 3600)))
+QUIZ_CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "2000"))
+# stream quiz generation so each question is usable as soon as the model finishes it
+QUIZ_STREAM = os.getenv("QUIZ_STREAM", "1").lower() not in ("0", "false", "no")
+# one smaller prompt per skill, generated concurrently, instead of one long completion
+QUIZ_FANOUT = os.getenv("QUIZ_FANOUT", "1").lower() not in ("0", "false", "no")
+QUIZ_FANOUT_DEADLINE = float(os.getenv("QUIZ_FANOUT_DEADLINE", "25"))
+QUIZ_FANOUT_WORKERS = int(os.getenv("QUIZ_FANOUT_WORKERS", "8"))
+
+_quiz_cache = None
+_question_bank = None
+_stores_lock = threading.Lock()
+
+# Explanation modes for wrong answers: "serial", "concurrent" or "batch"
+EXPLAIN_MODE = os.getenv("QUIZ_EXPLAIN_MODE", "concurrent")
+EXPLAIN_DEADLINE = float(os.getenv("QUIZ_EXPLAIN_DEADLINE", "8"))
+EXPLAIN_WORKERS = int(os.getenv("QUIZ_EXPLAIN_WORKERS", "8"))
+LATE_EXPLANATION_TTL = 600
+
+_explain_pool = None
+_explain_pool_lock = threading.Lock()
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+_SHARD_DONE = object()
+
+
+
+ANSWER_LETTERS = "ABCD"
+# bump when the cached question schema changes so stale quizzes are not served
+QUIZ_SCHEMA_VERSION = 2
+
+_OPTION_PREFIX = re.compile(r"^\s*\(?[A-Da-d][\)\.:]\s+")
+_ANSWER_LETTER = re.compile(r"^\(?([A-Da-d])[\)\.:]?$")
+_ANSWER_PREFIX = re.compile(r"^\(?([A-Da-d])[\)\.:]\s+(.*)$", re.DOTALL)
+
+
+def _normalize_answer(answer, options):
+    """
+    Map 'A', '(b)', 'C. text' or the option text itself to a letter A–D.
+    Option text is matched first, so an answer like "A tree" is the option
+    "A tree", never the letter A.
+    """
+    text = str(answer or "").strip()
+    if not text:
+        return None
+    lowered = [opt.lower() for opt in options]
+    if text.lower() in lowered:
+        return ANSWER_LETTERS[lowered.index(text.lower())]
+    m = _ANSWER_LETTER.match(text)
+    if m:
+        return m.group(1).upper()
+    m = _ANSWER_PREFIX.match(text)
+    if m:
+        rest = m.group(2).strip().lower()
+        return ANSWER_LETTERS[lowered.index(rest)] if rest in lowered else m.group(1).upper()
+    return None
+
 
+def _normalize_question(q, skills=None):
+    """Validate one MCQ; returns a clean dict or None if it is unusable."""
+    if not isinstance(q, dict):
+        return None
+
+    question = q.get("question")
+    options = q.get("options")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != len(ANSWER_LETTERS):
+        return None
+    options = [_OPTION_PREFIX.sub("", str(o)).strip() for o in options]
+    if not all(options):
+        return None
+
+    answer = _normalize_answer(q.get("answer"), options)
+    if answer is None:
+        return None
+
+    explanation = q.get("explanation")
+    explanation = explanation.strip() if isinstance(explanation, str) else ""
+
+    skill = q.get("skill")
+    skill = skill.strip() if isinstance(skill, str) else ""
+    if skill and skills:
+        # prefer the caller's spelling of the skill
+        for s in skills:
+            if str(s).strip().lower() == skill.lower():
+                skill = str(s).strip()
+                break
+
+    return {
+        "question": question.strip(),
+        "options": options,
+        "answer": answer,
+        "explanation": explanation,
+        "skill": skill,
+    }
+
+
+def _normalize_questions(obj, skills=None):
+    """Normalize quiz output into a clean list of validated MCQ dicts."""
+    if isinstance(skills, str):
+        skills = [s for s in skills.split(",") if s.strip()]
 
-def _normalize_questions(obj):
-    """Normalize quiz output into a clean list of dicts."""
     if isinstance(obj, list):
-        return [q for q in obj if isinstance(q, dict) and "question" in q and "options" in q and "answer" in q]
+        questions = (_normalize_question(q, skills) for q in obj)
+        return [q for q in questions if q is not None]
 
     if isinstance(obj, dict) and "quiz" in obj:
-        return _normalize_questions(obj["quiz"])
+        return _normalize_questions(obj["quiz"], skills)
 
     if isinstance(obj, str):
         try:
             parsed = json.loads(obj)
-            return _normalize_questions(parsed)
+            return _normalize_questions(parsed, skills)
         except Exception:
             return []
 
     return []
 
 
-def generate_quiz_questions(skills, num_questions=5):
-    """Generate quiz questions using Mistral API."""
-    if not skills:
-        return []
+def get_quiz_cache():
+    """Process-wide quiz cache (QUIZ_CACHE_PATH), opened on first use."""
+    global _quiz_cache
+    if _quiz_cache is None:
+        with _stores_lock:
+            if _quiz_cache is None:
+                _quiz_cache = PersistentCache(
+                    QUIZ_CACHE_PATH or None,
+                    table="quiz_cache",
+                    ttl=QUIZ_CACHE_TTL,
+                    max_entries=QUIZ_CACHE_MAX_ENTRIES,
+                )
+    return _quiz_cache
+
+
+def get_question_bank():
+    """Process-wide question bank (QUESTION_BANK_PATH), opened on first use."""
+    global _question_bank
+    if _question_bank is None:
+        with _stores_lock:
+            if _question_bank is None:
+                _question_bank = QuestionBank(QUESTION_BANK_PATH or None, normalize=_normalize_questions)
+    return _question_bank
 
+
+def __getattr__(name):
+    if name == "quiz_cache":
+        return get_quiz_cache()
+    if name == "question_bank":
+        return get_question_bank()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_bank_refiller = None
+_bank_refiller_lock = threading.Lock()
+# student-facing LLM quiz generations running in this process; refills wait for them
+_llm_quizzes = 0
+_llm_quizzes_lock = threading.Lock()
+
+
+def start_bank_refiller():
+    """
+    Start (once per process) the thread that keeps requested skills stocked.
+    Refill calls run at LOW rate-limit priority and not while a student's
+    quiz is being generated here.
+    """
+    global _bank_refiller
     if not _HAVE_MISTRAL:
-        print("[studybuddy.quiz] No mistral_api available.")
-        return []
+        return None
+    with _bank_refiller_lock:
+        if _bank_refiller is None:
+            _bank_refiller = BankRefiller(get_question_bank(),
+                                          functools.partial(_mistral_generate, purpose="bank_refill"),
+                                          busy=lambda: _llm_quizzes > 0)
+        return _bank_refiller.start()
+
+
+def quiz_cache_key(skills, num_questions):
+    """Content address of a quiz: sorted, lower-cased skill set plus question count."""
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    normalized = sorted({str(s).strip().lower() for s in skills if str(s).strip()})
+    return content_key("quiz", QUIZ_SCHEMA_VERSION, normalized, int(num_questions))
+
+
+def _question_text_key(q):
+    return " ".join(q["question"].lower().split())
+
+
+def _prompt_questions(skills, num_questions):
+    """Validated questions from one quiz prompt (streamed when QUIZ_STREAM is on)."""
+    if QUIZ_STREAM and _mistral_generate_stream:
+        for raw in _mistral_generate_stream(skills, num_questions=num_questions):
+            q = _normalize_question(raw, skills)
+            if q is not None:
+                yield q
+    else:
+        yield from _normalize_questions(_mistral_generate(skills, num_questions=num_questions), skills)
+
+
+def _get_shard_pool():
+    global _shard_pool
+    if _shard_pool is None:
+        with _shard_pool_lock:
+            if _shard_pool is None:
+                _shard_pool = ThreadPoolExecutor(
+                    max_workers=QUIZ_FANOUT_WORKERS, thread_name_prefix="studybuddy-quiz-shard"
+                )
+    return _shard_pool
+
+
+def _shard_sizes(skills, num_questions):
+    """Spread num_questions over the skills as evenly as possible, e.g. 5 over 3 -> 2, 2, 1."""
+    base, extra = divmod(num_questions, len(skills))
+    return [(skill, base + (i < extra)) for i, skill in enumerate(skills) if base + (i < extra)]
+
+
+def _run_shard(skills, num_questions, out, stop):
+    """Generate up to num_questions for one shard, putting each question on `out`, then _SHARD_DONE."""
+    got = 0
+    with span("quiz.shard", skills=", ".join(skills), requested=num_questions) as sp:
+        source = _prompt_questions(skills, num_questions)
+        try:
+            for q in source:
+                if stop.is_set():
+                    sp.set(abandoned=True)
+                    break
+                if len(skills) == 1:
+                    q["skill"] = skills[0]
+                out.put(q)
+                got += 1
+                if got >= num_questions:
+                    break
+        except Exception as e:
+            sp.set(error=f"{e.__class__.__name__}: {e}")
+        finally:
+            source.close()
+            sp.set(questions=got)
+            out.put(_SHARD_DONE)
+
+
+def _generate_fanout(skills, num_questions):
+    """
+    Yield questions from concurrent per-skill prompts, merged in arrival order
+    and de-duplicated. Each shard asks for only its share of the questions, so
+    its max_tokens and wall time shrink accordingly. If shards fail or come
+    back short, or are still running halfway to QUIZ_FANOUT_DEADLINE, one
+    top-up prompt over all skills covers the gap; whatever has arrived by the
+    deadline is the quiz.
+    """
+    skills = list({str(s).strip().lower(): str(s).strip() for s in skills}.values())
+    out = queue.Queue()
+    stop = threading.Event()
+    pool = _get_shard_pool()
+    shards = _shard_sizes(skills, num_questions)
+    for skill, n in shards:
+        # copy_context() keeps the shard calls in the request's trace
+        pool.submit(contextvars.copy_context().run, _run_shard, [skill], n, out, stop)
+
+    started = time.monotonic()
+    deadline = started + QUIZ_FANOUT_DEADLINE
+    straggler_at = started + QUIZ_FANOUT_DEADLINE / 2
+    running = len(shards)
+    missing = dict(shards)  # skill -> questions its shard still owes
+    seen = set()
+    produced = 0
+    topped_up = False
+    with span("quiz.fanout", shards=len(shards), requested=num_questions) as sp:
+        try:
+            while running and produced < num_questions:
+                wake = deadline if topped_up else min(deadline, straggler_at)
+                try:
+                    item = out.get(timeout=max(0.0, wake - time.monotonic()))
+                except queue.Empty:
+                    if time.monotonic() >= deadline:
+                        sp.set(timed_out=running)
+                        break
+                    item = None  # halfway to the deadline and shards are still running
+                if item is _SHARD_DONE:
+                    running -= 1
+                    if running:
+                        continue
+                if item is None or item is _SHARD_DONE:
+                    if not topped_up and produced < num_questions:
+                        # a shard failed, came back short or is straggling: ask for the gap
+                        topped_up = True
+                        running += 1
+                        # skills that are owed questions first, the rest in case those keep failing
+                        gap = sorted(skills, key=lambda skill: missing.get(skill, 0) <= 0)
+                        pool.submit(contextvars.copy_context().run, _run_shard, gap,
+                                    num_questions - produced, out, stop)
+                    continue
+                key = _question_text_key(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                produced += 1
+                if item["skill"] in missing:
+                    missing[item["skill"]] -= 1
+                yield item
+        finally:
+            stop.set()
+            sp.set(questions=produced, topped_up=topped_up)
 
+
+def _generate_quiz_llm(skills, num_questions, cache=True):
+    """
+    Yield validated questions from the LLM as they arrive (streamed when
+    QUIZ_STREAM is on; one prompt per skill when QUIZ_FANOUT is on).
+    Every question stocks the bank. With `cache`, the quiz is cached once
+    complete, so a short one (failed shard, deadline) is not served for the
+    whole TTL; a top-up for part of a quiz passes cache=False.
+    """
+    global _llm_quizzes
+    if not _HAVE_MISTRAL:
+        log_event("quiz.llm_unavailable", skills=list(skills))
+        return
+
+    questions = []
+    with _llm_quizzes_lock:
+        _llm_quizzes += 1
     try:
-        raw = _mistral_generate(skills)
-        questions = _normalize_questions(raw)
-        return questions[:num_questions]
+        if QUIZ_FANOUT and len(skills) > 1 and num_questions > 1:
+            source = _generate_fanout(skills, num_questions)
+        else:
+            source = _prompt_questions(skills, num_questions)
+        for q in source:
+            if len(questions) >= num_questions:
+                break
+            questions.append(q)
+            yield q
     except Exception as e:
-        print("[studybuddy.quiz] Error generating quiz:", e)
-        traceback.print_exc()
+        log_event("quiz.llm_error", skills=list(skills), questions=len(questions),
+                  error=f"{e.__class__.__name__}: {e}", traceback=traceback.format_exc())
+    finally:
+        with _llm_quizzes_lock:
+            _llm_quizzes -= 1
+
+    if cache and len(questions) >= num_questions:
+        get_quiz_cache().set(quiz_cache_key(skills, num_questions), questions)
+    if questions:
+        bank = get_question_bank()
+        for q in questions:
+            if q["skill"]:
+                bank.add(q["skill"], [q])
+
+
+def generate_quiz_questions(skills, num_questions=5, student=None, on_question=None):
+    """
+    Build a quiz for `skills`. Questions are sampled from the question bank
+    first (never ones `student` has already seen); only a shortfall falls
+    back to the quiz cache / the Mistral API, and the LLM is asked for just
+    the missing questions, for the skills the bank covered least first.
+    on_question(q) is called for each question as soon as it is final, in
+    quiz order, so callers can show the first question before the rest exist.
+    """
+    if not skills:
         return []
+    if isinstance(skills, str):
+        skills = [s.strip() for s in skills.split(",") if s.strip()]
+
+    # keep the caller's spelling of each skill
+    by_key = {str(s).strip().lower(): str(s).strip() for s in skills}
+    questions = []
+    taken = set()
+
+    def take(q):
+        text = q["question"].lower()
+        if len(questions) >= num_questions or text in taken:
+            return
+        q = dict(q, skill=by_key.get(q.get("skill", "").lower(), q.get("skill", "")))
+        taken.add(text)
+        questions.append(q)
+        if on_question is not None:
+            on_question(q)
+
+    question_bank = get_question_bank()
+    with span("quiz.generate", skills=len(skills), requested=num_questions) as sp:
+        question_bank.note_demand(skills)
+        for q in question_bank.sample(skills, num_questions, student=student):
+            take(q)
+        sp.set(from_bank=len(questions), source="bank")
+
+        if len(questions) < num_questions:
+            cached = get_quiz_cache().get(quiz_cache_key(skills, num_questions))
+            if cached:
+                sp.set(source="cache")
+                fresh = question_bank.unseen_by(student, cached)
+                # a cached quiz may repeat questions; that still beats a short quiz
+                for q in fresh + [q for q in cached if q not in fresh]:
+                    take(q)
+            missing = num_questions - len(questions)
+            if missing > 0:
+                # no cached quiz, or a short one (cached before only complete quizzes were)
+                sp.set(source="llm", llm_requested=missing)
+                covered = {}
+                for q in questions:
+                    covered[q["skill"].lower()] = covered.get(q["skill"].lower(), 0) + 1
+                short_first = sorted(skills, key=lambda s: covered.get(str(s).strip().lower(), 0))
+                for q in _generate_quiz_llm(short_first, missing, cache=missing == num_questions):
+                    take(q)
+
+        question_bank.mark_seen(student, questions)
+        sp.set(questions=len(questions))
+    return questions
 
 
-def evaluate_quiz_answers(questions, user_answers):
-    """Evaluate user answers against correct answers."""
+def _get_explain_pool():
+    global _explain_pool
+    if _explain_pool is None:
+        with _explain_pool_lock:
+            if _explain_pool is None:
+                _explain_pool = ThreadPoolExecutor(
+                    max_workers=EXPLAIN_WORKERS, thread_name_prefix="studybuddy-explain"
+                )
+    return _explain_pool
+
+
+def _safe_explain(question, user_ans, correct):
+    try:
+        return _mistral_explain(question, user_ans, correct) or ""
+    except Exception:
+        return ""
+
+
+def _explain_concurrently(pending):
+    """One explanation call per wrong answer, fanned out over the thread pool."""
+    pool = _get_explain_pool()
+    # copy_context() keeps the explanation calls in the request's trace
+    return {
+        idx: pool.submit(contextvars.copy_context().run, _safe_explain, question, user_ans, correct)
+        for idx, question, user_ans, correct in pending
+    }
+
+
+def _explain_batched(pending):
+    """A single LLM call for all wrong answers, split back into per-question futures."""
+    futures = {idx: Future() for idx, _, _, _ in pending}
+    items = [{"question": q, "user": u, "correct": c} for _, q, u, c in pending]
+
+    def _fan_out(batch_future):
+        try:
+            texts = batch_future.result()
+        except Exception:
+            texts = []
+        for pos, (idx, _, _, _) in enumerate(pending):
+            text = texts[pos] if pos < len(texts) else None
+            futures[idx].set_result(text or "Explanation unavailable.")
+
+    _get_explain_pool().submit(
+        contextvars.copy_context().run, _mistral_explain_batch, items
+    ).add_done_callback(_fan_out)
+    return futures
+
+
+def _late_key(token):
+    return "explain:" + token
+
+
+def _register_late(futures):
+    """
+    Record explanations that missed the deadline in the shared state store and
+    write each one there as it finishes, so whichever worker process serves
+    /quiz/explanations can hand it out. Returns the token.
+    """
+    from .state_store import get_state_store
+
+    store = get_state_store()
+    token = uuid.uuid4().hex
+    key = _late_key(token)
+    record = {"pending": sorted(futures), "explanations": {}}
+    lock = threading.Lock()
+    store.set(key, record, ttl=LATE_EXPLANATION_TTL)
+
+    def finished(idx, f):
+        try:
+            text = f.result() or ""
+        except Exception:
+            text = ""
+        with lock:
+            record["pending"].remove(idx)
+            record["explanations"][str(idx)] = text
+            try:
+                store.set(key, record, ttl=LATE_EXPLANATION_TTL)
+            except Exception as e:
+                log_event("quiz.late_explanation_lost", token=token, index=idx,
+                          error=f"{e.__class__.__name__}: {e}")
+
+    for idx, f in futures.items():
+        f.add_done_callback(functools.partial(finished, idx))
+    return token
+
+
+def collect_late_explanations(token):
+    """
+    Return explanations that finished after evaluate_quiz_answers() returned.
+    -> {"explanations": {index: text}, "pending": [index, ...]}
+    Works from any worker process. Finished entries are returned on every call
+    until nothing is pending; then the token is dropped.
+    """
+    from .state_store import get_state_store
+
+    store = get_state_store()
+    record = store.get(_late_key(token)) if token else None
+    if record is None:
+        return {"explanations": {}, "pending": []}
+    if not record["pending"]:
+        store.delete(_late_key(token))
+    explanations = {int(idx): text for idx, text in record["explanations"].items()}
+    return {"explanations": explanations, "pending": sorted(record["pending"])}
+
+
+def evaluate_quiz_answers(questions, user_answers, explain_mode=None, deadline=None):
+    """
+    Evaluate user answers against correct answers.
+    Missing explanations for wrong answers are fetched according to explain_mode
+    ("serial", "concurrent" or "batch"). In the parallel modes the call waits at
+    most `deadline` seconds; unfinished explanations are marked
+    explanation_pending with an explanation_token for collect_late_explanations().
+    """
+    explain_mode = explain_mode or EXPLAIN_MODE
+    deadline = EXPLAIN_DEADLINE if deadline is None else deadline
+    with span("quiz.grade", questions=len(questions), explain_mode=explain_mode) as sp:
+        score, total, results = _grade(questions, user_answers, explain_mode, deadline)
+        sp.set(score=score, wrong=total - score,
+               explanations_late=sum(1 for r in results if r.get("explanation_pending")))
+    return score, total, results
+
+
+def _grade(questions, user_answers, explain_mode, deadline):
     score = 0
     total = len(questions)
     results = []
+    pending = []
 
     for i, q in enumerate(questions):
         correct = str(q.get("answer", "")).strip().upper()
@@ -74,10 +592,10 @@ def evaluate_quiz_answers(questions, user_answers):
         explanation = q.get("explanation") or ""
 
         if not is_correct and not explanation and _HAVE_MISTRAL and _mistral_explain:
-            try:
-                explanation = _mistral_explain(q.get("question", ""), user_ans, correct)
-            except Exception:
-                explanation = ""
+            if explain_mode == "serial":
+                explanation = _safe_explain(q.get("question", ""), user_ans, correct)
+            else:
+                pending.append((i, q.get("question", ""), user_ans, correct))
 
         results.append({
             "question": q.get("question"),
@@ -88,4 +606,27 @@ def evaluate_quiz_answers(questions, user_answers):
             "skill": q.get("skill", "")
         })
 
+    if pending:
+        if explain_mode == "batch" and _mistral_explain_batch:
+            futures = _explain_batched(pending)
+        else:
+            futures = _explain_concurrently(pending)
+
+        wait(list(futures.values()), timeout=deadline)
+        late = {}
+        for idx, f in futures.items():
+            if f.done():
+                try:
+                    results[idx]["explanation"] = f.result() or ""
+                except Exception:
+                    results[idx]["explanation"] = ""
+            else:
+                late[idx] = f
+
+        if late:
+            token = _register_late(late)
+            for idx in late:
+                results[idx]["explanation_pending"] = True
+                results[idx]["explanation_token"] = token
+
     return score, total, results
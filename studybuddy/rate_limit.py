@@ -0,0 +1,183 @@
+# studybuddy/rate_limit.py
+"""
+Client-side rate limiter for the Mistral API, shared by every worker process.
+Two token buckets, requests per minute and tokens per minute, live in one
+SQLite file; each acquire is a single BEGIN IMMEDIATE transaction, so all
+gunicorn workers on a host draw from the same quota instead of finding out
+about it through 429s.
+Calls are prioritized: high-priority callers (quiz generation) may drain a
+bucket, low-priority ones (explanations) must leave `reserve` of it untouched
+and give up sooner, so under load explanations are shed first.
+Exposes:
+ - TokenBucketLimiter(path, rpm, tpm, reserve=0.2)
+ - RateLimitExceeded
+ - estimate_tokens(prompt, max_tokens)
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+MISTRAL_RATE_DB = os.getenv("MISTRAL_RATE_DB", os.path.join("data", "rate_limit.sqlite3"))
+MISTRAL_RPM = float(os.getenv("MISTRAL_RPM", "0"))  # 0 = no limit
+MISTRAL_TPM = float(os.getenv("MISTRAL_TPM", "0"))
+MISTRAL_RATE_RESERVE = float(os.getenv("MISTRAL_RATE_RESERVE", "0.2"))
+MISTRAL_RATE_MAX_WAIT = float(os.getenv("MISTRAL_RATE_MAX_WAIT", "30"))
+MISTRAL_RATE_MAX_WAIT_LOW = float(os.getenv("MISTRAL_RATE_MAX_WAIT_LOW", "5"))
+
+HIGH = "high"
+LOW = "low"
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call would have to wait longer than its priority allows (load shed)."""
+
+
+def estimate_tokens(prompt, max_tokens):
+    """Worst-case tokens for one call: ~4 characters per prompt token plus the full completion budget."""
+    return len(prompt or "") // 4 + int(max_tokens or 0)
+
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets in SQLite.
+    A bucket holds up to one minute of quota and refills continuously.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, path=MISTRAL_RATE_DB, rpm=MISTRAL_RPM, tpm=MISTRAL_TPM, reserve=MISTRAL_RATE_RESERVE,
+                 max_wait=None):
+        self.path = path or ":memory:"
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.limits = {"requests": float(rpm or 0), "tokens": float(tpm or 0)}
+        self.reserve = reserve
+        self.max_wait = max_wait or {HIGH: MISTRAL_RATE_MAX_WAIT, LOW: MISTRAL_RATE_MAX_WAIT_LOW}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " name TEXT PRIMARY KEY,"
+            " level REAL NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self.granted = 0
+        self.shed = 0
+        self.waited = 0
+
+    @property
+    def enabled(self):
+        return any(self.limits.values())
+
+    def _levels(self, now):
+        """Current level of every enabled bucket, refilled up to `now` (inside a transaction)."""
+        rows = dict((name, (level, updated)) for name, level, updated in
+                    self._conn.execute("SELECT name, level, updated FROM rate_buckets"))
+        levels = {}
+        for name, capacity in self.limits.items():
+            if not capacity:
+                continue
+            level, updated = rows.get(name, (capacity, now))
+            levels[name] = min(capacity, level + max(0.0, now - updated) * capacity / 60.0)
+        return levels
+
+    def _store(self, levels, now):
+        self._conn.executemany(
+            "INSERT INTO rate_buckets (name, level, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+            [(name, level, now) for name, level in levels.items()],
+        )
+
+    def try_acquire(self, tokens, priority=HIGH):
+        """
+        Take 1 request and `tokens` tokens if available; returns 0.0 when granted,
+        otherwise the seconds until the buckets should have refilled enough.
+        """
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        floor = self.reserve if priority == LOW else 0.0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                levels = self._levels(now)
+                wait = 0.0
+                for name, level in levels.items():
+                    capacity = self.limits[name]
+                    # a single call larger than the bucket would otherwise never fit
+                    cost = min(costs[name], capacity * (1.0 - floor))
+                    missing = cost + floor * capacity - level
+                    if missing > 0:
+                        wait = max(wait, missing * 60.0 / capacity)
+                    levels[name] = level - cost
+                if wait == 0.0:
+                    self._store(levels, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, tokens, priority=HIGH, max_wait=None):
+        """
+        Block until the call fits in both buckets; returns the seconds waited.
+        Raises RateLimitExceeded if that would take longer than `max_wait`
+        (default: per priority).
+        """
+        if not self.enabled:
+            return 0.0
+        max_wait = self.max_wait.get(priority, MISTRAL_RATE_MAX_WAIT) if max_wait is None else max_wait
+        started = time.monotonic()
+        queued = False
+        while True:
+            wait = self.try_acquire(tokens, priority)
+            waited = time.monotonic() - started
+            if wait == 0.0:
+                with self._lock:
+                    self.granted += 1
+                    self.waited += queued
+                return waited
+            if waited + wait > max_wait:
+                with self._lock:
+                    self.shed += 1
+                raise RateLimitExceeded(
+                    f"Mistral rate limit: {priority}-priority call would wait {waited + wait:.1f}s (max {max_wait}s)")
+            # other workers draw from the same buckets: re-check rather than sleep the whole estimate
+            queued = True
+            time.sleep(min(wait, 1.0) * random.uniform(0.8, 1.0))
+
+    def refund(self, tokens):
+        """Return unused tokens, e.g. the estimate minus the usage Mistral reported."""
+        if tokens <= 0 or not self.limits["tokens"]:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                levels = self._levels(now)
+                levels["tokens"] = min(self.limits["tokens"], levels["tokens"] + tokens)
+                self._store(levels, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                levels = self._levels(time.time())
+            finally:
+                self._conn.execute("COMMIT")
+            return {
+                "rpm": self.limits["requests"],
+                "tpm": self.limits["tokens"],
+                "available": {name: round(level, 1) for name, level in levels.items()},
+                "granted": self.granted,
+                "waited": self.waited,
+                "shed": self.shed,
+            }
@@ -0,0 +1,129 @@
+# studybuddy/resume_store.py
+"""
+Content-addressed resume storage for StudyBuddy.
+Uploads are keyed by the SHA-256 of their bytes, so re-uploading the same
+resume neither re-parses it nor writes another copy to disk. Archiving the
+raw file is optional and subject to a retention policy.
+Exposes:
+ - ResumeStore(upload_dir, cache_path)
+ - resume_digest(data)
+"""
+
+import hashlib
+import os
+import re
+import time
+
+from .cache import PersistentCache
+
+RESUME_CACHE_PATH = os.getenv("RESUME_CACHE_PATH", os.path.join("data", "resume_cache.sqlite3"))
+RESUME_CACHE_TTL = int(os.getenv("RESUME_CACHE_TTL", str(30 * 24 * 3600)))
+RESUME_CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "10000"))
+UPLOAD_RETENTION_DAYS = float(os.getenv("UPLOAD_RETENTION_DAYS", "30"))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "1000"))
+
+# only files written by the store are subject to retention
+_STORED_NAME = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]+)?$")
+
+
+def resume_digest(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResumeStore:
+    """
+    Deduplicated upload directory plus a cache of extraction results
+    (text, skills, email) keyed by content digest.
+    """
+
+    def __init__(self, upload_dir, cache_path=RESUME_CACHE_PATH,
+                 ttl=RESUME_CACHE_TTL, max_entries=RESUME_CACHE_MAX_ENTRIES,
+                 retention_days=UPLOAD_RETENTION_DAYS, max_files=UPLOAD_MAX_FILES):
+        self.upload_dir = upload_dir
+        self.retention_days = retention_days
+        self.max_files = max_files
+        os.makedirs(upload_dir, exist_ok=True)
+        self.cache = PersistentCache(
+            cache_path or None,
+            table="resume_cache",
+            ttl=ttl,
+            max_entries=max_entries,
+        )
+        self.duplicate_uploads = 0
+        self.archived = 0
+        self.expired = 0
+
+    def path_for(self, digest, filename=""):
+        ext = os.path.splitext(filename)[1].lower()
+        return os.path.join(self.upload_dir, digest + ext)
+
+    def store_upload(self, data, filename, digest=None) -> str:
+        """Write the upload once under its digest; returns the stored path."""
+        digest = digest or resume_digest(data)
+        path = self.path_for(digest, filename)
+        if os.path.exists(path):
+            self.duplicate_uploads += 1
+            # keep recently re-uploaded resumes clear of retention
+            os.utime(path)
+            return path
+        tmp = path + ".part"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        return path
+
+    def archive(self, data, filename, digest=None) -> str:
+        """store_upload() followed by the retention sweep; meant for a background job."""
+        path = self.store_upload(data, filename, digest=digest)
+        self.archived += 1
+        self.apply_retention()
+        return path
+
+    def apply_retention(self, now=None) -> int:
+        """
+        Delete stored uploads older than retention_days, then the oldest ones
+        beyond max_files. Returns the number of files removed.
+        """
+        now = now or time.time()
+        entries = []
+        for name in os.listdir(self.upload_dir):
+            if not _STORED_NAME.match(name):
+                continue
+            path = os.path.join(self.upload_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+
+        entries.sort()
+        doomed = []
+        if self.retention_days:
+            cutoff = now - self.retention_days * 86400
+            doomed = [path for mtime, path in entries if mtime < cutoff]
+            entries = [(mtime, path) for mtime, path in entries if mtime >= cutoff]
+        if self.max_files and len(entries) > self.max_files:
+            doomed.extend(path for _, path in entries[:len(entries) - self.max_files])
+
+        removed = 0
+        for path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        self.expired += removed
+        return removed
+
+    def lookup(self, digest):
+        """Cached {"text", "skills", "email"} for a digest, or None."""
+        return self.cache.get(digest)
+
+    def remember(self, digest, text, skills, email):
+        self.cache.set(digest, {"text": text, "skills": list(skills or []), "email": email})
+
+    def stats(self):
+        data = self.cache.stats()
+        data["duplicate_uploads"] = self.duplicate_uploads
+        data["archived"] = self.archived
+        data["expired_uploads"] = self.expired
+        return data
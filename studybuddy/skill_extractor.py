@@ -1,45 +1,107 @@
 # studybuddy/skill_extractor.py
+import io
 import re
 
+from .telemetry import span, log_event, counter, histogram
+
+RESUME_PAGE_SECONDS = histogram("studybuddy_resume_page_seconds", "Text extraction time per resume page.")
+RESUME_EXTRACT_STOPPED = counter("studybuddy_resume_extract_stopped_total",
+                                 "Resume parses stopped before the last page.", labels=("reason",))
+
+_old_extract_resume = None
 _old_extract_text = None
 _old_extract_skills = None
 _old_extract_name = None
 
 try:
     from resume_skill_quiz.extractor import (
+        extract_resume as _old_extract_resume,
         extract_text_from_resume as _old_extract_text,
         extract_skills as _old_extract_skills,
         extract_name as _old_extract_name
     )
 except Exception as e:
-    print("[studybuddy.skill_extractor] Warning: could not import old extractor:", e)
+    log_event("skill_extractor.legacy_unavailable", error=str(e))
 
 EMAIL_PATTERN = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+', flags=re.IGNORECASE)
 
 
-def extract_text_from_resume(path: str) -> str:
-    """Extract text from resume (PDF or DOCX)."""
-    if _old_extract_text:
+def _resume_kind(source, filename=None):
+    if isinstance(source, str):
+        name = source.lower()
+    else:
+        name = (filename or getattr(source, "name", "") or "").lower()
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith(".docx"):
+        return "docx"
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        head = bytes(source[:5])
+        if head.startswith(b"%PDF"):
+            return "pdf"
+        if head.startswith(b"PK\x03\x04"):
+            return "docx"
+    return None
+
+
+def extract_text_from_resume(source, filename: str = None) -> str:
+    """
+    Extract text from resume (PDF or DOCX).
+    `source` may be a path, bytes/memoryview or a binary file-like object.
+    """
+    size = len(source) if isinstance(source, (bytes, bytearray, memoryview)) else None
+    with span("resume.extract_text", kind=_resume_kind(source, filename), bytes=size) as sp:
+        text = _extract_text(source, filename, sp)
+        sp.set(chars=len(text))
+    return text
+
+
+def _extract_text(source, filename=None, sp=None):
+    if _old_extract_resume and source is not None:
+        # bounded, sandboxed parse; see resume_skill_quiz/sandbox.py
+        report = _old_extract_resume(source, filename=filename)
+        if sp is not None:
+            sp.set(pages=report["pages"], pages_read=report["pages_read"], stopped=report["stopped"],
+                   page_ms=report["page_ms"])
+            if report["error"]:
+                sp.set(extract_error=report["error"])
+        for ms in report["page_ms"]:
+            RESUME_PAGE_SECONDS.observe(ms / 1000)
+        if report["stopped"]:
+            RESUME_EXTRACT_STOPPED.inc(reason=report["stopped"])
+        if not report["error"]:
+            return report["text"]
+        print("[skill_extractor] old extractor failed:", report["error"])
+        # a PDF that failed (or hit a sandbox limit) is not retried unbounded in-process;
+        # DOCX still falls back to python-docx when docx2txt is missing
+        if _resume_kind(source, filename) != "docx":
+            return ""
+        if hasattr(source, "seek"):
+            source.seek(0)
+    elif _old_extract_text:
         try:
-            return _old_extract_text(path) or ""
+            return _old_extract_text(source, filename=filename) or ""
         except Exception as e:
             print("[skill_extractor] old extractor failed:", e)
 
+    kind = _resume_kind(source, filename)
+    readable = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
     # fallback PDF extraction
-    if path.lower().endswith(".pdf"):
+    if kind == "pdf":
         try:
             from PyPDF2 import PdfReader
-            reader = PdfReader(path)
+            reader = PdfReader(readable)
             pages = [(p.extract_text() or "") for p in reader.pages]
             return " ".join(pages)
         except Exception as e:
             print("[skill_extractor] fallback PDF extraction failed:", e)
 
     # fallback DOCX extraction
-    if path.lower().endswith(".docx"):
+    if kind == "docx":
         try:
             import docx
-            doc = docx.Document(path)
+            doc = docx.Document(readable)
             return " ".join([p.text for p in doc.paragraphs])
         except Exception as e:
             print("[skill_extractor] DOCX extraction failed:", e)
@@ -49,6 +111,13 @@ def extract_text_from_resume(path: str) -> str:
 
 def extract_skills_from_text(text: str):
     """Extract skills from resume text using keyword matching."""
+    with span("resume.extract_skills", chars=len(text or "")) as sp:
+        skills = _extract_skills(text)
+        sp.set(skills=len(skills))
+    return skills
+
+
+def _extract_skills(text):
     if _old_extract_skills:
         try:
             return _old_extract_skills(text) or []
@@ -71,5 +140,3 @@ def extract_email_from_text(text: str):
     m = EMAIL_PATTERN.search(text)
     return m.group(0).lower().strip() if m else None
 
-
-print("[INFO] studybuddy.skill_extractor loaded successfully")
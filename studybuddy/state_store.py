@@ -0,0 +1,359 @@
+# studybuddy/state_store.py
+"""
+Server-side state store for StudyBuddy sessions.
+The session cookie carries only an opaque id; quiz questions and results
+live in one of the pluggable backends below. The default, sqlite, is shared
+by every worker process on the host; memory is per process and only fits a
+single-worker deployment. Entries expire SESSION_TTL seconds after their last
+use (each read refreshes the TTL).
+Exposes:
+ - MemoryStateStore()
+ - SQLiteStateStore(path)
+ - RedisStateStore(client)
+ - LocalRedis()                      # in-process stand-in for a Redis client
+ - make_state_store(backend=None)
+ - get_state_store()                 # process-wide store, opened on first use
+ - ServerSideSessionInterface(store)
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("data", "sessions.sqlite3"))
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(2 * 3600)))
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+class MemoryStateStore:
+    """Process-local dict backend; values are kept serialized so size is measurable."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            raw, expires = entry
+            if expires < now:
+                del self._data[key]
+                return None
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=SESSION_TTL):
+        raw = _dumps(value)
+        with self._lock:
+            self._data[key] = (raw, time.time() + ttl)
+
+    def touch(self, key, ttl=SESSION_TTL):
+        """Push back the expiry of a live entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] >= now:
+                self._data[key] = (entry[0], now + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            stale = [k for k, (_, expires) in self._data.items() if expires < now]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def footprint(self):
+        with self._lock:
+            entries = len(self._data)
+            memory = sum(len(k) + len(raw) for k, (raw, _) in self._data.items())
+        return {"backend": self.name, "entries": entries, "memory_bytes": memory, "disk_bytes": 0}
+
+
+class SQLiteStateStore:
+    """SQLite file backend, shared by every worker process on the host."""
+
+    name = "sqlite"
+
+    def __init__(self, path=SESSION_DB_PATH, purge_every=200):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS state_expires ON state(expires)")
+        self._lock = threading.Lock()
+        self._purge_every = purge_every
+        self._writes = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE key = ? AND expires >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=SESSION_TTL):
+        raw = _dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)",
+                (key, raw, time.time() + ttl),
+            )
+            self._writes += 1
+            purge = self._writes % self._purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def touch(self, key, ttl=SESSION_TTL):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE state SET expires = ? WHERE key = ? AND expires >= ?", (now + ttl, key, now)
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM state WHERE expires < ?", (time.time(),))
+        return max(cur.rowcount, 0)
+
+    def footprint(self):
+        with self._lock:
+            entries, payload = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(key) + LENGTH(value)), 0) FROM state"
+            ).fetchone()
+        disk = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                disk += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return {"backend": self.name, "entries": entries, "memory_bytes": 0,
+                "payload_bytes": payload, "disk_bytes": disk}
+
+
+class LocalRedis:
+    """
+    Minimal in-process stand-in for the redis-py client API used by
+    RedisStateStore (get / set with ex / expire / delete / scan_iter / strlen).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time())
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def expire(self, key, seconds):
+        with self._lock:
+            value = self._live(key, time.time())
+            if value is None:
+                return False
+            self._data[key] = (value, time.time() + seconds)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+    def strlen(self, key):
+        value = self.get(key)
+        return len(value) if value is not None else 0
+
+    def scan_iter(self, match=None):
+        prefix = match[:-1] if match and match.endswith("*") else match
+        now = time.time()
+        with self._lock:
+            keys = [k for k in list(self._data) if self._live(k, now) is not None]
+        return iter([k for k in keys if prefix is None or k.startswith(prefix)])
+
+
+class RedisStateStore:
+    """Backend for any redis-py compatible client (real Redis or LocalRedis)."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix="studybuddy:state:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=SESSION_TTL):
+        self.client.set(self.prefix + key, _dumps(value), ex=int(ttl))
+
+    def touch(self, key, ttl=SESSION_TTL):
+        self.client.expire(self.prefix + key, int(ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def purge_expired(self):
+        # Redis expires keys itself
+        return 0
+
+    def footprint(self):
+        entries = 0
+        payload = 0
+        for k in self.client.scan_iter(match=self.prefix + "*"):
+            entries += 1
+            payload += self.client.strlen(k)
+        return {"backend": self.name, "entries": entries, "memory_bytes": payload, "disk_bytes": 0}
+
+
+def make_state_store(backend=None):
+    """Build the store named by `backend` or SESSION_BACKEND (memory | sqlite | redis)."""
+    backend = (backend or SESSION_BACKEND).lower()
+    if backend == "sqlite":
+        return SQLiteStateStore(SESSION_DB_PATH)
+    if backend == "redis":
+        client = None
+        if REDIS_URL:
+            try:
+                import redis
+                client = redis.Redis.from_url(REDIS_URL)
+            except Exception as e:
+                print("[studybuddy.state_store] Redis unavailable, using LocalRedis:", e)
+        return RedisStateStore(client or LocalRedis())
+    return MemoryStateStore()
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """
+    Process-wide store named by SESSION_BACKEND, opened on first use. Sessions,
+    quiz jobs and late explanations share it, so with the sqlite or redis
+    backend any worker can serve a request that another worker started.
+    """
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                _state_store = make_state_store()
+    return _state_store
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface whose cookie holds only an opaque session id.
+    Without an explicit `store` it uses get_state_store() from the first request.
+    """
+
+    def __init__(self, store=None, ttl=SESSION_TTL):
+        self._store = store
+        self.ttl = ttl
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_state_store()
+
+    def _new_sid(self):
+        return secrets.token_urlsafe(32)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.set(session.sid, dict(session), ttl=self.ttl)
+        elif session.new:
+            return
+        else:
+            # sliding expiry: a student working through a quiz is not logged out mid-way
+            self.store.touch(session.sid, ttl=self.ttl)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            max_age=None if session.permanent else self.ttl,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
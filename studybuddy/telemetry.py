@@ -0,0 +1,263 @@
+# studybuddy/telemetry.py
+"""
+Lightweight tracing and metrics for StudyBuddy (no external dependencies).
+A trace groups the spans of one request (and of the background jobs it
+starts); every finished span feeds a latency histogram and, unless
+TELEMETRY_LOG_SPANS=0, one structured JSON log line. Metrics are exposed in the Prometheus text
+format by render_prometheus() (served on /metrics).
+Exposes:
+ - span(name, **attrs)                # context manager; sp.set(key=value)
+ - trace(trace_id=None, **attrs)      # context manager; current_trace() inside
+ - current_trace_id(), current_span()
+ - log_event(event, **fields)
+ - counter(name, help, labels=()) / histogram(name, help, labels=(), buckets=...)
+ - render_prometheus()
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# one JSON log line per finished span (events from log_event() are always logged)
+TELEMETRY_LOG_SPANS = os.getenv("TELEMETRY_LOG_SPANS", "1").lower() not in ("0", "false", "no", "off")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("studybuddy.telemetry")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_trace = contextvars.ContextVar("studybuddy_trace", default=None)
+_span = contextvars.ContextVar("studybuddy_span", default=None)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', repr(float(bound))))} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(series[-1], 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, labels, **kwargs)
+        return metric
+
+
+def counter(name, help="", labels=()) -> Counter:
+    """Get or create the process-wide counter `name`."""
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help="", labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Get or create the process-wide histogram `name`."""
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _metrics_lock:
+        metrics = [_metrics[name] for name in sorted(_metrics)]
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+SPAN_SECONDS = histogram("studybuddy_span_seconds", "Duration of instrumented operations.", labels=("span", "status"))
+
+
+class _Trace:
+    def __init__(self, trace_id, attrs):
+        self.id = trace_id
+        self.attrs = attrs
+        self.spans = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def summary(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {"trace_id": self.id, "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "spans": spans, **self.attrs}
+
+
+class Span:
+    """A timed operation; attributes added with set() end up in its log line."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def log_event(event, **fields):
+    """One structured (JSON) log line, tagged with the current trace id."""
+    record = {"ts": round(time.time(), 3), "event": event}
+    trace_id = current_trace_id()
+    if trace_id:
+        record["trace_id"] = trace_id
+    record.update(fields)
+    logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+
+def current_trace():
+    return _trace.get()
+
+
+def current_trace_id():
+    t = _trace.get()
+    return t.id if t is not None else None
+
+
+def current_span():
+    """The innermost open span, so nested code can add attributes to it."""
+    return _span.get()
+
+
+@contextmanager
+def trace(trace_id=None, **attrs):
+    """
+    Make spans inside the block belong to trace `trace_id` (a new id if None).
+    Pass an existing id to continue a request's trace in a background job.
+    """
+    t = _Trace(trace_id or uuid.uuid4().hex[:16], attrs)
+    token = _trace.set(t)
+    try:
+        yield t
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time the block as `name`; exceptions mark the span status "error" and re-raise.
+    GeneratorExit (a stream closed early by its consumer), KeyboardInterrupt and
+    SystemExit are not errors, so they leave the status "ok".
+    """
+    sp = Span(name, attrs)
+    token = _span.set(sp)
+    try:
+        yield sp
+    except Exception as e:
+        sp.status = "error"
+        sp.attrs.setdefault("error", f"{e.__class__.__name__}: {e}")
+        raise
+    finally:
+        _span.reset(token)
+        sp.duration = time.perf_counter() - sp.started
+        SPAN_SECONDS.observe(sp.duration, span=name, status=sp.status)
+        record = {"span": name, "ms": round(sp.duration * 1000, 2), "status": sp.status}
+        record.update(sp.attrs)
+        t = _trace.get()
+        if t is not None:
+            t.add(record)
+        if TELEMETRY_LOG_SPANS:
+            log_event("span", **record)
@@ -0,0 +1,8 @@
+# tests/conftest.py
+"""Shared setup: import the packages from the repo root and keep span logs out of test output."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEMETRY_LOG_SPANS", "0")
@@ -0,0 +1,54 @@
+# tests/test_batch_ingest.py
+import json
+
+from resume_skill_quiz.batch_ingest import find_resumes, load_checkpoint, run_batch
+
+
+def _resumes(tmp_path, n):
+    folder = tmp_path / "resumes"
+    folder.mkdir()
+    for i in range(n):
+        # not real PDFs: each one is recorded as a parse error, which is enough to exercise the checkpoint
+        (folder / f"r{i}.pdf").write_bytes(b"not a pdf")
+    (folder / "notes.txt").write_text("ignored")
+    return find_resumes([str(folder)])
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def test_find_resumes_keeps_supported_files(tmp_path):
+    files = _resumes(tmp_path, 3)
+    assert [f.rsplit("/", 1)[-1] for f in files] == ["r0.pdf", "r1.pdf", "r2.pdf"]
+
+
+def test_resume_skips_checkpointed_files(tmp_path):
+    files = _resumes(tmp_path, 4)
+    output = str(tmp_path / "out.jsonl")
+    checkpoint = str(tmp_path / "out.jsonl.checkpoint")
+
+    # a crashed earlier run got through the first file
+    run_batch(files[:1], output, workers=1, checkpoint=checkpoint, progress=False)
+    assert load_checkpoint(checkpoint) == {files[0]}
+
+    summary = run_batch(files, output, workers=1, checkpoint=checkpoint, progress=False)
+    assert summary["total"] == 4
+    assert summary["skipped"] == 1
+    assert summary["ok"] + summary["failed"] == 3
+    assert load_checkpoint(checkpoint) == set(files)
+    assert sorted(r["path"] for r in _records(output)) == sorted(files)
+
+    again = run_batch(files, output, workers=1, checkpoint=checkpoint, progress=False)
+    assert again["skipped"] == 4
+    assert len(_records(output)) == 4
+
+
+def test_without_checkpoint_everything_is_processed(tmp_path):
+    files = _resumes(tmp_path, 2)
+    output = str(tmp_path / "out.jsonl")
+    run_batch(files, output, workers=1, checkpoint=None, progress=False)
+    summary = run_batch(files, output, workers=1, checkpoint=None, progress=False)
+    assert summary["skipped"] == 0
+    assert len(_records(output)) == 4
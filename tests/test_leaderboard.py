@@ -0,0 +1,58 @@
+# tests/test_leaderboard.py
+import random
+
+import pytest
+
+from studybuddy.leaderboard import SkipList
+
+
+def _filled(keys):
+    sl = SkipList()
+    for k in keys:
+        sl.insert(k, f"v{k}")
+    return sl
+
+
+def test_rank_and_slice_match_sorted_order():
+    rng = random.Random(7)
+    keys = rng.sample(range(10000), 500)
+    sl = _filled(keys)
+    ordered = sorted(keys)
+
+    assert len(sl) == 500
+    for i in (0, 1, 250, 499):
+        assert sl.rank(ordered[i]) == i
+    assert sl.rank(-1) is None
+    assert sl.slice(0, 3) == [(k, f"v{k}") for k in ordered[:3]]
+    assert sl.slice(495, 10) == [(k, f"v{k}") for k in ordered[495:]]
+
+
+def test_slice_bounds():
+    sl = _filled([3, 1, 2])
+    assert sl.slice(3, 5) == []
+    assert sl.slice(-1, 5) == []
+    assert sl.slice(0, 0) == []
+    assert SkipList().slice() == []
+
+
+def test_remove_keeps_ranks_consistent():
+    rng = random.Random(11)
+    keys = rng.sample(range(5000), 300)
+    sl = _filled(keys)
+    removed = set(rng.sample(keys, 100))
+    for k in removed:
+        assert sl.remove(k) == f"v{k}"
+    ordered = sorted(set(keys) - removed)
+
+    assert len(sl) == 200
+    assert [sl.rank(k) for k in ordered] == list(range(200))
+    assert [k for k, _ in sl.slice(0, 200)] == ordered
+    assert all(sl.rank(k) is None for k in removed)
+
+
+def test_duplicate_and_missing_keys():
+    sl = _filled([1])
+    with pytest.raises(KeyError):
+        sl.insert(1)
+    with pytest.raises(KeyError):
+        sl.remove(2)
@@ -0,0 +1,40 @@
+# tests/test_parse_json.py
+from studybuddy.mistral_api import _try_parse_json
+
+
+def test_plain_json():
+    assert _try_parse_json('{"a": 1}') == {"a": 1}
+    assert _try_parse_json("[1, 2, 3]") == [1, 2, 3]
+
+
+def test_empty_or_no_json():
+    assert _try_parse_json("") is None
+    assert _try_parse_json(None) is None
+    assert _try_parse_json("no json here") is None
+
+
+def test_code_fence_and_trailing_commas():
+    assert _try_parse_json('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+
+
+def test_prose_around_json():
+    text = 'Sure! Here it is: {"questions": [{"q": "x"}]} Hope it helps.'
+    assert _try_parse_json(text, want="questions") == {"questions": [{"q": "x"}]}
+
+
+def test_brackets_inside_strings():
+    assert _try_parse_json('note {"s": "brace } inside", "t": "[x"} end') == {"s": "brace } inside", "t": "[x"}
+
+
+def test_want_prefers_longest_value_over_format_example():
+    text = 'Format: {"questions": []}\nAnswer: {"questions": [{"q": "1"}, {"q": "2"}]}'
+    assert _try_parse_json(text, want="questions") == {"questions": [{"q": "1"}, {"q": "2"}]}
+
+
+def test_want_falls_back_to_first_candidate():
+    assert _try_parse_json('x {"other": 1} y', want="questions") == {"other": 1}
+
+
+def test_truncated_reply_keeps_complete_items():
+    text = '{"questions": [{"q": "a {b}"}, {"q": "tr'
+    assert _try_parse_json(text, want="questions") == {"questions": [{"q": "a {b}"}]}
@@ -0,0 +1,48 @@
+# tests/test_rate_limit.py
+import pytest
+
+from studybuddy.rate_limit import HIGH, LOW, RateLimitExceeded, TokenBucketLimiter
+
+
+def test_disabled_limiter_never_waits():
+    limiter = TokenBucketLimiter(path=None, rpm=0, tpm=0)
+    assert not limiter.enabled
+    assert limiter.acquire(10 ** 6, priority=LOW) == 0.0
+
+
+def test_low_priority_leaves_the_reserve():
+    limiter = TokenBucketLimiter(path=None, rpm=10, tpm=0, reserve=0.2)
+    for _ in range(8):
+        assert limiter.try_acquire(0, LOW) == 0.0
+    assert limiter.try_acquire(0, LOW) > 0.0  # the last 20% is kept for high priority
+    assert limiter.try_acquire(0, HIGH) == 0.0
+    assert limiter.try_acquire(0, HIGH) == 0.0
+    assert limiter.try_acquire(0, HIGH) > 0.0
+
+
+def test_token_bucket_limits_large_calls():
+    limiter = TokenBucketLimiter(path=None, rpm=0, tpm=1000, reserve=0.0)
+    assert limiter.try_acquire(600) == 0.0
+    wait = limiter.try_acquire(600)
+    assert 0.0 < wait <= 60.0 * 200 / 1000 + 0.1
+    limiter.refund(500)
+    assert limiter.try_acquire(600) == 0.0
+
+
+def test_acquire_sheds_instead_of_waiting_too_long():
+    limiter = TokenBucketLimiter(path=None, rpm=1, tpm=0, reserve=0.0)
+    assert limiter.acquire(0) < 0.5  # granted without queueing
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(0, priority=LOW, max_wait=0.5)
+    stats = limiter.stats()
+    assert stats["granted"] == 1
+    assert stats["shed"] == 1
+
+
+def test_buckets_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+    a = TokenBucketLimiter(path=path, rpm=2, tpm=0, reserve=0.0)
+    b = TokenBucketLimiter(path=path, rpm=2, tpm=0, reserve=0.0)
+    assert a.try_acquire(0) == 0.0
+    assert b.try_acquire(0) == 0.0
+    assert a.try_acquire(0) > 0.0
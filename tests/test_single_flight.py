@@ -0,0 +1,126 @@
+# tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from studybuddy.mistral_api import CoalescedCallCancelled, SingleFlight
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _in_thread(fn):
+    """Run fn in a thread; returns (thread, outcome) where outcome gets "result" or "error"."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t, outcome
+
+
+def _leader_and_follower(sf, key, leader_fn):
+    leader, led = _in_thread(lambda: sf.do(key, leader_fn))
+    _wait_for(lambda: sf.in_flight() == 1)
+    follower, followed = _in_thread(lambda: sf.do(key, lambda: "follower ran"))
+    _wait_for(lambda: sf.coalesced == 1)
+    return (leader, led), (follower, followed)
+
+
+def test_followers_share_the_result():
+    sf = SingleFlight(timeout=5)
+    release = threading.Event()
+    (leader, led), (follower, followed) = _leader_and_follower(sf, "k", lambda: release.wait(5) and "shared")
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert led == {"result": "shared"}
+    assert followed == {"result": "shared"}
+    assert sf.stats()["upstream_calls"] == 1
+    assert sf.in_flight() == 0
+
+
+def test_followers_receive_the_leaders_error():
+    sf = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    (leader, led), (follower, followed) = _leader_and_follower(sf, "k", fail)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(led["error"], ValueError)
+    assert followed["error"] is led["error"]
+    # the key is forgotten, so the next call goes upstream again
+    assert sf.do("k", lambda: "fresh") == "fresh"
+
+
+def test_cancel_releases_waiting_followers():
+    sf = SingleFlight(timeout=5)
+    release = threading.Event()
+    (leader, led), (follower, followed) = _leader_and_follower(sf, "k", lambda: release.wait(5) and "late")
+    assert sf.cancel("k") is True
+    follower.join(5)
+    assert isinstance(followed["error"], CoalescedCallCancelled)
+    assert sf.in_flight() == 0
+    assert sf.cancel("k") is False
+    release.set()
+    leader.join(5)
+    assert led == {"result": "late"}
+
+
+def test_follower_times_out():
+    sf = SingleFlight(timeout=0.05)
+    release = threading.Event()
+    (leader, _), (follower, followed) = _leader_and_follower(sf, "k", lambda: release.wait(5))
+    follower.join(5)
+    assert isinstance(followed["error"], TimeoutError)
+    assert sf.stats()["timeouts"] == 1
+    release.set()
+    leader.join(5)
+
+
+def test_stream_is_closed_when_the_last_subscriber_leaves():
+    sf = SingleFlight(timeout=5)
+    closed = threading.Event()
+
+    def pieces():
+        try:
+            for i in range(1000):
+                yield str(i)
+                time.sleep(0.001)
+        finally:
+            closed.set()
+
+    stream = sf.stream("k", pieces)
+    assert next(stream) == "0"
+    stream.close()
+    assert closed.wait(5)
+    assert sf.in_flight() == 0
+
+
+def test_stream_error_reaches_subscriber():
+    sf = SingleFlight(timeout=5)
+
+    def pieces():
+        yield "a"
+        raise ValueError("stream broke")
+
+    got = []
+    with pytest.raises(ValueError):
+        for piece in sf.stream("k", pieces):
+            got.append(piece)
+    assert got == ["a"]
@@ -0,0 +1,74 @@
+# tests/test_state_store.py
+import pytest
+
+from studybuddy import state_store
+from studybuddy.state_store import LocalRedis, MemoryStateStore, RedisStateStore, SQLiteStateStore
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(state_store, "time", c)
+    return c
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateStore()
+    if request.param == "sqlite":
+        return SQLiteStateStore(str(tmp_path / "state.sqlite3"))
+    return RedisStateStore(LocalRedis())
+
+
+def test_round_trip_and_delete(store, clock):
+    store.set("a", {"x": [1, 2]}, ttl=60)
+    assert store.get("a") == {"x": [1, 2]}
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_entries_expire(store, clock):
+    store.set("a", 1, ttl=60)
+    clock.now += 59
+    assert store.get("a") == 1
+    clock.now += 2
+    assert store.get("a") is None
+
+
+def test_touch_extends_live_entries_only(store, clock):
+    store.set("a", 1, ttl=60)
+    store.set("b", 2, ttl=60)
+    clock.now += 50
+    store.touch("a", ttl=60)
+    clock.now += 20
+    assert store.get("a") == 1
+    assert store.get("b") is None
+    store.touch("b", ttl=60)  # already expired: stays gone
+    assert store.get("b") is None
+
+
+def test_purge_expired(store, clock):
+    store.set("old", 1, ttl=10)
+    store.set("new", 2, ttl=100)
+    clock.now += 50
+    store.purge_expired()
+    assert store.footprint()["entries"] == 1
+    assert store.get("new") == 2
+
+
+def test_sqlite_store_is_shared_between_handles(tmp_path, clock):
+    path = str(tmp_path / "state.sqlite3")
+    SQLiteStateStore(path).set("job:1", {"status": "done"}, ttl=60)
+    other = SQLiteStateStore(path)
+    assert other.get("job:1") == {"status": "done"}
+    clock.now += 61
+    assert other.get("job:1") is None